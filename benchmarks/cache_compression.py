@@ -0,0 +1,87 @@
+"""
+Benchmark of the compression of the cache (database size and loading latency)
+
+Run with:
+    python benchmarks/cache_compression.py
+"""
+
+import os
+import random
+import string
+import tempfile
+import time
+
+from oss4climate.src.database import CacheDatabase
+
+N_ENTRIES = 2000
+N_LOADS = 2000
+
+
+def _random_words(rng: random.Random, n: int) -> str:
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for __ in range(200)
+    ]
+    return " ".join(rng.choices(words, k=n))
+
+
+def _fake_readme(rng: random.Random) -> str:
+    sections = []
+    for i in range(rng.randint(3, 12)):
+        sections.append(f"## Section {i}\n\n{_random_words(rng, rng.randint(50, 400))}")
+    return "# Project\n\n" + "\n\n".join(sections)
+
+
+def _fake_api_payload(rng: random.Random) -> dict:
+    return {
+        "name": _random_words(rng, 1),
+        "html_url": f"https://github.com/org/{_random_words(rng, 1)}",
+        "description": _random_words(rng, 20),
+        "branches": [
+            {
+                "name": f"branch-{i}",
+                "commit": {
+                    "sha": "".join(rng.choices("0123456789abcdef", k=40)),
+                    "url": "https://api.github.com/repos/org/repo/commits/",
+                },
+                "protected": False,
+            }
+            for i in range(rng.randint(1, 60))
+        ],
+    }
+
+
+def run_benchmark(codec: str | None) -> dict:
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as d:
+        db_path = os.path.join(d, "db.sqlite")
+        db = CacheDatabase(db_path, codec=codec)
+        readmes = {f"readme/{i}": _fake_readme(rng) for i in range(N_ENTRIES // 2)}
+        payloads = {f"api/{i}": _fake_api_payload(rng) for i in range(N_ENTRIES // 2)}
+        db.save_many(readmes, is_json=False)
+        db.save_many(payloads, is_json=True)
+        db.vacuum()
+        db_size = os.path.getsize(db_path)
+
+        keys = rng.choices(list(readmes.keys()) + list(payloads.keys()), k=N_LOADS)
+        t0 = time.perf_counter()
+        for k in keys:
+            db.load(k, is_json=k.startswith("api/"))
+        latency = (time.perf_counter() - t0) / N_LOADS
+        db.close()
+    return dict(codec=str(codec), size_mb=db_size / 1e6, load_ms=latency * 1e3)
+
+
+if __name__ == "__main__":
+    codecs = [None, "zlib"]
+    try:
+        import zstandard  # noqa: F401
+
+        codecs.append("zstd")
+    except ImportError:
+        print("(zstandard is not installed, skipping the 'zstd' codec)")
+
+    print(f"{'codec':>6} | {'DB size (MB)':>12} | {'load (ms)':>9}")
+    for c in codecs:
+        r = run_benchmark(c)
+        print(f"{r['codec']:>6} | {r['size_mb']:>12.2f} | {r['load_ms']:>9.3f}")
@@ -0,0 +1,95 @@
+"""
+Benchmark of the extraction of links from listing webpages (event-based parser
+against BeautifulSoup)
+
+Run with:
+    python benchmarks/html_links.py [saved_page.html ...]
+
+(without saved pages, an "awesome list"-like page is generated)
+"""
+
+import random
+import string
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from oss4climate.src.parsers.html_links import extract_links, extract_page_elements
+
+N_SECTIONS = 40
+N_ITEMS_PER_SECTION = 250
+N_REPEATS = 3
+
+
+def _random_name(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+
+
+def _fake_listing_page(rng: random.Random) -> str:
+    out = ["<html><head><title>Listing</title></head><body><main>"]
+    for i in range(N_SECTIONS):
+        out.append(
+            f'<h2 id="s{i}">Section {i} <a class="headerlink" href="#s{i}">¶</a></h2>'
+        )
+        for j in range(N_ITEMS_PER_SECTION // 25):
+            out.append(f"<h3>Subsection {i}.{j}</h3><ul>")
+            for __ in range(25):
+                name = _random_name(rng)
+                out.append(
+                    f'<li><p><a href="https://github.com/{_random_name(rng)}/{name}">'
+                    f"{name}</a> - <em>{_random_name(rng)}</em> {_random_name(rng)} "
+                    f'<img src="https://img.shields.io/{name}.svg" alt="stars"/></p></li>'
+                )
+            out.append("</ul>")
+    out.append("</main></body></html>")
+    return "\n".join(out)
+
+
+def _with_beautifulsoup(html: str) -> int:
+    # As in the listing parsers (each one reading the page)
+    b = BeautifulSoup(html, features="html.parser")
+    n = len([x.get("href") for x in b.find_all(name="a")])
+    b = BeautifulSoup(html, features="html.parser")
+    for i in b.find_all(name=["h2", "h3", "li"]):
+        if i.name == "li":
+            n += len([j.get("href") for j in i.find_all(name="a")])
+    return n
+
+
+def _with_link_parser(html: str) -> int:
+    n = len(extract_links(html))
+    n += len(
+        [
+            i
+            for i in extract_page_elements(html, heading_tags=["h2", "h3"])
+            if i.in_list_item
+        ]
+    )
+    return n
+
+
+def _timed(function, html: str) -> float:
+    t0 = time.perf_counter()
+    for __ in range(N_REPEATS):
+        function(html)
+    return (time.perf_counter() - t0) / N_REPEATS
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = dict()
+        for i in sys.argv[1:]:
+            with open(i, encoding="utf-8") as f:
+                pages[i] = f.read()
+    else:
+        pages = dict(generated=_fake_listing_page(random.Random(42)))
+
+    print(f"{'page':>20} | {'size (kB)':>9} | {'bs4 (s)':>8} | {'parser (s)':>10}")
+    for name, html in pages.items():
+        assert _with_beautifulsoup(html) == _with_link_parser(html)
+        t_bs4 = _timed(_with_beautifulsoup, html)
+        t_parser = _timed(_with_link_parser, html)
+        print(
+            f"{name[-20:]:>20} | {len(html) / 1e3:>9.0f} | {t_bs4:>8.3f} | {t_parser:>10.3f}"
+        )
@@ -0,0 +1,78 @@
+"""
+Benchmark of the extraction of links from a large (synthetic) curated list in Markdown
+
+Run with:
+    python benchmarks/markdown_links.py
+
+Measured on a single-core container (Python 3.11): 50 to 80 MB/s, 3.5 to 4.5 times
+ slower than the legacy regular expression (180 to 310 MB/s), which only finds the
+ URLs of inline links (35k of the 50k links of the list, its other matches being
+ references without their URLs).
+"""
+
+import random
+import re
+import string
+import time
+
+from oss4climate.src.parsers.markdown_links import iter_markdown_links
+
+N_SECTIONS = 200
+N_ITEMS_PER_SECTION = 250
+N_REPEATS = 3
+
+# Former implementation (inline links only)
+_LEGACY_PATTERN = r"\[([^\]]+)\]\(([^\)]+)\)|\[([^\]]+)\]\s*\[([^\]]*)\]"
+
+
+def _legacy_find_links_in_markdown(markdown_text: str) -> list[str]:
+    out = re.findall(_LEGACY_PATTERN, markdown_text)
+    return [i[1] for i in out]
+
+
+def _random_name(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+
+
+def _fake_awesome_list(rng: random.Random) -> str:
+    lines = ["# Awesome climate", ""]
+    definitions = []
+    for i in range(N_SECTIONS):
+        lines += [f"## Section {i}", ""]
+        for j in range(N_ITEMS_PER_SECTION):
+            name = _random_name(rng)
+            url = f"https://github.com/{_random_name(rng)}/{name}"
+            words = " ".join(_random_name(rng) for __ in range(rng.randint(5, 20)))
+            r = rng.random()
+            if r < 0.6:
+                lines.append(f"- [{name}]({url}) - {words}.")
+            elif r < 0.75:
+                lines.append(f"- [{name}][ref-{i}-{j}] - {words}.")
+                definitions.append(f"[ref-{i}-{j}]: {url}")
+            elif r < 0.85:
+                badge = f"[![stars](https://img.shields.io/github/stars/{name}.svg)]"
+                lines.append(f"- {badge}({url}) {words}.")
+            else:
+                lines.append(f"- {name}: {words} (see {url}).")
+        lines.append("")
+    return "\n".join(lines + definitions) + "\n"
+
+
+def _timed(function, text: str) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    for __ in range(N_REPEATS):
+        n = len(function(text))
+    return (time.perf_counter() - t0) / N_REPEATS, n
+
+
+if __name__ == "__main__":
+    text = _fake_awesome_list(random.Random(42))
+    size_mb = len(text.encode("utf-8")) / 1e6
+    print(f"Synthetic list of {size_mb:.1f} MB")
+    print(f"{'scanner':>8} | {'links':>7} | {'time (s)':>8} | {'MB/s':>6}")
+    for name, function in [
+        ("legacy", _legacy_find_links_in_markdown),
+        ("new", lambda x: list(iter_markdown_links(x))),
+    ]:
+        duration, n = _timed(function, text)
+        print(f"{name:>8} | {n:>7} | {duration:>8.3f} | {size_mb / duration:>6.1f}")
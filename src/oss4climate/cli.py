@@ -2,12 +2,22 @@
 CLI module
 """
 
+from typing import Optional
+
 import typer
 
 from oss4climate import scripts
-from oss4climate.scripts import data_publication, listing_search, repository_scraping
+from oss4climate.scripts import (
+    cache_maintenance,
+    data_publication,
+    listing_search,
+    repository_scraping,
+)
+from oss4climate.scripts.scraping_shards import Shard
 
 app = typer.Typer()
+cache_app = typer.Typer(help="Manages the cache of web requests")
+app.add_typer(cache_app, name="cache")
 
 
 @app.command()
@@ -39,7 +49,6 @@ def discover():
     """Generates an index"""
     scripts.update_listing_of_listings()
     scripts.discover_projects()
-    scripts.format_all_files()
 
 
 @app.command()
@@ -49,9 +58,41 @@ def publish():
 
 
 @app.command()
-def generate_listing():
+def generate_listing(
+    max_concurrency: Optional[int] = typer.Option(
+        None, help="Maximal number of targets scraped concurrently"
+    ),
+    github_backend: str = typer.Option(
+        "rest",
+        help="API used for Github repositories details (rest, lean or graphql)",
+    ),
+    incremental: bool = typer.Option(
+        False, help="Only scrapes the repositories changed since the previous output"
+    ),
+    resume: bool = typer.Option(
+        False, help="Continues from the checkpoint of an interrupted run"
+    ),
+    shard: Optional[str] = typer.Option(
+        None,
+        help="Only scrapes a shard of the repositories, given as i/N (e.g. 1/4)",
+    ),
+):
     """Generates the updated listing"""
-    repository_scraping.scrape_all()
+    repository_scraping.scrape_all(
+        max_concurrency=max_concurrency,
+        github_backend=github_backend,
+        incremental=incremental,
+        resume=resume,
+        shard=(Shard.parse(shard) if shard is not None else None),
+    )
+
+
+@app.command()
+def merge_shards(
+    shards: int = typer.Option(..., help="Number of shards of the listing"),
+):
+    """Combines the listings generated by shards into the listing"""
+    repository_scraping.merge_shards(shards)
 
 
 @app.command()
@@ -66,5 +107,65 @@ def download_data():
     listing_search.download_data()
 
 
+@cache_app.command("stats")
+def cache_stats():
+    """Shows the size of the cache by class of URL"""
+    cache_maintenance.print_cache_statistics()
+
+
+@cache_app.command("evict")
+def cache_evict(
+    pattern: Optional[str] = typer.Option(
+        None, help='Glob pattern of the URLs to remove (e.g. "*/pulls*")'
+    ),
+    url_class: Optional[str] = typer.Option(
+        None, help="Class of URLs to remove (as listed by 'cache stats')"
+    ),
+    older_than_days: Optional[float] = typer.Option(
+        None, help="Only removes entries fetched more than this many days ago"
+    ),
+    max_size_mb: Optional[float] = typer.Option(
+        None, help="Evicts the least recently used entries down to this size"
+    ),
+):
+    """Removes entries from the cache"""
+    try:
+        cache_maintenance.evict_cache_entries(
+            pattern=pattern,
+            url_class=url_class,
+            older_than_days=older_than_days,
+            max_size_mb=max_size_mb,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+@cache_app.command("vacuum")
+def cache_vacuum():
+    """Reclaims the disk space freed in the cache"""
+    cache_maintenance.vacuum_cache()
+
+
+@cache_app.command("compress")
+def cache_compress():
+    """Compresses the entries of the cache written uncompressed"""
+    cache_maintenance.compress_cache()
+
+
+@cache_app.command("export")
+def cache_export(file_path: str):
+    """Exports the cache to a pack file (e.g. to seed another machine)"""
+    cache_maintenance.export_cache(file_path)
+
+
+@cache_app.command("import")
+def cache_import(
+    file_path: str,
+    verify: bool = typer.Option(True, help="Checks the content hashes of the pack"),
+):
+    """Merges a pack file into the cache (keeping the most recent entries)"""
+    cache_maintenance.import_cache(file_path, verify=verify)
+
+
 if __name__ == "__main__":
     app()
@@ -21,6 +21,7 @@ from oss4climate.src.parsers.opensustain_tech import (
     fetch_all_project_urls_from_opensustain_webpage,
     fetch_listing_of_listings_from_opensustain_webpage,
 )
+from oss4climate.src.toml_io import format_toml_file
 
 FILE_INPUT_INDEX = "repo_index.toml"
 FILE_INPUT_LISTINGS_INDEX = "listings_index.toml"
@@ -31,7 +32,8 @@ FILE_OUTPUT_SUMMARY_TOML = f"{FILE_OUTPUT_DIR}/summary.toml"
 
 
 def format_individual_file(file_path: str) -> None:
-    os.system(f"black {file_path}")
+    if os.path.exists(file_path):
+        format_toml_file(file_path)
 
 
 def format_all_files():
@@ -61,9 +63,6 @@ def _add_projects_to_listing_file(
     log_info(f"Exporting new index to {file_path}")
     new_targets.to_toml(file_path)
 
-    # Format the file for human readability
-    format_individual_file(file_path)
-
 
 def discover_projects(
     file_path: str = FILE_INPUT_INDEX,
@@ -107,11 +106,19 @@ def add_projects_to_listing(
     """
     # Splitting URLs into targets
     new_targets = identify_parsing_targets(project_urls)
+    new_targets.cleanup()
 
-    _add_projects_to_listing_file(
-        new_targets,
-        file_path=file_path,
-    )
+    existing_targets = ParsingTargets.from_toml(file_path)
+    dropped_targets = existing_targets.index(["unknown", "invalid"])
+    if any(k in dropped_targets for k in new_targets.index()):
+        # Dropped targets becoming valid must be removed (so the index is rewritten)
+        _add_projects_to_listing_file(
+            new_targets,
+            file_path=file_path,
+        )
+    else:
+        log_info(f"Adding projects to {file_path}")
+        new_targets.add_to_toml(file_path)
     log_info("Done!")
 
 
@@ -0,0 +1,85 @@
+"""
+This module contains methods to maintain the cache of web requests
+"""
+
+from datetime import timedelta
+
+from oss4climate.src.database import compress_database, get_database
+from oss4climate.src.database.pack import export_pack, import_pack
+from oss4climate.src.database.policies import cache_policy_names
+from oss4climate.src.log import log_info
+
+
+def print_cache_statistics() -> None:
+    db = get_database()
+    by_class = db.statistics_by_url_class()
+    print(f"Cache size on disk: {db.size_on_disk() / 1e6:.1f} MB")
+    print(f"{'URL class':<25} | {'entries':>8} | {'MB':>8}")
+    for k, v in sorted(by_class.items()):
+        print(f"{k:<25} | {v['entries']:>8} | {v['bytes'] / 1e6:>8.2f}")
+    total_entries = sum(i["entries"] for i in by_class.values())
+    total_bytes = sum(i["bytes"] for i in by_class.values())
+    print(f"{'(total)':<25} | {total_entries:>8} | {total_bytes / 1e6:>8.2f}")
+
+
+def evict_cache_entries(
+    pattern: str | None = None,
+    url_class: str | None = None,
+    older_than_days: float | None = None,
+    max_size_mb: float | None = None,
+) -> None:
+    """Removes entries from the cache
+
+    :param pattern: glob pattern of the URLs to remove (e.g. "*/pulls*"), defaults to None
+    :param url_class: URL class to remove (see oss4climate.src.database.policies), defaults to None
+    :param older_than_days: only removing entries fetched before this many days, defaults to None
+    :param max_size_mb: evicting least recently used entries down to this size, defaults to None
+    :raises ValueError: if no filter and no size is given (nothing would be removed), or if the URL class is unknown
+    """
+    if all(i is None for i in [pattern, url_class, older_than_days, max_size_mb]):
+        raise ValueError(
+            "No entries to remove (a pattern, a URL class, an age or a size is needed)"
+        )
+    if (url_class is not None) and (url_class not in cache_policy_names()):
+        raise ValueError(
+            f"Unknown URL class: {url_class} (expected one of"
+            f" {', '.join(cache_policy_names())})"
+        )
+    db = get_database()
+    if (
+        (pattern is not None)
+        or (url_class is not None)
+        or (older_than_days is not None)
+    ):
+        n = db.evict(
+            pattern=pattern,
+            url_class=url_class,
+            older_than=(
+                None if older_than_days is None else timedelta(days=older_than_days)
+            ),
+        )
+        log_info(f"Removed {n} entries from the cache")
+    if max_size_mb is not None:
+        n = db.enforce_size_cap(max_size_mb)
+        log_info(f"Removed {n} entries from the cache to fit in {max_size_mb} MB")
+
+
+def vacuum_cache() -> None:
+    db = get_database()
+    size_before = db.size_on_disk()
+    db.vacuum()
+    log_info(
+        f"Cache vacuumed ({size_before / 1e6:.1f} MB -> {db.size_on_disk() / 1e6:.1f} MB)"
+    )
+
+
+def compress_cache(codec: str | None = "default") -> None:
+    compress_database(codec)
+
+
+def export_cache(file_path: str) -> None:
+    export_pack(get_database(), file_path)
+
+
+def import_cache(file_path: str, verify: bool = True) -> None:
+    import_pack(get_database(), file_path, verify=verify)
@@ -1,24 +1,341 @@
+import json
+import os
+import tomllib
+from collections.abc import Callable
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any
+
 import pandas as pd
-from tomlkit import document, dump
 
 from oss4climate.scripts import (
     FILE_INPUT_INDEX,
     FILE_OUTPUT_DIR,
     FILE_OUTPUT_LISTING_CSV,
     FILE_OUTPUT_SUMMARY_TOML,
-    format_all_files,
-    format_individual_file,
 )
+from oss4climate.scripts.scraping_checkpoint import ScrapingCheckpoint
+from oss4climate.scripts.scraping_pipeline import Stage, run_pipeline
+from oss4climate.scripts.scraping_shards import Shard, all_shards
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.database import cache_statistics
 from oss4climate.src.helpers import sorted_list_of_unique_elements
 from oss4climate.src.log import log_info, log_warning
+from oss4climate.src.model import ProjectDetails
 from oss4climate.src.parsers import (
     ParsingTargets,
     github_data_io,
+    github_graphql_io,
     gitlab_data_io,
 )
+from oss4climate.src.parsers.urls import Forge
+from oss4climate.src.toml_io import write_toml
+from oss4climate.src.web import (
+    SCHEDULER,
+    counting_requests,
+    host_of,
+    run_concurrently,
+)
+
+
+def _fetch_concurrently(
+    function: Callable[[str], Any],
+    urls: list[str],
+    failure_key_prefix: str,
+    scrape_failures: dict[str, Exception],
+    bad_urls: list[str],
+    max_concurrency: int | None = None,
+) -> list[Any]:
+    # Results are in the order of the URLs (failures being recorded and left out)
+    results = run_concurrently(function, urls, max_concurrency=max_concurrency)
+    out = []
+    for url, r in zip(urls, results):
+        if isinstance(r, Exception):
+            scrape_failures[f"{failure_key_prefix}:{url}"] = r
+            log_warning(f" > Error with {url} ({r})")
+            bad_urls.append(url)
+        else:
+            out.append(r)
+    return out
+
+
+def _is_nested_url(url: str) -> bool:
+    url2check = url.replace("https://", "")
+    if url2check.endswith("/"):
+        url2check = url2check[:-1]
+    return url2check.count("/") > 1
+
+
+def _change_key(url: str, project_id: str) -> str:
+    # Identifies a project across scrapings (IDs alone being ambiguous across hosts)
+    return f"{host_of(url)}/{project_id}".lower()
+
+
+def _binary_output_file(target_output_file: str) -> str:
+    binary_target_output_file = target_output_file
+    for i in ["csv", "json"]:
+        binary_target_output_file = binary_target_output_file.replace(
+            f".{i}", ".feather"
+        )
+    return binary_target_output_file
+
+
+def _state_file(binary_output_file: str) -> str:
+    # Change markers of the projects in the output (for incremental scraping)
+    return binary_output_file.replace(".feather", "_state.json")
+
+
+def _failures_file() -> str:
+    return f"{FILE_OUTPUT_DIR}/failures_scraping.toml"
+
+
+def _checkpoint_directory(binary_output_file: str) -> str:
+    return binary_output_file.replace(".feather", "_checkpoint")
+
+
+def _difference(x: list[str], y: list[str]) -> list[str]:
+    # Elements of x not in y (in the order of x)
+    y = set(y)
+    return [i for i in x if i not in y]
+
+
+def _save_chunk(
+    checkpoint: ScrapingCheckpoint,
+    targets: list[str],
+    rows: list[dict],
+    change_marker: Callable[[dict], str],
+) -> None:
+    change_markers = {
+        _change_key(i["url"], i["id"]): change_marker(i["raw_details"]) for i in rows
+    }
+    checkpoint.save_chunk(targets, rows, change_markers)
+
+
+def _load_previous_output(binary_output_file: str) -> dict[str, tuple[str, dict]]:
+    """Loads the rows of the previous output, with their change markers
+
+    :param binary_output_file: feather file of the previous output
+    :return: dictionary {change key: (change marker, row)}
+    """
+    state_file = _state_file(binary_output_file)
+    if not (os.path.exists(binary_output_file) and os.path.exists(state_file)):
+        log_info("No previous output found (all targets are treated as changed)")
+        return dict()
+    with open(state_file, "r") as f:
+        markers = json.load(f)
+    out = dict()
+    for row in pd.read_feather(binary_output_file).to_dict(orient="records"):
+        key = _change_key(row["url"], row["id"])
+        if key in markers:
+            out[key] = (markers[key], row)
+    return out
+
+
+def _split_unchanged_targets(
+    urls: list[str],
+    previous: dict[str, tuple[str, dict]],
+    payloads: dict[str, dict],
+    id_of: Callable[[str], str],
+    fetch_payload: Callable[[str], dict],
+    change_marker: Callable[[dict], str],
+    max_concurrency: int | None = None,
+) -> tuple[list[str], list[dict]]:
+    """Splits targets between the changed ones and the unchanged ones
+
+    Change markers are taken from the payloads of the listings where available,
+    else from a single call per target (targets new to the output being treated as
+    changed without any call).
+
+    :return: URLs of the changed targets, and the rows of the unchanged ones
+    """
+    payloads = dict(payloads)
+    to_fetch = [
+        i
+        for i in urls
+        if (i not in payloads) and (_change_key(i, id_of(i)) in previous)
+    ]
+    for url, r in zip(
+        to_fetch, run_concurrently(fetch_payload, to_fetch, max_concurrency)
+    ):
+        if not isinstance(r, Exception):
+            payloads[url] = r
+
+    changed = []
+    unchanged_rows = []
+    for url in urls:
+        key = _change_key(url, id_of(url))
+        payload = payloads.get(url)
+        if (
+            (payload is not None)
+            and (key in previous)
+            and (previous[key][0] == change_marker(payload))
+        ):
+            unchanged_rows.append(previous[key][1] | dict(raw_details=payload))
+        else:
+            changed.append(url)
+    log_info(f"> {len(changed)} changed targets ({len(unchanged_rows)} unchanged)")
+    return changed, unchanged_rows
+
+
+GITHUB_BACKENDS = ["rest", "lean", "graphql"]
+
+_FAILURE_KEY_PREFIXES = {Forge.GITHUB: "GITHUB_REPO", Forge.GITLAB: "GITLAB_PROJECT"}
+_CHANGE_MARKERS = {
+    Forge.GITHUB: github_data_io.repository_change_marker,
+    Forge.GITLAB: gitlab_data_io.project_change_marker,
+}
+
+
+@dataclass(frozen=True)
+class _ScrapingUnit:
+    # Targets going through the stages together (a single one, except for batches of
+    #  Github repositories with the GraphQL backend)
+    forge: Forge
+    urls: tuple[str, ...]
+    backend: str = "rest"
+
+
+def _scraping_units(
+    gitlab_projects: list[str], github_repositories: list[str], github_backend: str
+) -> list[_ScrapingUnit]:
+    out = [_ScrapingUnit(Forge.GITLAB, (i,)) for i in gitlab_projects]
+    if github_backend == "graphql":
+        # (the README comes with the details, in the query of the batch)
+        batch_size = SETTINGS.GITHUB_GRAPHQL_BATCH_SIZE
+        out += [
+            _ScrapingUnit(
+                Forge.GITHUB,
+                tuple(github_repositories[i : i + batch_size]),
+                backend=github_backend,
+            )
+            for i in range(0, len(github_repositories), batch_size)
+        ]
+    else:
+        out += [
+            _ScrapingUnit(Forge.GITHUB, (i,), backend=github_backend)
+            for i in github_repositories
+        ]
+    return out
+
+
+@dataclass
+class _UnitDetails:
+    unit: _ScrapingUnit
+    # Details (or the exception raised) by URL
+    details: dict[str, ProjectDetails | Exception]
+    # Web requests made for each target, across the stages (not with GraphQL batches)
+    n_requests: dict[str, int] = field(default_factory=dict)
+
+
+def _fetch_details(unit: _ScrapingUnit, payloads: dict[str, dict]) -> _UnitDetails:
+    # Details without the README (fetched by the next stage)
+    if unit.backend == "graphql":
+        return _UnitDetails(
+            unit,
+            github_graphql_io.fetch_repositories_details(
+                list(unit.urls), max_concurrency=1
+            ),
+        )
+    out = _UnitDetails(unit, dict())
+    for i in unit.urls:
+        # (failures being recorded by target, as with GraphQL batches)
+        with counting_requests() as counter:
+            try:
+                if unit.forge is Forge.GITLAB:
+                    out.details[i] = gitlab_data_io.fetch_repository_details(
+                        i, payload=payloads.get(i), with_readme=False
+                    )
+                else:
+                    # Payloads from the listings save a call per repository
+                    out.details[i] = github_data_io.fetch_repository_details(
+                        i,
+                        lean=(unit.backend == "lean"),
+                        payload=payloads.get(i),
+                        with_readme=False,
+                    )
+            except Exception as e:
+                out.details[i] = e
+        out.n_requests[i] = counter.n_requests
+    return out
 
 
-def scrape_all(target_output_file: str = FILE_OUTPUT_LISTING_CSV) -> None:
+def _fetch_readmes(x: _UnitDetails) -> _UnitDetails:
+    if x.unit.backend == "graphql":
+        return x
+    for url, i in x.details.items():
+        if isinstance(i, Exception):
+            continue
+        with counting_requests() as counter:
+            try:
+                if x.unit.forge is Forge.GITLAB:
+                    gitlab_data_io.fetch_readme_of_details(i)
+                else:
+                    github_data_io.fetch_readme_of_details(
+                        i, lean=(x.unit.backend == "lean")
+                    )
+            except Exception as e:
+                x.details[url] = e
+        x.n_requests[url] += counter.n_requests
+        log_info(f"> {x.n_requests[url]} web requests for {i.id}")
+    return x
+
+
+def _postprocess(
+    x: _UnitDetails,
+) -> tuple[_ScrapingUnit, dict[str, dict | Exception], dict[str, str]]:
+    """Converts the details of a unit into rows of the output, with their change markers
+
+    (defined at module level, to be run in a pool of processes)
+    """
+    change_marker = _CHANGE_MARKERS[x.unit.forge]
+    rows = dict()
+    change_markers = dict()
+    for url, i in x.details.items():
+        if isinstance(i, Exception):
+            rows[url] = i
+            continue
+        row = dict(i.__dict__)
+        change_markers[_change_key(row["url"], row["id"])] = change_marker(
+            row.pop("raw_details")
+        )
+        rows[url] = row
+    return x.unit, rows, change_markers
+
+
+def _scraping_stages(
+    payloads: dict[str, dict], max_concurrency: int | None = None
+) -> list[Stage]:
+    if max_concurrency is None:
+        max_concurrency = SETTINGS.WEB_MAX_CONCURRENCY
+    n_processes = SETTINGS.SCRAPING_POSTPROCESSING_PROCESSES
+    return [
+        Stage(
+            "details",
+            lambda x: _fetch_details(x, payloads),
+            workers=SETTINGS.SCRAPING_DETAILS_WORKERS or max_concurrency,
+        ),
+        Stage(
+            "readme",
+            _fetch_readmes,
+            workers=SETTINGS.SCRAPING_README_WORKERS or max_concurrency,
+        ),
+        Stage(
+            "postprocessing",
+            _postprocess,
+            workers=max(1, n_processes),
+            processes=(n_processes > 0),
+        ),
+    ]
+
+
+def scrape_all(
+    target_output_file: str = FILE_OUTPUT_LISTING_CSV,
+    max_concurrency: int | None = None,
+    github_backend: str = "rest",
+    incremental: bool = False,
+    resume: bool = False,
+    shard: Shard | None = None,
+) -> None:
     """
     Script to run fetching of the data from the repositories
 
@@ -27,10 +344,20 @@ def scrape_all(target_output_file: str = FILE_OUTPUT_LISTING_CSV) -> None:
 
 
     :param target_output_file: name of file to output results to, defaults to FILE_OUTPUT_LISTING_CSV
-    :raises ValueError: if output file type is not supported (CSV, JSON)
+    :param max_concurrency: maximal number of targets scraped concurrently (by each stage fetching data), defaults to SETTINGS.WEB_MAX_CONCURRENCY
+    :param github_backend: API used for the details of Github repositories ("rest", "lean" - REST with minimal calls - or "graphql" - which requires a token), defaults to "rest"
+    :param incremental: if only the repositories changed since the previous output are to be scraped (the others being carried over from it), defaults to False
+    :param resume: if the scraping is to continue from the checkpoint of a previous run that did not complete, defaults to False
+    :param shard: shard of the repositories to scrape (outputs being then written to the files of the shard, to be combined with merge_shards), defaults to None (all repositories)
+    :raises ValueError: if output file type is not supported (CSV, JSON), or if the Github backend is unknown
     :return: /
     """
 
+    if github_backend not in GITHUB_BACKENDS:
+        raise ValueError(
+            f"Unsupported Github backend: {github_backend} (must be one of {GITHUB_BACKENDS})"
+        )
+
     log_info("Loading organisations and repositories to be indexed")
     targets = ParsingTargets.from_toml(FILE_INPUT_INDEX)
     targets.ensure_sorted_and_unique_elements()
@@ -41,85 +368,212 @@ def scrape_all(target_output_file: str = FILE_OUTPUT_LISTING_CSV) -> None:
     bad_repositories = []
 
     log_info("Fetching data for all organisations in Github")
+    github_organisations = []
     for org_url in targets.github_organisations:
-        url2check = org_url.replace("https://", "")
-        if url2check.endswith("/"):
-            url2check = url2check[:-1]
-        if url2check.count("/") > 1:
+        if _is_nested_url(org_url):
             log_info(f"SKIPPING repo {org_url}")
             targets.github_repositories.append(org_url)  # Mapping it to repos instead
-            continue  # Skip
-
-        try:
-            x = github_data_io.fetch_repositories_in_organisation(org_url)
-            [targets.github_repositories.append(i) for i in x.values()]
-        except Exception as e:
-            scrape_failures["GITHUB_ORGANISATION:" + org_url] = e
-            log_warning(f" > Error with organisation ({e})")
-            bad_organisations.append(org_url)
+        else:
+            github_organisations.append(org_url)
+    # Payloads of the repositories given by the listings (by URL)
+    listing_payloads = dict()
+    for x in _fetch_concurrently(
+        github_data_io.fetch_repository_payloads_in_organisation,
+        github_organisations,
+        failure_key_prefix="GITHUB_ORGANISATION",
+        scrape_failures=scrape_failures,
+        bad_urls=bad_organisations,
+        max_concurrency=max_concurrency,
+    ):
+        listing_payloads.update(x)
+        targets.github_repositories += list(x.keys())
 
     log_info("Fetching data for all groups in Gitlab")
-    for org_url in targets.gitlab_groups:
-        url2check = org_url.replace("https://", "")
-        if url2check.endswith("/"):
-            url2check = url2check[:-1]
-        if url2check.count("/") > 1:
-            log_info(f"SKIPPING repo {org_url}")
-            targets.gitlab_projects.append(org_url)  # Mapping it to repos instead
-            continue  # Skip
-
-        try:
-            x = gitlab_data_io.fetch_repositories_in_group(org_url)
-            [targets.gitlab_projects.append(i) for i in x.values()]
-        except Exception as e:
-            scrape_failures["GITLAB_GROUP:" + org_url] = e
-            log_warning(f" > Error with organisation ({e})")
-            bad_organisations.append(org_url)
+    # Nested paths listed as projects can be subgroups (only the API can tell)
+    nested_projects = [
+        x for x in targets.gitlab_projects if gitlab_data_io.has_nested_path(x)
+    ]
+    for url, target_type in zip(
+        nested_projects,
+        run_concurrently(
+            gitlab_data_io.resolve_target_type,
+            nested_projects,
+            max_concurrency=max_concurrency,
+        ),
+    ):
+        if target_type is gitlab_data_io.GitlabTargetType.GROUP:
+            log_info(f"Crawling {url} as a subgroup")
+            targets.gitlab_projects.remove(url)
+            targets.gitlab_groups.append(url)
+    for x in _fetch_concurrently(
+        gitlab_data_io.fetch_project_payloads_in_group,
+        targets.gitlab_groups,
+        failure_key_prefix="GITLAB_GROUP",
+        scrape_failures=scrape_failures,
+        bad_urls=bad_organisations,
+        max_concurrency=max_concurrency,
+    ):
+        listing_payloads.update(x)
+        targets.gitlab_projects += list(x.keys())
 
     targets.ensure_sorted_and_unique_elements()  # since elements were added
-    screening_results = []
-
-    log_info("Fetching data for all repositories in Gitlab")
-    for i in targets.gitlab_projects:
-        try:
-            screening_results.append(gitlab_data_io.fetch_repository_details(i))
-        except Exception as e:
-            scrape_failures["GITLAB_PROJECT:" + i] = e
-            log_warning(f" > Error with repo ({e})")
-            bad_repositories.append(i)
-
-    log_info("Fetching data for all repositories in Github")
-    for i in targets.github_repositories:
-        try:
-            if i.endswith("/.github"):
-                continue
-            screening_results.append(github_data_io.fetch_repository_details(i))
-        except Exception as e:
-            scrape_failures["GITHUB_REPO:" + i] = e
-            log_warning(f" > Error with repo ({e})")
-            bad_repositories.append(i)
-
-    df = pd.DataFrame([i.__dict__ for i in screening_results])
-    df.set_index("id", inplace=True)
-
-    log_info("Fetching READMEs for all repositories in Github")
-
-    df2export = df.drop(columns=["raw_details"])
+    gitlab_projects = targets.gitlab_projects
+    github_repositories = [
+        i for i in targets.github_repositories if not i.endswith("/.github")
+    ]
+    summary_file = FILE_OUTPUT_SUMMARY_TOML
+    failures_file = _failures_file()
+    if shard is not None:
+        # (organisations and groups are listed by all shards, so that repositories
+        #  listed both directly and through them are in a single shard)
+        log_info(f"Scraping shard {shard} of the repositories")
+        gitlab_projects = [i for i in gitlab_projects if shard.includes(i)]
+        github_repositories = [i for i in github_repositories if shard.includes(i)]
+        target_output_file = shard.file(target_output_file)
+        summary_file = shard.file(summary_file)
+        failures_file = shard.file(failures_file)
+
+    binary_target_output_file = _binary_output_file(target_output_file)
+    checkpoint = ScrapingCheckpoint(
+        _checkpoint_directory(binary_target_output_file), resume=resume
+    )
+    gitlab_projects = checkpoint.pending(gitlab_projects)
+    github_repositories = checkpoint.pending(github_repositories)
+    if incremental:
+        log_info("Identifying the repositories changed since the previous output")
+        previous = _load_previous_output(binary_target_output_file)
+        gitlab_changed, gitlab_unchanged_rows = _split_unchanged_targets(
+            gitlab_projects,
+            previous=previous,
+            payloads=listing_payloads,
+            id_of=gitlab_data_io.project_id,
+            fetch_payload=gitlab_data_io.fetch_project_payload,
+            change_marker=gitlab_data_io.project_change_marker,
+            max_concurrency=max_concurrency,
+        )
+        _save_chunk(
+            checkpoint,
+            _difference(gitlab_projects, gitlab_changed),
+            gitlab_unchanged_rows,
+            gitlab_data_io.project_change_marker,
+        )
+        gitlab_projects = gitlab_changed
+        github_changed, github_unchanged_rows = _split_unchanged_targets(
+            github_repositories,
+            previous=previous,
+            payloads=listing_payloads,
+            id_of=github_data_io.repository_id,
+            fetch_payload=github_data_io.fetch_repository_payload,
+            change_marker=github_data_io.repository_change_marker,
+            max_concurrency=max_concurrency,
+        )
+        _save_chunk(
+            checkpoint,
+            _difference(github_repositories, github_changed),
+            github_unchanged_rows,
+            github_data_io.repository_change_marker,
+        )
+        github_repositories = github_changed
+
+    # Targets go through the stages of the pipeline (fetching of the details, then
+    #  of the READMEs, then post-processing), their rows being written to the
+    #  checkpoint by chunks as they complete
+    log_info("Fetching data for all repositories in Gitlab and Github")
+    units = _scraping_units(gitlab_projects, github_repositories, github_backend)
+    n_targets = len(gitlab_projects) + len(github_repositories)
+    chunk_size = SETTINGS.SCRAPING_CHUNK_SIZE
+    chunk_targets = []
+    chunk_rows = []
+    chunk_change_markers = dict()
+    with (
+        counting_requests() as counter,
+        closing(
+            run_pipeline(units, _scraping_stages(listing_payloads, max_concurrency))
+        ) as results,
+    ):
+        for unit, x in results:
+            if isinstance(x, Exception):
+                # (failure of the whole unit)
+                rows, change_markers = {i: x for i in unit.urls}, dict()
+            else:
+                _, rows, change_markers = x
+            for url, row in rows.items():
+                if isinstance(row, Exception):
+                    scrape_failures[f"{_FAILURE_KEY_PREFIXES[unit.forge]}:{url}"] = row
+                    log_warning(f" > Error with {url} ({row})")
+                    bad_repositories.append(url)
+                else:
+                    chunk_targets.append(url)
+                    chunk_rows.append(row)
+            chunk_change_markers.update(change_markers)
+            if len(chunk_targets) >= chunk_size:
+                checkpoint.save_chunk(chunk_targets, chunk_rows, chunk_change_markers)
+                chunk_targets = []
+                chunk_rows = []
+                chunk_change_markers = dict()
+        checkpoint.save_chunk(chunk_targets, chunk_rows, chunk_change_markers)
+    log_info(
+        f"Scraping ({github_backend} backend for Github): {counter.n_requests} web"
+        f" requests for {n_targets} repositories"
+        f" ({counter.n_requests / max(1, n_targets):.2f} per repository)"
+    )
+
+    log_info(f"Assembling the output from {len(checkpoint.chunks)} chunks")
+    _export_outputs(
+        checkpoint.load(),
+        target_output_file,
+        change_markers=checkpoint.change_markers,
+        failures=dict(
+            organisations=sorted(bad_organisations),
+            repositories=sorted(bad_repositories),
+        ),
+        scrape_failures={str(k): str(v) for k, v in scrape_failures.items()},
+        summary_file=summary_file,
+        failures_file=failures_file,
+    )
+    checkpoint.remove()
+    log_info(f"Cache statistics: {cache_statistics()}")
+    log_info(f"Rate limit budgets: {SCHEDULER.budgets()}")
+    log_info("Done")
+
+
+def _export_outputs(
+    df: pd.DataFrame,
+    target_output_file: str,
+    change_markers: dict[str, str],
+    failures: dict[str, list[str]],
+    scrape_failures: dict[str, str],
+    summary_file: str,
+    failures_file: str,
+) -> None:
+    """Exports the listing (with its change markers), its summary and the failures
+
+    :param df: rows of the listing (in any order)
+    :param target_output_file: file of the listing (CSV or JSON, with a Feather copy)
+    :param change_markers: change markers of the rows (for incremental scrapings)
+    :param failures: targets that failed, as dict(organisations=..., repositories=...)
+    :param scrape_failures: errors by target
+    :param summary_file: TOML file of the summary
+    :param failures_file: TOML file of the errors
+    :raises ValueError: if output file type is not supported (CSV, JSON)
+    """
+    # (sorted, since targets complete in any order)
+    df = df.set_index("id").sort_index()
+
     if target_output_file.endswith(".csv"):
         # Dropping READMEs for CSV to look reasonable
         df.drop(columns=["readme"]).to_csv(target_output_file, sep=";")
     elif target_output_file.endswith(".json"):
-        df2export.T.to_json(target_output_file)
+        df.T.to_json(target_output_file)
     else:
         raise ValueError(f"Unsupported file type for export: {target_output_file}")
 
     # Exporting the file to Feather too (faster processing)
-    binary_target_output_file = target_output_file
-    for i in ["csv", "json"]:
-        binary_target_output_file = binary_target_output_file.replace(
-            f".{i}", ".feather"
-        )
-    df2export.reset_index().to_feather(binary_target_output_file)
+    binary_target_output_file = _binary_output_file(target_output_file)
+    df.reset_index().to_feather(binary_target_output_file)
+    # Change markers of the output (for the next incremental scraping)
+    with open(_state_file(binary_target_output_file), "w") as f:
+        json.dump(change_markers, f, indent=1, sort_keys=True)
 
     print(
         f"""
@@ -139,36 +593,79 @@ def scrape_all(target_output_file: str = FILE_OUTPUT_LISTING_CSV) -> None:
         "organisations": len(organisations),
     }
 
-    failed = dict(organisations=bad_organisations, repositories=bad_repositories)
-
     # TOML formatting
-    doc = document()
-    doc.add("statistics", stats)
-    doc.add("failures", failed)
-    doc.add("organisations", [str(i) for i in organisations])
-    doc.add("language", [str(i) for i in languages])
-    doc.add("licences", [str(i) for i in licences])
-    log_info(f"Exporting new index to {FILE_OUTPUT_SUMMARY_TOML}")
-    with open(FILE_OUTPUT_SUMMARY_TOML, "w") as fp:
-        dump(doc, fp, sort_keys=True)
+    summary = dict(
+        failures=failures,
+        language=[str(i) for i in languages],
+        licences=[str(i) for i in licences],
+        organisations=[str(i) for i in organisations],
+        statistics=stats,
+    )
+    log_info(f"Exporting new index to {summary_file}")
+    write_toml(summary, summary_file)
 
     print(
         f"""
         
-    >>> Types were exported to: {FILE_OUTPUT_SUMMARY_TOML}
+    >>> Types were exported to: {summary_file}
         
     """
     )
-    format_all_files()
 
-    file_failures_toml = f"{FILE_OUTPUT_DIR}/failures_scraping.toml"
-    scrape_failures_as_jsonable_dict = {
-        str(k): str(v) for k, v in scrape_failures.items()
-    }
-    doc_failures = document()
-    doc_failures.add("failures", scrape_failures_as_jsonable_dict)
-    log_info(f"Exporting failures to {file_failures_toml}")
-    with open(file_failures_toml, "w") as fp:
-        dump(doc_failures, fp, sort_keys=True)
-    format_individual_file(file_failures_toml)
+    log_info(f"Exporting failures to {failures_file}")
+    write_toml(dict(failures=dict(sorted(scrape_failures.items()))), failures_file)
+
+
+def merge_shards(
+    n_shards: int, target_output_file: str = FILE_OUTPUT_LISTING_CSV
+) -> None:
+    """Combines the outputs of the shards of a scraping into the output of a single run
+
+    The files of all the shards (see scrape_all) are expected in the output
+    directory (e.g. after being copied from the hosts that scraped them).
+
+    :param n_shards: number of shards of the scraping
+    :param target_output_file: name of file to output results to (as given to the shards), defaults to FILE_OUTPUT_LISTING_CSV
+    :raises FileNotFoundError: if the output of a shard is missing
+    """
+    shards = all_shards(n_shards)
+    missing = [
+        str(i)
+        for i in shards
+        if not os.path.exists(_binary_output_file(i.file(target_output_file)))
+    ]
+    if len(missing) > 0:
+        raise FileNotFoundError(f"Missing outputs of shards {missing}")
+
+    dfs = []
+    change_markers = dict()
+    bad_organisations = set()
+    bad_repositories = set()
+    scrape_failures = dict()
+    for shard in shards:
+        binary_output_file = _binary_output_file(shard.file(target_output_file))
+        log_info(f"Loading shard {shard} from {binary_output_file}")
+        dfs.append(pd.read_feather(binary_output_file))
+        with open(_state_file(binary_output_file), "r") as f:
+            change_markers.update(json.load(f))
+        with open(shard.file(FILE_OUTPUT_SUMMARY_TOML), "rb") as f:
+            failures = tomllib.load(f)["failures"]
+        # (failures of organisations being reported by all shards)
+        bad_organisations.update(failures["organisations"])
+        bad_repositories.update(failures["repositories"])
+        with open(shard.file(_failures_file()), "rb") as f:
+            scrape_failures.update(tomllib.load(f)["failures"])
+
+    _export_outputs(
+        pd.concat(dfs, ignore_index=True),
+        target_output_file,
+        change_markers=change_markers,
+        failures=dict(
+            organisations=sorted(bad_organisations),
+            repositories=sorted(bad_repositories),
+        ),
+        scrape_failures=scrape_failures,
+        summary_file=FILE_OUTPUT_SUMMARY_TOML,
+        failures_file=_failures_file(),
+    )
     log_info("Done")
@@ -0,0 +1,126 @@
+"""
+Module for the checkpoints of scrapings
+
+Rows of the targets scraped are written in chunks (Parquet files) as the scraping
+ progresses, and each chunk is recorded in a journal (one JSON line per chunk, with
+ the targets it covers and their change markers). A scraping stopped midway (e.g. by
+ a crash or by rate limits) can then resume from the targets not in the journal.
+"""
+
+import json
+import os
+import re
+import shutil
+
+import pandas as pd
+
+from oss4climate.src.log import log_info, log_warning
+
+_JOURNAL_FILE = "journal.jsonl"
+_CHUNK_FILE = re.compile(r"^chunk_(\d+)\.parquet$")
+
+
+class ScrapingCheckpoint:
+    """Journal of the targets scraped, with their rows written in chunks"""
+
+    def __init__(self, directory: str, resume: bool = False):
+        """
+        :param directory: directory of the checkpoint
+        :param resume: if the existing checkpoint is to be continued (else it is cleared), defaults to False
+        """
+        self.directory = directory
+        self.chunks: list[str] = []
+        self.done_targets: set[str] = set()
+        self.change_markers: dict[str, str] = dict()
+        if os.path.exists(directory) and not resume:
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+        if resume:
+            self._load_journal()
+            log_info(
+                f"Resuming from checkpoint ({len(self.done_targets)} targets in"
+                f" {len(self.chunks)} chunks)"
+            )
+
+    @property
+    def _journal_file(self) -> str:
+        return os.path.join(self.directory, _JOURNAL_FILE)
+
+    def _load_journal(self) -> None:
+        if not os.path.exists(self._journal_file):
+            return
+        entries = []
+        with open(self._journal_file, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Entry cut by the end of the previous run (and all after it)
+                    log_warning("Incomplete entry in the checkpoint journal (ignored)")
+                    break
+                if not os.path.exists(os.path.join(self.directory, entry["chunk"])):
+                    continue
+                entries.append(entry)
+                self.chunks.append(entry["chunk"])
+                self.done_targets.update(entry["targets"])
+                self.change_markers.update(entry["change_markers"])
+        # Rewritten from the valid entries, so that new entries are not appended to
+        #  an incomplete one (and lost with it on the next resumption)
+        with open(f"{self._journal_file}.tmp", "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{self._journal_file}.tmp", self._journal_file)
+
+    def _next_chunk(self) -> str:
+        # Numbered after all the chunks in the directory (including those of entries
+        #  that were ignored), so that no chunk is overwritten
+        numbers = [
+            int(m.group(1))
+            for m in map(_CHUNK_FILE.match, os.listdir(self.directory))
+            if m is not None
+        ]
+        return f"chunk_{max(numbers, default=-1) + 1:05d}.parquet"
+
+    def pending(self, targets: list[str]) -> list[str]:
+        """Targets not scraped yet (in the order of the input)"""
+        return [i for i in targets if i not in self.done_targets]
+
+    def save_chunk(
+        self, targets: list[str], rows: list[dict], change_markers: dict[str, str]
+    ) -> None:
+        """Writes the rows of targets scraped, and records them in the journal
+
+        :param targets: targets covered by the rows
+        :param rows: rows of the output ("raw_details" being dropped)
+        :param change_markers: change markers of the rows (for incremental scrapings)
+        """
+        if len(rows) == 0:
+            return
+        chunk = self._next_chunk()
+        path = os.path.join(self.directory, chunk)
+        df = pd.DataFrame(rows).drop(columns=["raw_details"], errors="ignore")
+        # Written under another name first, so that chunks are never partial
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        self.chunks.append(chunk)
+
+        entry = dict(chunk=chunk, targets=targets, change_markers=change_markers)
+        with open(self._journal_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done_targets.update(targets)
+        self.change_markers.update(change_markers)
+
+    def load(self) -> pd.DataFrame:
+        """Concatenates the chunks (in the order in which they were written)"""
+        dfs = [pd.read_parquet(os.path.join(self.directory, i)) for i in self.chunks]
+        if len(dfs) == 0:
+            return pd.DataFrame()
+        return pd.concat(dfs, ignore_index=True)
+
+    def remove(self) -> None:
+        """Removes the checkpoint (once the output is complete)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,191 @@
+"""
+Module for the staged pipelines of scrapings
+
+Items go through a sequence of stages connected by bounded queues, each stage having
+ its own pool of workers (threads for stages waiting on the network, processes for
+ stages using the CPU), so that stages work on different items at the same time. A
+ stage whose output queue is full waits for the next stages to catch up
+ (backpressure), which bounds the number of items in flight (and their memory).
+"""
+
+import contextvars
+import multiprocessing
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from oss4climate.src.config import SETTINGS
+
+# Marker of the end of the items (passed on from stage to stage)
+_END = object()
+# Interval at which blocked workers check if the pipeline was stopped
+_POLL_INTERVAL_SECONDS = 0.1
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    # Function applied to the output of the previous stage (the item, for the first one)
+    function: Callable[[Any], Any]
+    workers: int = 1
+    # If the function runs in a pool of processes (it must then be picklable)
+    processes: bool = False
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _put(q: queue.Queue, x: Any, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            q.put(x, timeout=_POLL_INTERVAL_SECONDS)
+            return
+        except queue.Full:
+            pass
+    raise _Stopped()
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL_SECONDS)
+        except queue.Empty:
+            pass
+    raise _Stopped()
+
+
+class _StageWorkers:
+    """Workers of a stage, taking (item, value) pairs from a queue to the next one"""
+
+    def __init__(
+        self,
+        stage: Stage,
+        input_queue: queue.Queue,
+        output_queue: queue.Queue,
+        stop: threading.Event,
+    ):
+        self.stage = stage
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.stop = stop
+        self.executor = None
+        if stage.processes:
+            self.executor = ProcessPoolExecutor(
+                max_workers=stage.workers,
+                # (forking a process with threads running is unsafe)
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self._n_running = stage.workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(
+                # Each worker runs in a copy of the current context (as run_concurrently)
+                target=contextvars.copy_context().run,
+                args=(self._work,),
+                name=f"oss4climate-{stage.name}-{i}",
+                daemon=True,
+            )
+            for i in range(stage.workers)
+        ]
+
+    def _call(self, x: Any) -> Any:
+        if self.executor is None:
+            return self.stage.function(x)
+        # (the worker thread waits for its process, so that backpressure applies)
+        return self.executor.submit(self.stage.function, x).result()
+
+    def _work(self) -> None:
+        try:
+            while True:
+                x = _get(self.input_queue, self.stop)
+                if x is _END:
+                    # Passed on to the other workers of the stage, then to the next
+                    #  stage by the last worker to finish
+                    _put(self.input_queue, _END, self.stop)
+                    with self._lock:
+                        self._n_running -= 1
+                        is_last = self._n_running == 0
+                    if is_last:
+                        _put(self.output_queue, _END, self.stop)
+                    return
+                item, value = x
+                if not isinstance(value, Exception):
+                    try:
+                        value = self._call(value)
+                    except Exception as e:
+                        value = e
+                _put(self.output_queue, (item, value), self.stop)
+        except _Stopped:
+            return
+
+    def start(self) -> None:
+        for i in self.threads:
+            i.start()
+
+    def join(self) -> None:
+        for i in self.threads:
+            i.join()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+def run_pipeline(
+    items: Iterable[Any], stages: list[Stage], queue_size: int | None = None
+) -> Iterator[tuple[Any, Any]]:
+    """Runs items through a sequence of stages
+
+    Each item goes through the stages in order (its output from a stage being the
+    input of the next). Exceptions raised by a stage are passed on in place of the
+    output (the item skipping the next stages), so that failures can be handled
+    item by item. A pipeline not consumed entirely must be closed (e.g. with
+    contextlib.closing) for its workers to stop.
+
+    :param items: items to process (read as the first stage has room for them)
+    :param stages: stages of the pipeline
+    :param queue_size: number of items waiting between two stages, defaults to SETTINGS.SCRAPING_QUEUE_SIZE
+    :return: iterator over the (item, output of the last stage or exception), in the order of completion
+    """
+    if queue_size is None:
+        queue_size = SETTINGS.SCRAPING_QUEUE_SIZE
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    workers = [
+        _StageWorkers(stage, input_queue=q_in, output_queue=q_out, stop=stop)
+        for stage, q_in, q_out in zip(stages, queues[:-1], queues[1:])
+    ]
+    feeding_errors = []
+
+    def _feed() -> None:
+        try:
+            for i in items:
+                _put(queues[0], (i, i), stop)
+        except _Stopped:
+            return
+        except Exception as e:
+            feeding_errors.append(e)
+        try:
+            _put(queues[0], _END, stop)
+        except _Stopped:
+            return
+
+    feeder = threading.Thread(target=_feed, name="oss4climate-feeder", daemon=True)
+    feeder.start()
+    for i in workers:
+        i.start()
+    try:
+        while True:
+            x = queues[-1].get()
+            if x is _END:
+                break
+            yield x
+        if len(feeding_errors) > 0:
+            raise feeding_errors[0]
+    finally:
+        stop.set()
+        feeder.join()
+        for i in workers:
+            i.join()
@@ -0,0 +1,61 @@
+"""
+Module for the shards of scrapings
+
+Repositories to scrape can be split into N shards (e.g. to be scraped on separate
+ hosts, each with its own API tokens and cache). Each repository belongs to a shard
+ given by a stable hash of its canonical URL, so that shards are the same across
+ runs and hosts (unlike with the built-in hash, which is salted per process).
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+
+from oss4climate.src.parsers.urls import canonicalise_url
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int  # From 1 to count
+    count: int
+
+    @staticmethod
+    def parse(x: str) -> "Shard":
+        """Parses a shard given as "i/N" (e.g. "1/4" for the first of 4 shards)
+
+        :raises ValueError: if the shard is not valid
+        """
+        try:
+            index, count = (int(i) for i in x.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard: {x} (expected i/N, e.g. 1/4)")
+        if not (1 <= index <= count):
+            raise ValueError(f"Invalid shard: {x} (i must be between 1 and N)")
+        return Shard(index=index, count=count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def includes(self, url: str) -> bool:
+        """If a target belongs to the shard"""
+        return shard_index_of(url, self.count) == self.index
+
+    def file(self, file_path: str) -> str:
+        """File of the shard, for a file of the output (e.g. "listing_data.csv")"""
+        root, extension = os.path.splitext(file_path)
+        return f"{root}_shard_{self.index}_of_{self.count}{extension}"
+
+
+def shard_index_of(url: str, count: int) -> int:
+    """Shard of a target (from 1 to count), from a stable hash of its canonical URL
+
+    (variants of a URL, e.g. with a trailing "/", being in the same shard)
+    """
+    digest = hashlib.blake2b(
+        canonicalise_url(url).key.encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def all_shards(count: int) -> list[Shard]:
+    return [Shard(index=i, count=count) for i in range(1, count + 1)]
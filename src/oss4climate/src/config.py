@@ -8,6 +8,45 @@ class Settings(pydantic_settings.BaseSettings):
     GITHUB_API_TOKEN: Optional[str] = None
     GITLAB_ACCESS_TOKEN: Optional[str] = None
     SQLITE_DB: str = ".data/db.sqlite"
+    # Write-behind settings of the cache (rows are committed in batches by a single writer)
+    SQLITE_WRITE_BATCH_SIZE: int = 500
+    SQLITE_WRITE_FLUSH_INTERVAL: float = 1.0
+    # Retries of failed writes (attempts in total, with exponential backoff)
+    SQLITE_WRITE_RETRY_ATTEMPTS: int = 5
+    SQLITE_WRITE_RETRY_BACKOFF_SECONDS: float = 0.5
+    SQLITE_WRITE_RETRY_MAX_BACKOFF_SECONDS: float = 30.0
+    # Compression of the cached values ("zlib", "zstd" or "none")
+    SQLITE_COMPRESSION: str = "zlib"
+    # Budget of the in-memory tier of the cache (0 to disable)
+    CACHE_MEMORY_BUDGET_MB: float = 256
+    # Size cap of the cache database (None for no cap)
+    SQLITE_MAX_SIZE_MB: Optional[float] = None
+    # Concurrency of web requests (overall and per host)
+    WEB_MAX_CONCURRENCY: int = 16
+    WEB_MAX_CONCURRENCY_PER_HOST: int = 4
+    # Pace of requests to hosts not reporting their rate limits (0 for no limit)
+    WEB_REQUESTS_PER_SECOND_PER_HOST: float = 10.0
+    WEB_TIMEOUT_SECONDS: float = 60.0
+    # Retries of transient failures (attempts in total, with exponential backoff)
+    WEB_RETRY_ATTEMPTS: int = 4
+    WEB_RETRY_BACKOFF_SECONDS: float = 1.0
+    WEB_RETRY_MAX_BACKOFF_SECONDS: float = 30.0
+    # Circuit breaker (stopping requests to a host after consecutive failures)
+    WEB_CIRCUIT_BREAKER_THRESHOLD: int = 10
+    WEB_CIRCUIT_BREAKER_COOLDOWN_SECONDS: float = 300.0
+    # Number of repositories queried per request to the Github GraphQL API
+    GITHUB_GRAPHQL_BATCH_SIZE: int = 40
+    # Maximal number of entries kept for the file tree of a repository
+    FILE_TREE_MAX_ENTRIES: int = 500_000
+    # Number of targets per chunk of the output of scrapings (see ScrapingCheckpoint)
+    SCRAPING_CHUNK_SIZE: int = 200
+    # Stages of scrapings (see scraping_pipeline): items waiting between two stages,
+    #  workers fetching details and READMEs (None for the concurrency of scrapings),
+    #  and processes post-processing them (0 to post-process in a thread)
+    SCRAPING_QUEUE_SIZE: int = 64
+    SCRAPING_DETAILS_WORKERS: Optional[int] = None
+    SCRAPING_README_WORKERS: Optional[int] = None
+    SCRAPING_POSTPROCESSING_PROCESSES: int = 0
     # Identifiants du FTP pour l'export
     EXPORT_FTP_URL: Optional[str] = None
     EXPORT_FTP_USER: Optional[str] = None
@@ -1,14 +1,50 @@
 """
 Module to manage a database input
+
+The cache is written behind: rows saved are kept in memory (and remain readable)
+ until a single writer thread commits them to SQLite in batches. The database runs
+ in WAL mode, so that several threads and processes can safely share it.
+
+Values are stored compressed (codec set in SETTINGS.SQLITE_COMPRESSION), entries
+ written by earlier versions remain readable and can be compressed with
+ compress_database().
+
+Decoded values are also kept in an in-process memory tier (LRU bounded by
+ SETTINGS.CACHE_MEMORY_BUDGET_MB), which is queried before SQLite.
+
+If SETTINGS.SQLITE_MAX_SIZE_MB is set, the least recently used entries (of the URL
+ classes with the lowest eviction priority first) are evicted beyond this size.
 """
 
+import atexit
 import json
 import os
-from datetime import UTC, datetime
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Optional
 
+from sqlalchemy import bindparam, delete, event, inspect, text, update
+from sqlalchemy.dialects.sqlite import insert
 from sqlmodel import Field, Session, SQLModel, create_engine, select
 
 from oss4climate.src.config import SETTINGS
+from oss4climate.src.database.compression import (
+    MIN_SIZE_FOR_COMPRESSION,
+    compress,
+    decompress,
+    parse_codec,
+)
+from oss4climate.src.database.memory import MemoryCache
+from oss4climate.src.database.policies import cache_policy_for
+from oss4climate.src.log import log_info, log_warning
+
+# Maximal number of keys in a single "IN (...)" query (below SQLite's variable limit)
+_MAX_KEYS_PER_QUERY = 500
+
+# Size of a stored entry (in bytes)
+_SQL_ENTRY_SIZE = "length(CAST(value AS BLOB)) + IFNULL(length(compressed_value), 0)"
 
 
 # -------------------------------------------------------------------------------------
@@ -16,52 +52,798 @@ from oss4climate.src.config import SETTINGS
 # -------------------------------------------------------------------------------------
 class Cache(SQLModel, table=True):
     id: str = Field(default=None, primary_key=True, nullable=False)
+    # Plain value (empty when the value is stored compressed)
     value: str
     fetched_at: datetime
+    # JSON of the response headers kept for revalidation (ETag, Last-Modified, ...)
+    response_headers: Optional[str] = None
+    # Compressed value (if codec is not None)
+    codec: Optional[str] = None
+    compressed_value: Optional[bytes] = None
+    # Last time the entry was read from or written to the database (for LRU eviction)
+    last_accessed_at: Optional[datetime] = None
+
+
+@dataclass
+class CacheEntry:
+    value: dict | str
+    fetched_at: datetime
+    response_headers: dict[str, str] = field(default_factory=dict)
 
 
 # -------------------------------------------------------------------------------------
 # Engine
 # -------------------------------------------------------------------------------------
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL allows readers to work alongside the (single) writer, also across processes
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
 
 
-def _open_engine_and_create_database_if_missing():
-    db_folder, __ = os.path.split(SETTINGS.SQLITE_DB)
-    os.makedirs(db_folder, exist_ok=True)
+def _open_engine_and_create_database_if_missing(db_path: str | None = None):
+    if db_path is None:
+        db_path = SETTINGS.SQLITE_DB
+    db_folder, __ = os.path.split(db_path)
+    if db_folder:
+        os.makedirs(db_folder, exist_ok=True)
     x = create_engine(
-        f"sqlite:///{SETTINGS.SQLITE_DB}",
+        f"sqlite:///{db_path}",
         echo=False,
+        connect_args={"check_same_thread": False, "timeout": 30},
     )
+    event.listen(x, "connect", _set_sqlite_pragmas)
     SQLModel.metadata.create_all(x)
+    _add_missing_columns(x)
     return x
 
 
-_ENGINE = _open_engine_and_create_database_if_missing()
+def _add_missing_columns(engine) -> None:
+    # Databases created by earlier versions lack the newer (nullable) columns
+    table_name = Cache.__tablename__
+    existing = {c["name"] for c in inspect(engine).get_columns(table_name)}
+    with engine.begin() as connection:
+        for column in Cache.__table__.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"
+                    )
+                )
 
 
-# -------------------------------------------------------------------------------------
-# Actual methods
-# -------------------------------------------------------------------------------------
-def load_from_database(key: str, is_json: bool) -> dict | None:
-    with Session(_ENGINE) as session:
-        res = session.exec(select(Cache).where(Cache.id == key)).first()
-    if res is None:
-        return None
+def _encode(value: dict | str, is_json: bool) -> str:
+    if is_json:
+        return json.dumps(value)
     else:
-        if is_json:
-            return json.loads(res.value)
-        else:
-            return res.value
+        return value
 
 
-def save_to_database(key: str, value: dict, is_json: bool) -> None:
+def _decode(value: str, is_json: bool) -> dict | str:
     if is_json:
-        value_to_write = json.dumps(value)
+        return json.loads(value)
+    else:
+        return value
+
+
+def _stored_value(x: str, codec: str | None) -> dict:
+    if (codec is None) or (len(x) < MIN_SIZE_FOR_COMPRESSION):
+        return dict(value=x, codec=None, compressed_value=None)
+    else:
+        return dict(value="", codec=codec, compressed_value=compress(x, codec))
+
+
+def _plain_value(row: dict) -> str:
+    if row.get("codec") is None:
+        return row["value"]
+    else:
+        return decompress(row["compressed_value"], row["codec"])
+
+
+def _as_utc(x: datetime) -> datetime:
+    # SQLite does not store timezones (all timestamps are written in UTC)
+    if x.tzinfo is None:
+        return x.replace(tzinfo=UTC)
     else:
-        value_to_write = value
+        return x
+
+
+def _row_to_entry(row: dict, is_json: bool) -> tuple[CacheEntry, int]:
+    # Returns the entry and the size of its (plain) value
+    headers = row.get("response_headers")
+    plain_value = _plain_value(row)
+    entry = CacheEntry(
+        value=_decode(plain_value, is_json=is_json),
+        fetched_at=_as_utc(row["fetched_at"]),
+        response_headers=json.loads(headers) if headers else dict(),
+    )
+    return entry, len(plain_value)
+
+
+def _write_retry_delay(n_failures: int) -> float:
+    # Exponential backoff, bounded (as the database may stay locked for long)
+    return min(
+        SETTINGS.SQLITE_WRITE_RETRY_MAX_BACKOFF_SECONDS,
+        # (with a bounded exponent, for the delay to not overflow)
+        SETTINGS.SQLITE_WRITE_RETRY_BACKOFF_SECONDS * 2 ** min(n_failures - 1, 32),
+    )
+
+
+class CacheDatabase:
+    """
+    SQLite-backed cache with bulk access and a write-behind queue
 
-    with Session(_ENGINE) as session:
-        session.add(
-            Cache(id=key, value=value_to_write, fetched_at=datetime.now(tz=UTC))
+    All writes go through a single writer thread, which commits pending rows in
+    batches (of up to "batch_size" rows, at least every "flush_interval" seconds).
+    Pending rows are served to readers before they reach the database.
+
+    Decoded entries are kept in a memory tier bounded to "memory_budget_mb" (0 to disable).
+
+    The database is bounded to "max_size_mb" (if not None) by evicting entries.
+    """
+
+    def __init__(
+        self,
+        db_path: str | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        codec: str | None = "default",
+        memory_budget_mb: float | None = None,
+        max_size_mb: float | None = "default",
+    ):
+        self.engine = _open_engine_and_create_database_if_missing(db_path)
+        if codec == "default":
+            codec = SETTINGS.SQLITE_COMPRESSION
+        self.codec = parse_codec(codec)
+        if batch_size is None:
+            batch_size = SETTINGS.SQLITE_WRITE_BATCH_SIZE
+        if flush_interval is None:
+            flush_interval = SETTINGS.SQLITE_WRITE_FLUSH_INTERVAL
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        if memory_budget_mb is None:
+            memory_budget_mb = SETTINGS.CACHE_MEMORY_BUDGET_MB
+        self.memory = MemoryCache(max_bytes=int(memory_budget_mb * 1e6))
+        self.sqlite_hits = 0
+        self.sqlite_misses = 0
+        if max_size_mb == "default":
+            max_size_mb = SETTINGS.SQLITE_MAX_SIZE_MB
+        self.max_size_bytes = None if max_size_mb is None else int(max_size_mb * 1e6)
+        self._bytes_written_since_size_check = 0
+
+        self._pending: dict[str, dict] = dict()
+        self._in_flight: dict[str, dict] = dict()
+        # Failed attempts at writing rows (retried with backoff, up to a limit)
+        self._write_attempts: dict[str, int] = dict()
+        self._consecutive_write_failures = 0
+        self.dropped_rows = 0
+        self._touched: dict[str, datetime] = dict()
+        # Entries revalidated (new fetch time and headers, with the same value)
+        self._refreshed: dict[str, tuple[datetime, str | None]] = dict()
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._writer: threading.Thread | None = None
+
+    # Reading
+    def _pending_row(self, key: str) -> dict | None:
+        row = self._pending.get(key)
+        if row is None:
+            row = self._in_flight.get(key)
+        return row
+
+    def load(self, key: str, is_json: bool) -> dict | str | None:
+        return self.load_many([key], is_json=is_json).get(key)
+
+    def load_many(self, keys: list[str], is_json: bool) -> dict[str, dict | str]:
+        """Loads multiple keys at once (keys not in the cache are absent from the output)
+
+        :param keys: keys to load
+        :param is_json: if the values are to be decoded from JSON
+        :return: dictionary with the values found in the cache
+        """
+        return {k: v.value for k, v in self.load_entries(keys, is_json).items()}
+
+    def load_entry(self, key: str, is_json: bool) -> CacheEntry | None:
+        return self.load_entries([key], is_json=is_json).get(key)
+
+    def load_entries(self, keys: list[str], is_json: bool) -> dict[str, CacheEntry]:
+        """Same as load_many, but including the metadata of the entries"""
+        out = dict()
+        raw = dict()
+        missing = []
+        for k in dict.fromkeys(keys):
+            entry = self.memory.get((k, is_json))
+            if entry is not None:
+                out[k] = entry
+                continue
+            with self._condition:
+                row = self._pending_row(k)
+            if row is None:
+                missing.append(k)
+            else:
+                raw[k] = row
+
+        n_pending = len(raw)
+        with Session(self.engine) as session:
+            for i in range(0, len(missing), _MAX_KEYS_PER_QUERY):
+                chunk = missing[i : i + _MAX_KEYS_PER_QUERY]
+                res = session.exec(select(Cache).where(Cache.id.in_(chunk))).all()
+                for r in res:
+                    raw[r.id] = r.model_dump()
+        n_found_in_sqlite = len(raw) - n_pending
+        with self._condition:
+            self.sqlite_hits += n_found_in_sqlite
+            self.sqlite_misses += len(missing) - n_found_in_sqlite
+        if n_found_in_sqlite > 0:
+            self._touch([k for k in missing if k in raw])
+
+        for k, v in raw.items():
+            entry, size = _row_to_entry(v, is_json=is_json)
+            self.memory.put((k, is_json), entry, size=size)
+            out[k] = entry
+        return out
+
+    def statistics(self) -> dict[str, dict[str, int]]:
+        """Hit/miss counters of the tiers of the cache"""
+        return dict(
+            memory=self.memory.statistics(),
+            sqlite=dict(hits=self.sqlite_hits, misses=self.sqlite_misses),
+        )
+
+    # Writing
+    def save(
+        self,
+        key: str,
+        value: dict | str,
+        is_json: bool,
+        response_headers: dict[str, str] | None = None,
+    ) -> None:
+        self.save_many(
+            {key: value},
+            is_json=is_json,
+            response_headers=(
+                None if response_headers is None else {key: response_headers}
+            ),
         )
-        session.commit()
+
+    def save_many(
+        self,
+        values: dict[str, dict | str],
+        is_json: bool,
+        response_headers: dict[str, dict[str, str]] | None = None,
+    ) -> None:
+        """Queues values for writing to the cache (committed in batches by the writer)
+
+        :param values: dictionary of the values to save by key
+        :param is_json: if the values are to be encoded as JSON
+        :param response_headers: headers to store alongside the values (by key), defaults to None
+        """
+        if response_headers is None:
+            response_headers = dict()
+        now = datetime.now(tz=UTC)
+        rows = dict()
+        for k, v in values.items():
+            headers_k = response_headers.get(k)
+            plain_value = _encode(v, is_json=is_json)
+            rows[k] = dict(
+                id=k,
+                fetched_at=now,
+                last_accessed_at=now,
+                response_headers=json.dumps(headers_k) if headers_k else None,
+                **_stored_value(plain_value, codec=self.codec),
+            )
+            self.memory.put(
+                (k, is_json),
+                CacheEntry(
+                    value=v, fetched_at=now, response_headers=dict(headers_k or {})
+                ),
+                size=len(plain_value),
+            )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot write to a closed cache database")
+            self._pending.update(rows)
+            for k in rows.keys():
+                # (superseded by the new values)
+                self._refreshed.pop(k, None)
+            self._ensure_writer_is_running()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+
+    def refresh(
+        self,
+        key: str,
+        is_json: bool,
+        response_headers: dict[str, str] | None = None,
+    ) -> None:
+        """Marks an entry as fetched now, without rewriting its value
+
+        (e.g. after a "304 Not Modified" answer to the revalidation of the entry)
+
+        :param key: key of the entry
+        :param is_json: if the value is JSON (as when it was saved)
+        :param response_headers: headers to store alongside the value, defaults to None
+        """
+        now = datetime.now(tz=UTC)
+        headers_json = json.dumps(response_headers) if response_headers else None
+        entry = self.memory.get((key, is_json))
+        if entry is not None:
+            self.memory.update(
+                (key, is_json),
+                CacheEntry(
+                    value=entry.value,
+                    fetched_at=now,
+                    response_headers=dict(response_headers or {}),
+                ),
+            )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot write to a closed cache database")
+            row = self._pending.get(key)
+            if row is not None:
+                self._pending[key] = row | dict(
+                    fetched_at=now, response_headers=headers_json
+                )
+            else:
+                # (written after the rows in flight, if the entry is one of them)
+                self._refreshed[key] = (now, headers_json)
+            self._ensure_writer_is_running()
+
+    def flush(self) -> None:
+        """Blocks until all pending writes are committed to the database"""
+        with self._condition:
+            if self._writer is None:
+                return
+            while self._pending or self._in_flight or self._refreshed or self._touched:
+                self._flush_requested = True
+                self._condition.notify_all()
+                self._condition.wait(timeout=self.flush_interval)
+                if not self._writer.is_alive():
+                    break
+
+    def close(self) -> None:
+        """Flushes pending writes and stops the writer thread"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.engine.dispose()
+
+    # Writer thread
+    def _ensure_writer_is_running(self) -> None:
+        if (self._writer is None) or (not self._writer.is_alive()):
+            self._writer = threading.Thread(
+                target=self._writer_loop,
+                name="oss4climate-cache-writer",
+                daemon=True,
+            )
+            self._writer.start()
+
+    def _touch(self, keys: list[str]) -> None:
+        # Access times are written by the writer thread as well
+        now = datetime.now(tz=UTC)
+        with self._condition:
+            if self._closed:
+                return
+            for k in keys:
+                self._touched[k] = now
+            # (also in sessions only reading, for the access times to be saved)
+            self._ensure_writer_is_running()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._condition:
+                if (len(self._pending) < self.batch_size) and not (
+                    self._flush_requested or self._closed
+                ):
+                    self._condition.wait(timeout=self.flush_interval)
+                if not (self._pending or self._touched or self._refreshed):
+                    self._flush_requested = False
+                    self._condition.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                keys = list(self._pending.keys())[: self.batch_size]
+                for k in keys:
+                    self._in_flight[k] = self._pending.pop(k)
+                batch = list(self._in_flight.values())
+                touched = self._touched
+                self._touched = dict()
+                refreshed = dict(self._refreshed)
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                # (e.g. "database is locked", with other processes writing)
+                self._requeue_failed_batch(batch, e)
+            else:
+                with self._condition:
+                    self._consecutive_write_failures = 0
+                    for r in batch:
+                        self._write_attempts.pop(r["id"], None)
+            try:
+                if touched:
+                    self._write_access_times(touched)
+            except Exception as e:
+                log_warning(
+                    f"Failed writing the access times of {len(touched)} cache entries ({e})"
+                )
+            try:
+                if refreshed:
+                    self._write_refreshed(refreshed)
+            except Exception as e:
+                log_warning(
+                    f"Failed writing the fetch times of {len(refreshed)} cache entries ({e})"
+                )
+            with self._condition:
+                for k, v in refreshed.items():
+                    # (unless refreshed again meanwhile)
+                    if self._refreshed.get(k) is v:
+                        del self._refreshed[k]
+            try:
+                if self._size_check_is_due(batch):
+                    self._evict_to_size(self.max_size_bytes)
+            except Exception as e:
+                log_warning(f"Failed bounding the size of the cache ({e})")
+
+            with self._condition:
+                self._in_flight.clear()
+                self._condition.notify_all()
+                n_failures = self._consecutive_write_failures
+            if n_failures > 0:
+                # Backoff before retrying
+                time.sleep(_write_retry_delay(n_failures))
+
+    def _requeue_failed_batch(self, batch: list[dict], error: Exception) -> None:
+        # Rows are written again later (unless a newer value was saved meanwhile), and
+        #  only dropped after SETTINGS.SQLITE_WRITE_RETRY_ATTEMPTS attempts
+        n_dropped = 0
+        with self._condition:
+            self._consecutive_write_failures += 1
+            for r in batch:
+                k = r["id"]
+                if k in self._pending:
+                    self._write_attempts.pop(k, None)
+                    continue
+                n_attempts = self._write_attempts.get(k, 0) + 1
+                if n_attempts >= SETTINGS.SQLITE_WRITE_RETRY_ATTEMPTS:
+                    self._write_attempts.pop(k, None)
+                    n_dropped += 1
+                else:
+                    self._write_attempts[k] = n_attempts
+                    self._pending[k] = r
+            self.dropped_rows += n_dropped
+            if n_dropped > 0:
+                # (the backoff starting over for the next rows)
+                self._consecutive_write_failures = 0
+        if n_dropped > 0:
+            log_warning(
+                f"Failed writing {len(batch)} rows to the cache ({error}),"
+                f" {n_dropped} rows dropped after"
+                f" {SETTINGS.SQLITE_WRITE_RETRY_ATTEMPTS} attempts"
+                f" ({self.dropped_rows} in total)"
+            )
+        else:
+            log_warning(
+                f"Failed writing {len(batch)} rows to the cache ({error}), retrying"
+            )
+
+    def _size_check_is_due(self, batch: list[dict]) -> bool:
+        if self.max_size_bytes is None:
+            return False
+        for r in batch:
+            self._bytes_written_since_size_check += len(r["value"]) + len(
+                r["compressed_value"] or b""
+            )
+        # Checking the size after every 5% of the cap written
+        if self._bytes_written_since_size_check > self.max_size_bytes / 20:
+            self._bytes_written_since_size_check = 0
+            return True
+        else:
+            return False
+
+    def _write_batch(self, rows: list[dict]) -> None:
+        statement = insert(Cache)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cache.id],
+            set_={
+                c.name: statement.excluded[c.name]
+                for c in Cache.__table__.columns
+                if c.name != "id"
+            },
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement, rows)
+
+    def _write_access_times(self, touched: dict[str, datetime]) -> None:
+        table = Cache.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(last_accessed_at=bindparam("b_last_accessed_at"))
+        )
+        with self.engine.begin() as connection:
+            connection.execute(
+                statement,
+                [dict(b_id=k, b_last_accessed_at=v) for k, v in touched.items()],
+            )
+
+    def _write_refreshed(self, refreshed: dict[str, tuple[datetime, str | None]]):
+        table = Cache.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                fetched_at=bindparam("b_fetched_at"),
+                response_headers=bindparam("b_response_headers"),
+            )
+        )
+        with self.engine.begin() as connection:
+            connection.execute(
+                statement,
+                [
+                    dict(b_id=k, b_fetched_at=v[0], b_response_headers=v[1])
+                    for k, v in refreshed.items()
+                ],
+            )
+
+    # Maintenance
+    def _delete(self, keys: list[str]) -> int:
+        table = Cache.__table__
+        with self.engine.begin() as connection:
+            for i in range(0, len(keys), _MAX_KEYS_PER_QUERY):
+                chunk = keys[i : i + _MAX_KEYS_PER_QUERY]
+                connection.execute(delete(table).where(table.c.id.in_(chunk)))
+        for k in keys:
+            self.memory.discard((k, True))
+            self.memory.discard((k, False))
+        return len(keys)
+
+    def _entries_sizes(self) -> list[tuple[str, int, str]]:
+        # Returns (key, size, last access) for all entries
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT id, {_SQL_ENTRY_SIZE},"
+                    " IFNULL(last_accessed_at, fetched_at)"
+                    f" FROM {Cache.__tablename__}"
+                )
+            ).all()
+        return [(r[0], r[1], r[2]) for r in rows]
+
+    def size_on_disk(self) -> int:
+        with self.engine.connect() as connection:
+            page_count = connection.exec_driver_sql("PRAGMA page_count").scalar()
+            page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        return page_count * page_size
+
+    def statistics_by_url_class(self) -> dict[str, dict[str, int]]:
+        """Number of entries and bytes stored by URL class (see policies.CACHE_POLICIES)"""
+        self.flush()
+        out = dict()
+        for key, size, __ in self._entries_sizes():
+            x = out.setdefault(cache_policy_for(key).name, dict(entries=0, bytes=0))
+            x["entries"] += 1
+            x["bytes"] += size
+        return out
+
+    def evict(
+        self,
+        pattern: str | None = None,
+        url_class: str | None = None,
+        older_than: timedelta | None = None,
+    ) -> int:
+        """Removes the entries matching all the given criteria
+
+        :param pattern: glob pattern on the URL (e.g. "*/pulls*"), defaults to None
+        :param url_class: name of the URL class (see policies.CACHE_POLICIES), defaults to None
+        :param older_than: minimal age since the entries were last fetched, defaults to None
+        :return: number of entries removed
+        """
+        self.flush()
+        table = Cache.__table__
+        statement = select(table.c.id)
+        if pattern is not None:
+            statement = statement.where(table.c.id.op("GLOB")(pattern))
+        if older_than is not None:
+            statement = statement.where(
+                table.c.fetched_at < datetime.now(tz=UTC) - older_than
+            )
+        with self.engine.connect() as connection:
+            keys = [r[0] for r in connection.execute(statement).all()]
+        if url_class is not None:
+            keys = [k for k in keys if cache_policy_for(k).name == url_class]
+        return self._delete(keys)
+
+    def enforce_size_cap(self, max_size_mb: float | None = None) -> int:
+        """Evicts entries until the size of the stored entries fits within the cap
+
+        :param max_size_mb: size cap, defaults to the one of the database
+        :return: number of entries removed
+        """
+        self.flush()
+        if max_size_mb is None:
+            max_bytes = self.max_size_bytes
+        else:
+            max_bytes = int(max_size_mb * 1e6)
+        if max_bytes is None:
+            return 0
+        return self._evict_to_size(max_bytes)
+
+    def _evict_to_size(self, max_bytes: int) -> int:
+        entries = self._entries_sizes()
+        total = sum(i[1] for i in entries)
+        if total <= max_bytes:
+            return 0
+        # Lowest priority classes go first, then least recently used entries
+        entries.sort(
+            key=lambda x: (cache_policy_for(x[0]).eviction_priority, str(x[2]))
+        )
+        to_delete = []
+        for key, size, __ in entries:
+            if total <= max_bytes:
+                break
+            to_delete.append(key)
+            total -= size
+        log_info(f"Evicting {len(to_delete)} entries to fit the cache size cap")
+        return self._delete(to_delete)
+
+    def recompress(self, codec: str | None = "default", batch_size: int = 1000) -> int:
+        """Re-encodes the stored values with the given codec (e.g. to compress a legacy database)
+
+        :param codec: codec to use, defaults to the codec of the database
+        :param batch_size: number of rows updated per transaction, defaults to 1000
+        :return: number of rows re-encoded
+        """
+        if codec == "default":
+            codec = self.codec
+        codec = parse_codec(codec)
+        self.flush()
+
+        table = Cache.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                value=bindparam("b_value"),
+                codec=bindparam("b_codec"),
+                compressed_value=bindparam("b_compressed_value"),
+            )
+        )
+        n_updated = 0
+        last_id = ""
+        while True:
+            with self.engine.begin() as connection:
+                rows = connection.execute(
+                    text(
+                        f"SELECT id, value, codec, compressed_value FROM {table.name}"
+                        " WHERE id > :last_id ORDER BY id LIMIT :n"
+                    ),
+                    dict(last_id=last_id, n=batch_size),
+                ).all()
+                if len(rows) == 0:
+                    break
+                last_id = rows[-1].id
+                updates = []
+                for r in rows:
+                    new = _stored_value(_plain_value(r._asdict()), codec=codec)
+                    if new["codec"] != r.codec:
+                        updates.append(
+                            {f"b_{k}": v for k, v in new.items()} | {"b_id": r.id}
+                        )
+                if updates:
+                    connection.execute(statement, updates)
+                    n_updated += len(updates)
+        return n_updated
+
+    def vacuum(self) -> None:
+        """Rebuilds the database file to reclaim the space of deleted or shrunk rows"""
+        self.flush()
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+
+
+# -------------------------------------------------------------------------------------
+# Process-wide database
+# -------------------------------------------------------------------------------------
+_DATABASE: CacheDatabase | None = None
+_DATABASE_PID: int | None = None
+_DATABASE_LOCK = threading.Lock()
+
+
+def get_database() -> CacheDatabase:
+    """Returns the cache database of the current process (opened on first use)"""
+    global _DATABASE, _DATABASE_PID
+    with _DATABASE_LOCK:
+        # Connections and threads cannot be shared with forked processes
+        if (_DATABASE is None) or (_DATABASE_PID != os.getpid()):
+            _DATABASE = CacheDatabase()
+            _DATABASE_PID = os.getpid()
+        return _DATABASE
+
+
+def _flush_at_exit() -> None:
+    if (_DATABASE is not None) and (_DATABASE_PID == os.getpid()):
+        _DATABASE.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+# -------------------------------------------------------------------------------------
+# Actual methods
+# -------------------------------------------------------------------------------------
+def load_from_database(key: str, is_json: bool) -> dict | None:
+    return get_database().load(key, is_json=is_json)
+
+
+def save_to_database(
+    key: str,
+    value: dict,
+    is_json: bool,
+    response_headers: dict[str, str] | None = None,
+) -> None:
+    get_database().save(key, value, is_json=is_json, response_headers=response_headers)
+
+
+def refresh_in_database(
+    key: str, is_json: bool, response_headers: dict[str, str] | None = None
+) -> None:
+    get_database().refresh(key, is_json=is_json, response_headers=response_headers)
+
+
+def load_entry_from_database(key: str, is_json: bool) -> CacheEntry | None:
+    return get_database().load_entry(key, is_json=is_json)
+
+
+def load_many(keys: list[str], is_json: bool) -> dict[str, dict | str]:
+    return get_database().load_many(keys, is_json=is_json)
+
+
+def load_entries_from_database(keys: list[str], is_json: bool) -> dict[str, CacheEntry]:
+    return get_database().load_entries(keys, is_json=is_json)
+
+
+def save_many(values: dict[str, dict | str], is_json: bool) -> None:
+    get_database().save_many(values, is_json=is_json)
+
+
+def flush_database() -> None:
+    get_database().flush()
+
+
+def cache_statistics() -> dict[str, dict[str, int]]:
+    return get_database().statistics()
+
+
+def evict_from_database(
+    pattern: str | None = None,
+    url_class: str | None = None,
+    older_than: timedelta | None = None,
+) -> int:
+    return get_database().evict(
+        pattern=pattern, url_class=url_class, older_than=older_than
+    )
+
+
+def vacuum_database() -> None:
+    get_database().vacuum()
+
+
+def compress_database(codec: str | None = "default") -> None:
+    """Migrates the entries of the cache to the given codec and reclaims the space freed
+
+    :param codec: codec to use, defaults to SETTINGS.SQLITE_COMPRESSION
+    """
+    db = get_database()
+    n = db.recompress(codec)
+    log_info(f"Re-encoded {n} cache entries")
+    db.vacuum()
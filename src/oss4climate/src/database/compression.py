@@ -0,0 +1,61 @@
+"""
+Module to compress the values stored in the cache
+
+Supported codecs are "zlib" (standard library) and "zstd" (requires the optional
+ "zstandard" package). The codec None leaves values uncompressed.
+"""
+
+import zlib
+from functools import lru_cache
+
+SUPPORTED_CODECS = [None, "zlib", "zstd"]
+
+# Values shorter than this are not worth compressing
+MIN_SIZE_FOR_COMPRESSION = 128
+
+
+def _check_codec(codec: str | None) -> None:
+    if codec not in SUPPORTED_CODECS:
+        raise ValueError(f"Unsupported codec ({codec}), must be in {SUPPORTED_CODECS}")
+
+
+@lru_cache(maxsize=1)
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "The 'zstandard' package is required for the 'zstd' codec (pip install zstandard)"
+        )
+    return zstandard
+
+
+def parse_codec(x: str | None) -> str | None:
+    """Converts a codec setting to a codec (where "none" or "" mean no compression)"""
+    if x is None or x.lower() in ["", "none"]:
+        return None
+    codec = x.lower()
+    _check_codec(codec)
+    return codec
+
+
+def compress(x: str, codec: str | None) -> bytes:
+    _check_codec(codec)
+    data = x.encode("utf-8")
+    if codec == "zlib":
+        return zlib.compress(data, level=6)
+    elif codec == "zstd":
+        return _zstd().ZstdCompressor(level=10).compress(data)
+    else:
+        return data
+
+
+def decompress(x: bytes, codec: str | None) -> str:
+    _check_codec(codec)
+    if codec == "zlib":
+        data = zlib.decompress(x)
+    elif codec == "zstd":
+        data = _zstd().ZstdDecompressor().decompress(x)
+    else:
+        data = x
+    return data.decode("utf-8")
@@ -0,0 +1,79 @@
+"""
+Module for the in-process memory tier of the cache
+
+It holds already-decoded values (to be treated as read-only by callers) and evicts
+ the least recently used ones once its byte budget is exceeded.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+class MemoryCache:
+    """Thread-safe LRU cache bounded by the (estimated) size in bytes of its values"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: OrderedDict[Any, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Any) -> Any | None:
+        with self._lock:
+            x = self._items.get(key)
+            if x is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return x[0]
+
+    def put(self, key: Any, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            # Values larger than the whole budget are not kept
+            self.discard(key)
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._items[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                __, (__, evicted_size) = self._items.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def update(self, key: Any, value: Any) -> None:
+        """Replaces the value of a key (if present), keeping its size"""
+        with self._lock:
+            x = self._items.get(key)
+            if x is not None:
+                self._items[key] = (value, x[1])
+
+    def discard(self, key: Any) -> None:
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def statistics(self) -> dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(self._items),
+            bytes=self.current_bytes,
+        )
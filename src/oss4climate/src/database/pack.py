@@ -0,0 +1,162 @@
+"""
+Module to export the cache to a portable pack file (and to merge packs into a cache)
+
+Layout of a pack file:
+- header: MAGIC
+- blobs: the values, zlib-compressed and stored once per SHA-256 of their content
+- index: zlib-compressed JSON with the blobs (hash -> [offset, length]) and the
+  entries ([key, fetched_at, response_headers, hash])
+- footer: offset and length of the index (little-endian uint64) followed by MAGIC
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+
+from oss4climate.src.database import (
+    Cache,
+    CacheDatabase,
+    _as_utc,
+    _plain_value,
+    _stored_value,
+)
+from oss4climate.src.database.compression import MIN_SIZE_FOR_COMPRESSION
+from oss4climate.src.log import log_info
+
+MAGIC = b"OSS4CPK\x01"
+_FOOTER = struct.Struct("<QQ")
+_PACK_CODEC = "zlib"
+_BATCH_SIZE = 1000
+
+
+def export_pack(db: CacheDatabase, file_path: str) -> int:
+    """Exports the whole cache to a pack file
+
+    :param db: cache database to export
+    :param file_path: path of the pack file to write
+    :return: number of entries exported
+    """
+    db.flush()
+    blobs = dict()
+    entries = []
+    with open(file_path, "wb") as f:
+        f.write(MAGIC)
+        last_id = ""
+        while True:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    text(
+                        "SELECT id, value, codec, compressed_value, fetched_at,"
+                        f" response_headers FROM {Cache.__tablename__}"
+                        " WHERE id > :last_id ORDER BY id LIMIT :n"
+                    ),
+                    dict(last_id=last_id, n=_BATCH_SIZE),
+                ).all()
+            if len(rows) == 0:
+                break
+            last_id = rows[-1].id
+            for r in rows:
+                plain_value = _plain_value(r._asdict()).encode("utf-8")
+                h = hashlib.sha256(plain_value).hexdigest()
+                if h not in blobs:
+                    if r.codec == _PACK_CODEC:
+                        # Already compressed in the right format
+                        data = r.compressed_value
+                    else:
+                        data = zlib.compress(plain_value, level=6)
+                    blobs[h] = [f.tell(), len(data)]
+                    f.write(data)
+                fetched_at = r.fetched_at
+                if isinstance(fetched_at, datetime):
+                    fetched_at = fetched_at.isoformat()
+                entries.append([r.id, fetched_at, r.response_headers, h])
+
+        index = zlib.compress(
+            json.dumps(dict(version=1, blobs=blobs, entries=entries)).encode("utf-8")
+        )
+        index_offset = f.tell()
+        f.write(index)
+        f.write(_FOOTER.pack(index_offset, len(index)))
+        f.write(MAGIC)
+
+    log_info(f"Exported {len(entries)} entries ({len(blobs)} unique values)")
+    return len(entries)
+
+
+def _read_index(f) -> dict:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a cache pack file (invalid header)")
+    f.seek(-(_FOOTER.size + len(MAGIC)), 2)
+    index_offset, index_length = _FOOTER.unpack(f.read(_FOOTER.size))
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a cache pack file (invalid footer)")
+    f.seek(index_offset)
+    return json.loads(zlib.decompress(f.read(index_length)))
+
+
+def import_pack(db: CacheDatabase, file_path: str, verify: bool = True) -> int:
+    """Merges a pack file into the cache (keeping the most recent version of each entry)
+
+    :param db: cache database to merge the pack into
+    :param file_path: path of the pack file
+    :param verify: if the content hashes are to be checked, defaults to True
+    :return: number of entries in the pack
+    """
+    db.flush()
+    with open(file_path, "rb") as f:
+        index = _read_index(f)
+        blobs = index["blobs"]
+        entries = index["entries"]
+
+        table = Cache.__table__
+        for i in range(0, len(entries), _BATCH_SIZE):
+            rows = []
+            for key, fetched_at, response_headers, h in entries[i : i + _BATCH_SIZE]:
+                offset, length = blobs[h]
+                f.seek(offset)
+                data = f.read(length)
+                plain_value = None
+                if verify or (db.codec != _PACK_CODEC):
+                    plain_value = zlib.decompress(data)
+                    if verify and (hashlib.sha256(plain_value).hexdigest() != h):
+                        raise ValueError(f"Corrupted value in pack for {key}")
+                if (db.codec == _PACK_CODEC) and (
+                    (plain_value is None)
+                    or (len(plain_value) >= MIN_SIZE_FOR_COMPRESSION)
+                ):
+                    # Storing the compressed value as is
+                    stored = dict(value="", codec=_PACK_CODEC, compressed_value=data)
+                else:
+                    stored = _stored_value(plain_value.decode("utf-8"), db.codec)
+                rows.append(
+                    dict(
+                        id=key,
+                        fetched_at=_as_utc(datetime.fromisoformat(fetched_at)),
+                        response_headers=response_headers,
+                        last_accessed_at=None,
+                        **stored,
+                    )
+                )
+
+            # Entries already in the cache are only replaced by more recent ones
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={
+                    c.name: statement.excluded[c.name]
+                    for c in table.columns
+                    if c.name not in ["id", "last_accessed_at"]
+                },
+                where=table.c.fetched_at < statement.excluded.fetched_at,
+            )
+            with db.engine.begin() as connection:
+                connection.execute(statement, rows)
+
+    db.memory.clear()
+    log_info(f"Merged {len(entries)} entries from {file_path}")
+    return len(entries)
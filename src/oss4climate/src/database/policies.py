@@ -0,0 +1,106 @@
+"""
+Module defining how cached web resources are managed, by class of URL
+
+Each class sets how long its entries remain valid, and how early they are evicted
+ when the cache exceeds its size cap (classes with the lowest priority go first).
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    name: str
+    pattern: re.Pattern
+    ttl: timedelta | None  # None means that the entry never expires
+    eviction_priority: int = 1
+
+
+# The first matching policy applies (the last one is the fallback)
+CACHE_POLICIES = [
+    CachePolicy(
+        name="github_commits",
+        pattern=re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+/commits"),
+        ttl=timedelta(days=1),
+        eviction_priority=1,
+    ),
+    CachePolicy(
+        name="github_pulls",
+        pattern=re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+/pulls"),
+        ttl=timedelta(days=1),
+        eviction_priority=0,
+    ),
+    CachePolicy(
+        name="github_branches",
+        pattern=re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+/branches"),
+        ttl=timedelta(days=7),
+        eviction_priority=1,
+    ),
+    CachePolicy(
+        name="github_trees",
+        pattern=re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+/git/trees/"),
+        ttl=timedelta(days=30),
+        eviction_priority=0,
+    ),
+    CachePolicy(
+        name="github_repositories",
+        pattern=re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+/?$"),
+        ttl=timedelta(days=1),
+        eviction_priority=2,
+    ),
+    CachePolicy(
+        name="github_organisations",
+        pattern=re.compile(r"^https://api\.github\.com/(orgs|users)/"),
+        ttl=timedelta(days=7),
+        eviction_priority=2,
+    ),
+    CachePolicy(
+        name="github_graphql",
+        pattern=re.compile(r"^https://api\.github\.com/graphql"),
+        ttl=timedelta(days=1),
+        eviction_priority=2,
+    ),
+    CachePolicy(
+        name="github_raw_files",
+        pattern=re.compile(r"^https://raw\.githubusercontent\.com/"),
+        ttl=timedelta(days=7),
+        eviction_priority=2,
+    ),
+    CachePolicy(
+        name="gitlab_merge_requests",
+        pattern=re.compile(r"^https://[^/]+/api/v4/projects/[^/]+/merge_requests"),
+        ttl=timedelta(days=1),
+        eviction_priority=0,
+    ),
+    CachePolicy(
+        name="gitlab_api",
+        pattern=re.compile(r"^https://[^/]+/api/v4/"),
+        ttl=timedelta(days=1),
+        eviction_priority=2,
+    ),
+    CachePolicy(
+        name="default",
+        pattern=re.compile(r".*"),
+        ttl=timedelta(days=7),
+        eviction_priority=1,
+    ),
+]
+
+
+@lru_cache(maxsize=100_000)
+def cache_policy_for(url: str) -> CachePolicy:
+    for p in CACHE_POLICIES:
+        if p.pattern.match(url):
+            return p
+    return CACHE_POLICIES[-1]
+
+
+def cache_policy_names() -> list[str]:
+    return [p.name for p in CACHE_POLICIES]
+
+
+def cache_ttl_for(url: str) -> timedelta | None:
+    return cache_policy_for(url).ttl
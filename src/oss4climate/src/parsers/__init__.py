@@ -3,19 +3,45 @@ Module for parsers and web I/O
 """
 
 import re
-import time
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+from datetime import UTC, datetime
 
 import requests
 import tomllib
-from bs4 import BeautifulSoup
-from tomlkit import document, dump
 
-from oss4climate.src.database import load_from_database, save_to_database
+from oss4climate.src.database import (
+    load_entry_from_database,
+    refresh_in_database,
+    save_to_database,
+)
+from oss4climate.src.database.policies import cache_ttl_for
 from oss4climate.src.helpers import sorted_list_of_unique_elements
-from oss4climate.src.log import log_info
-
-WEB_SESSION = requests.Session()
+from oss4climate.src.log import log_info, log_warning
+from oss4climate.src.parsers.html_links import extract_links
+from oss4climate.src.parsers.markdown_links import iter_markdown_links
+from oss4climate.src.parsers.urls import (
+    Forge,
+    TargetType,
+    canonicalise_url,
+    canonicalise_urls,
+    url_key,
+)
+from oss4climate.src.toml_io import insert_into_toml_arrays, write_toml
+from oss4climate.src.web import WEB_SESSION, scheduled_get  # noqa: F401
+
+# Response headers stored in the cache (lower case, as used for lookups)
+_CACHED_RESPONSE_HEADERS = [
+    "etag",
+    "last-modified",
+    "link",
+    "x-total",
+    "x-total-pages",
+]
+
+
+def _response_headers_to_cache(r: requests.Response) -> dict[str, str]:
+    return {k: r.headers[k] for k in _CACHED_RESPONSE_HEADERS if k in r.headers}
 
 
 def _cached_web_get(
@@ -23,32 +49,68 @@ def _cached_web_get(
     headers: dict | None = None,
     wait_after_web_query: bool = True,
     is_json: bool = True,
-) -> dict | str:
+    with_response_headers: bool = False,
+) -> dict | str | tuple[dict | str, dict[str, str]]:
     # Uses the cache to ensure that requests are minimised
-    out = load_from_database(url, is_json=is_json)
-    if out is None:
-        log_info(f"Web GET: {url}")
-        r = WEB_SESSION.get(
-            url=url,
-            headers=headers,
-        )
-        if is_json:
+    cached = load_entry_from_database(url, is_json=is_json)
+    if cached is not None:
+        ttl = cache_ttl_for(url)
+        if (ttl is None) or (datetime.now(tz=UTC) - cached.fetched_at < ttl):
+            log_info(f"Cache-loading: {url}")
+            if with_response_headers:
+                return cached.value, cached.response_headers
+            return cached.value
+
+    # Stale entries are revalidated (servers answer "304 Not Modified" if unchanged)
+    request_headers = dict() if headers is None else dict(headers)
+    if cached is not None:
+        if "etag" in cached.response_headers:
+            request_headers["If-None-Match"] = cached.response_headers["etag"]
+        if "last-modified" in cached.response_headers:
+            request_headers["If-Modified-Since"] = cached.response_headers[
+                "last-modified"
+            ]
+
+    log_info(f"Web GET: {url}")
+    # The pace of requests is set by the scheduler (to respect the rate limits of APIs
+    #  and be nice to servers)
+    try:
+        r = scheduled_get(url, headers=request_headers, throttle=wait_after_web_query)
+        if r.status_code >= 500:
             r.raise_for_status()
-            out = r.json()
-        else:
-            if r.status_code == 404:
-                log_info(f"> No resource found for: {url}")
-                out = "(None)"
-            else:
-                r.raise_for_status()
-                out = r.text
-        save_to_database(url, out, is_json=is_json)
-        if wait_after_web_query:
-            time.sleep(
-                0.1
-            )  # To avoid triggering rate limits on APIs and be nice to servers
+    except requests.exceptions.RequestException as e:
+        if cached is None:
+            raise
+        # Network failures and server errors do not prevent using the stale entry
+        log_warning(f"> Revalidation failed for {url} ({e}), using the cached value")
+        if with_response_headers:
+            return cached.value, cached.response_headers
+        return cached.value
+
+    if (cached is not None) and (r.status_code == 304):
+        log_info(f"> Not modified: {url}")
+        response_headers = cached.response_headers | _response_headers_to_cache(r)
+        # (only the fetch time and the headers are updated, not the value)
+        refresh_in_database(url, is_json=is_json, response_headers=response_headers)
+        if with_response_headers:
+            return cached.value, response_headers
+        return cached.value
+    elif is_json:
+        r.raise_for_status()
+        out = r.json()
+        response_headers = _response_headers_to_cache(r)
     else:
-        log_info(f"Cache-loading: {url}")
+        if r.status_code == 404:
+            log_info(f"> No resource found for: {url}")
+            out = "(None)"
+            response_headers = None
+        else:
+            r.raise_for_status()
+            out = r.text
+            response_headers = _response_headers_to_cache(r)
+    save_to_database(url, out, is_json=is_json, response_headers=response_headers)
+    if with_response_headers:
+        return out, (response_headers or dict())
     return out
 
 
@@ -63,6 +125,22 @@ def cached_web_get_json(
     )
 
 
+def cached_web_get_json_with_headers(
+    url: str, headers: dict | None = None, wait_after_web_query: bool = True
+) -> tuple[dict, dict[str, str]]:
+    """Same as cached_web_get_json, also returning the response headers kept in cache
+
+    (keys of the headers are in lower case, see _CACHED_RESPONSE_HEADERS)
+    """
+    return _cached_web_get(
+        url=url,
+        headers=headers,
+        wait_after_web_query=wait_after_web_query,
+        is_json=True,
+        with_response_headers=True,
+    )
+
+
 def cached_web_get_text(
     url: str, headers: dict | None = None, wait_after_web_query: bool = True
 ) -> str:
@@ -74,6 +152,26 @@ def cached_web_get_text(
     )
 
 
+# Fields of ParsingTargets with targets that can be scraped
+_VALID_TARGET_FIELDS = [
+    "github_organisations",
+    "github_repositories",
+    "gitlab_groups",
+    "gitlab_projects",
+]
+
+
+def _sorted_unique_urls_by_key(x: list[str]) -> dict[str, str]:
+    # Sorted URLs by key, keeping the first of the URLs with the same key
+    #  (variants of URLs, see canonicalise_url, having the same key)
+    out = dict()
+    for i in sorted(set(x)):
+        k = url_key(i)
+        if k not in out:
+            out[k] = i
+    return out
+
+
 @dataclass
 class ParsingTargets:
     """
@@ -120,45 +218,58 @@ class ParsingTargets:
     def ensure_sorted_and_unique_elements(self) -> None:
         """
         Sorts all fields alphabetically and ensures that there is no redundancies in them
+        (URLs only differing by case or trailing "/" being redundant)
         """
-        self.github_repositories = sorted_list_of_unique_elements(
-            self.github_repositories
-        )
-        self.github_organisations = sorted_list_of_unique_elements(
-            self.github_organisations
-        )
-        self.gitlab_groups = sorted_list_of_unique_elements(self.gitlab_groups)
-        self.gitlab_projects = sorted_list_of_unique_elements(self.gitlab_projects)
-        self.unknown = sorted_list_of_unique_elements(self.unknown)
-        self.invalid = sorted_list_of_unique_elements(self.invalid)
-
-    def __included_in_valid_targets(self, url: str) -> bool:
-        return (
-            url
-            in self.github_organisations
-            + self.github_repositories
-            + self.gitlab_groups
-            + self.gitlab_projects
-        )
+        self._sort_and_index_fields()
+
+    def _sort_and_index_fields(self) -> dict[str, dict[str, str]]:
+        # Same as ensure_sorted_and_unique_elements, returning the URLs of each field
+        #  by key (for the keys to be computed once)
+        out = dict()
+        for f in _PARSING_TARGETS_TOML_ARRAYS.keys():
+            out[f] = _sorted_unique_urls_by_key(getattr(self, f))
+            setattr(self, f, list(out[f].values()))
+        return out
+
+    def index(self, fields: list[str] | None = None) -> dict[str, str]:
+        """Indexes the targets by URL key (lower case, without trailing "/")
+
+        :param fields: fields to index, defaults to the fields of valid targets
+        :return: name of the field of each target (the first one, if in several fields)
+        """
+        if fields is None:
+            fields = _VALID_TARGET_FIELDS
+        out = dict()
+        for f in fields:
+            for i in getattr(self, f):
+                out.setdefault(url_key(i), f)
+        return out
 
     def cleanup(self) -> None:
         """
         Method to cleanup the object (removing obsolete entries and redundancies)
         """
-        self.ensure_sorted_and_unique_elements()
+        by_key = self._sort_and_index_fields()
         # Removing all repos that are listed in organisations/groups
+        organisations = by_key["github_organisations"]
         self.github_repositories = [
-            i for i in self.github_repositories if i not in self.github_organisations
+            v
+            for k, v in by_key["github_repositories"].items()
+            if k not in organisations
         ]
+        groups = by_key["gitlab_groups"]
         self.gitlab_projects = [
-            i for i in self.gitlab_projects if i not in self.gitlab_groups
+            v for k, v in by_key["gitlab_projects"].items() if k not in groups
         ]
-        # Removing unknown repos
+        # Removing unknown repos (the keys of removed repos being valid targets anyway)
+        valid_targets = set()
+        for f in _VALID_TARGET_FIELDS:
+            valid_targets.update(by_key[f].keys())
         self.unknown = [
-            i for i in self.unknown if not self.__included_in_valid_targets(i)
+            v for k, v in by_key["unknown"].items() if k not in valid_targets
         ]
         self.invalid = [
-            i for i in self.invalid if not self.__included_in_valid_targets(i)
+            v for k, v in by_key["invalid"].items() if k not in valid_targets
         ]
 
     @staticmethod
@@ -170,12 +281,10 @@ class ParsingTargets:
             x = tomllib.load(f)
 
         return ParsingTargets(
-            github_organisations=x["github_hosted"].get("organisations", []),
-            github_repositories=x["github_hosted"].get("repositories", []),
-            gitlab_groups=x["gitlab_hosted"].get("groups", []),
-            gitlab_projects=x["gitlab_hosted"].get("projects", []),
-            unknown=x["dropped_targets"].get("urls", []),
-            invalid=x["dropped_targets"].get("invalid_urls", []),
+            **{
+                f: x[table].get(key, [])
+                for f, (table, key) in _PARSING_TARGETS_TOML_ARRAYS.items()
+            }
         )
 
     def to_toml(self, toml_file_path: str) -> None:
@@ -183,62 +292,78 @@ class ParsingTargets:
             raise ValueError("Output must be a TOML file")
 
         # Outputting to a new TOML
-        doc = document()
-        toml_ready_dict = {
-            "github_hosted": {
-                "organisations": self.github_organisations,
-                "repositories": self.github_repositories,
-            },
-            "gitlab_hosted": {
-                "groups": self.gitlab_groups,
-                "projects": self.gitlab_projects,
-            },
-            "dropped_targets": {
-                "urls": self.unknown,
-                "invalid_urls": self.invalid,
-            },
-        }
+        toml_ready_dict = dict()
+        for f, (table, key) in _PARSING_TARGETS_TOML_ARRAYS.items():
+            toml_ready_dict.setdefault(table, dict())[key] = getattr(self, f)
+        write_toml(toml_ready_dict, toml_file_path)
 
-        for k, v in toml_ready_dict.items():
-            doc.add(k, v)
+    def add_to_toml(self, toml_file_path: str) -> None:
+        """Adds the targets to an existing TOML file (without rewriting the whole file)
 
-        with open(toml_file_path, "w") as fp:
-            dump(doc, fp, sort_keys=True)
+        Targets already in the file (as per their URL key) are skipped.
 
+        :param toml_file_path: TOML file, as written by to_toml
+        """
+        if not toml_file_path.endswith(".toml"):
+            raise ValueError("Output must be a TOML file")
 
-def identify_parsing_targets(x: list[str]) -> ParsingTargets:
-    from oss4climate.src.parsers import github_data_io, gitlab_data_io
+        existing = ParsingTargets.from_toml(toml_file_path).index(
+            list(_PARSING_TARGETS_TOML_ARRAYS.keys())
+        )
+        new_elements = dict()
+        for f, table_and_key in _PARSING_TARGETS_TOML_ARRAYS.items():
+            new_elements[table_and_key] = [
+                i for i in getattr(self, f) if url_key(i) not in existing
+            ]
+        insert_into_toml_arrays(toml_file_path, new_elements)
+
+
+# Arrays of the TOML files of ParsingTargets, as (table, key) by field
+_PARSING_TARGETS_TOML_ARRAYS = {
+    "github_organisations": ("github_hosted", "organisations"),
+    "github_repositories": ("github_hosted", "repositories"),
+    "gitlab_groups": ("gitlab_hosted", "groups"),
+    "gitlab_projects": ("gitlab_hosted", "projects"),
+    "unknown": ("dropped_targets", "urls"),
+    "invalid": ("dropped_targets", "invalid_urls"),
+}
+
+
+_TARGET_FIELDS = {
+    (Forge.GITHUB, TargetType.ORGANISATION): "github_organisations",
+    (Forge.GITHUB, TargetType.REPOSITORY): "github_repositories",
+    (Forge.GITLAB, TargetType.ORGANISATION): "gitlab_groups",
+    (Forge.GITLAB, TargetType.REPOSITORY): "gitlab_projects",
+}
+
+# Pages of Github repositories that are not worth listing (to avoid clutter)
+_IRRELEVANT_GITHUB_SUBPATH = re.compile(
+    r"(^|/)(tree|blob|actions/workflows)(/|$)|(^|/)(releases|issues)$"
+)
 
-    out_github = github_data_io.split_across_target_sets(x)
-    out_gitlab = gitlab_data_io.split_across_target_sets(out_github.unknown)
-    out_github.unknown = []
 
-    out = out_github + out_gitlab
+def identify_parsing_targets(x: list[str]) -> ParsingTargets:
+    """Sorts URLs across targets (by canonical URL, see canonicalise_url)"""
+    out = ParsingTargets()
+    for u in canonicalise_urls(x):
+        f = _TARGET_FIELDS.get((u.forge, u.target_type), "unknown")
+        getattr(out, f).append(u.url)
     return out
 
 
-def isolate_relevant_urls(urls: list[str]) -> list[str]:
-    from oss4climate.src.parsers.github_data_io import GITHUB_URL_BASE
-    from oss4climate.src.parsers.gitlab_data_io import GITLAB_ANY_URL_PREFIX
-
-    def __f(i) -> bool:
-        if i.startswith(GITHUB_URL_BASE):
-            if (
-                ("/tree/" in i)
-                or ("/blob/" in i)
-                or ("/actions/workflows/" in i)
-                or i.endswith("/releases")
-                or i.endswith("/issues")
-            ):  # To avoid file detection leading to clutter
-                return False
-            else:
-                return True
-        elif i.startswith(GITLAB_ANY_URL_PREFIX):
-            return True
-        else:
-            return False
-
-    return [x for x in urls if __f(x)]
+def isolate_relevant_urls(urls: Iterable[str | None]) -> list[str]:
+    out = []
+    for x in urls:
+        if not x:
+            continue
+        u = canonicalise_url(x)
+        if u.forge is Forge.GITLAB:
+            out.append(x)
+        elif (u.forge is Forge.GITHUB) and (
+            _IRRELEVANT_GITHUB_SUBPATH.search(u.subpath) is None
+        ):
+            out.append(x)
+    return out
 
 
 # For listings
@@ -317,7 +442,6 @@ class ResourceListing:
             raise ValueError("Output must be a TOML file")
 
         # Outputting to a new TOML
-        doc = document()
         toml_ready_dict = {
             "github_hosted": {
                 "readme_listings": self.github_readme_listings,
@@ -333,30 +457,19 @@ class ResourceListing:
                 "invalid_urls": self.fault_invalid_urls,
             },
         }
-
-        for k, v in toml_ready_dict.items():
-            doc.add(k, v)
-
-        with open(toml_file_path, "w") as fp:
-            dump(doc, fp, sort_keys=True)
+        write_toml(toml_ready_dict, toml_file_path)
 
 
 def fetch_all_project_urls_from_html_webpage(url: str) -> ParsingTargets:
     r_text = cached_web_get_text(url)
-    b = BeautifulSoup(r_text, features="html.parser")
-
-    rs = b.findAll(name="a")
-    shortlisted_urls = isolate_relevant_urls([x.get("href") for x in rs])
+    shortlisted_urls = isolate_relevant_urls(extract_links(r_text))
     return identify_parsing_targets(shortlisted_urls)
 
 
 def find_links_in_markdown(markdown_text: str) -> list[str]:
-    pattern = r"\[([^\]]+)\]\(([^\)]+)\)|\[([^\]]+)\]\s*\[([^\]]*)\]"
-    out = re.findall(pattern, markdown_text)
-    return [i[1] for i in out]
+    return list(iter_markdown_links(markdown_text))
 
 
 def fetch_all_project_urls_from_markdown_str(markdown_text: str) -> ParsingTargets:
-    r = find_links_in_markdown(markdown_text)
-    shortlisted_urls = isolate_relevant_urls(r)
+    shortlisted_urls = isolate_relevant_urls(iter_markdown_links(markdown_text))
     return identify_parsing_targets(shortlisted_urls)
@@ -0,0 +1,212 @@
+"""
+Module for the file trees of repositories
+
+Trees of large repositories (e.g. monorepos) come as JSON documents of tens of Mb,
+ so they are parsed as a stream (entry by entry) and stored front-coded: each path
+ is kept as the length of the prefix it shares with the previous path, followed by
+ the rest of the path. Queries (e.g. "is there a pyproject.toml?") run over the
+ compact form without building the list of all paths.
+"""
+
+import codecs
+import json
+import re
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from fnmatch import translate
+from functools import lru_cache
+
+_SEPARATOR = b"\0"  # Not allowed in paths
+_TREE_START = re.compile(r'"tree"\s*:\s*\[')
+_TRUNCATED = re.compile(r'"truncated"\s*:\s*(true|false)')
+_WHITESPACES_AND_COMMAS = " \t\n\r,"
+
+
+class FileTree:
+    """Front-coded list of the paths of a repository"""
+
+    def __init__(self, truncated: bool = False):
+        self.truncated = truncated
+        self._prefix_lengths = array("I")
+        self._is_dir = bytearray()
+        self._suffixes = bytearray()
+        self._last_path = ""
+
+    def __len__(self) -> int:
+        return len(self._prefix_lengths)
+
+    def add(self, path: str, is_dir: bool = False) -> None:
+        n = 0
+        for a, b in zip(self._last_path, path):
+            if a != b:
+                break
+            n += 1
+        self._prefix_lengths.append(n)
+        self._is_dir.append(is_dir)
+        self._suffixes += path[n:].encode("utf-8") + _SEPARATOR
+        self._last_path = path
+
+    def iter_entries(self) -> Iterator[tuple[str, bool]]:
+        """Iterates over the entries (path, is_dir), decoding one path at a time"""
+        path = ""
+        start = 0
+        for n, is_dir in zip(self._prefix_lengths, self._is_dir):
+            end = self._suffixes.index(_SEPARATOR, start)
+            path = path[:n] + self._suffixes[start:end].decode("utf-8")
+            start = end + 1
+            yield path, bool(is_dir)
+
+    def paths(self, include_dirs: bool = True) -> Iterator[str]:
+        for path, is_dir in self.iter_entries():
+            if include_dirs or not is_dir:
+                yield path
+
+    def count(self, predicate: Callable[[str], bool] | str) -> int:
+        """Counts the files matching a predicate (or a glob pattern, e.g. "*.ipynb")"""
+        predicate = _as_predicate(predicate)
+        return sum(1 for i in self.paths(include_dirs=False) if predicate(i))
+
+    def any(self, predicate: Callable[[str], bool] | str) -> bool:
+        """Checks if a file matches a predicate (or a glob pattern)"""
+        predicate = _as_predicate(predicate)
+        return any(predicate(i) for i in self.paths(include_dirs=False))
+
+    def contains(self, path: str) -> bool:
+        """Checks if the tree contains a file at the given path (e.g. "pyproject.toml")"""
+        return self.any(lambda x: x == path)
+
+    def to_dict(self) -> dict:
+        """Serialisable form (for caching), keeping the front coding"""
+        return dict(
+            truncated=self.truncated,
+            prefix_lengths=self._prefix_lengths.tolist(),
+            is_dir=self._is_dir.hex(),
+            suffixes=self._suffixes.decode("utf-8"),
+        )
+
+    @staticmethod
+    def from_dict(x: dict) -> "FileTree":
+        out = FileTree(truncated=x["truncated"])
+        out._prefix_lengths = array("I", x["prefix_lengths"])
+        out._is_dir = bytearray.fromhex(x["is_dir"])
+        out._suffixes = bytearray(x["suffixes"].encode("utf-8"))
+        for out._last_path in out.paths():
+            pass
+        return out
+
+
+@lru_cache(maxsize=1000)
+def _glob_regex(pattern: str) -> re.Pattern:
+    return re.compile(translate(pattern))
+
+
+def _as_predicate(x: Callable[[str], bool] | str) -> Callable[[str], bool]:
+    if isinstance(x, str):
+        return _glob_regex(x).match
+    return x
+
+
+class TreeStreamParser:
+    """
+    Incremental parser of the responses of the Github "git/trees" endpoint
+
+    Chunks of the response are fed as they arrive, and the entries of its "tree"
+    array are returned as soon as they are complete (the other fields being only
+    searched for the "truncated" flag).
+    """
+
+    def __init__(self):
+        self.truncated = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._in_tree = False
+        self._after_tree = False
+        self._other_fields = ""
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        """Parses a chunk of the response
+
+        :param chunk: next bytes of the response
+        :return: entries of the tree completed by this chunk
+        """
+        self._buffer = self._buffer[self._position :] + self._decoder.decode(chunk)
+        self._position = 0
+        out = []
+        if not (self._in_tree or self._after_tree):
+            m = _TREE_START.search(self._buffer)
+            if m is None:
+                return out
+            self._other_fields += self._buffer[: m.start()]
+            self._position = m.end()
+            self._in_tree = True
+
+        while self._in_tree:
+            n = len(self._buffer)
+            while (self._position < n) and (
+                self._buffer[self._position] in _WHITESPACES_AND_COMMAS
+            ):
+                self._position += 1
+            if self._position >= n:
+                break
+            if self._buffer[self._position] == "]":
+                self._in_tree = False
+                self._after_tree = True
+                self._position += 1
+                break
+            try:
+                entry, self._position = self._json_decoder.raw_decode(
+                    self._buffer, self._position
+                )
+            except json.JSONDecodeError:
+                # Incomplete entry (the rest is in the next chunks)
+                break
+            out.append(entry)
+
+        if self._after_tree:
+            self._other_fields += self._buffer[self._position :]
+            self._buffer = ""
+            self._position = 0
+        return out
+
+    def close(self) -> None:
+        """Ends the parsing (once the whole response was fed)
+
+        :raises ValueError: if the response ended before the end of the tree
+        """
+        self._other_fields += self._decoder.decode(b"", final=True)
+        if self._in_tree or not self._after_tree:
+            raise ValueError("Incomplete file tree in response")
+        m = _TRUNCATED.search(self._other_fields)
+        self.truncated = (m is not None) and (m.group(1) == "true")
+
+
+def parse_tree_stream(
+    chunks: Iterable[bytes],
+    tree: FileTree,
+    prefix: str = "",
+    max_entries: int | None = None,
+) -> tuple[list[tuple[str, str]], bool]:
+    """Adds the entries of a streamed "git/trees" response to a file tree
+
+    :param chunks: chunks of the response
+    :param tree: file tree to add the entries to
+    :param prefix: path of the tree in the repository (for subtrees), defaults to ""
+    :param max_entries: maximal size of the file tree (the rest being ignored), defaults to None
+    :return: subtrees listed (path, sha), and if the response was truncated
+    """
+    parser = TreeStreamParser()
+    subtrees = []
+    for chunk in chunks:
+        for entry in parser.feed(chunk):
+            if (max_entries is not None) and (len(tree) >= max_entries):
+                tree.truncated = True
+                return subtrees, False
+            path = prefix + entry["path"]
+            is_dir = entry.get("type") == "tree"
+            tree.add(path, is_dir=is_dir)
+            if is_dir:
+                subtrees.append((path, entry["sha"]))
+    parser.close()
+    return subtrees, parser.truncated
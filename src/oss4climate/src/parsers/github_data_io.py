@@ -2,34 +2,56 @@
 This module takes care of scraping data from Github-hosted code
 
 This implements:
-- Fetching repositories in an organisation
+- Fetching repositories in an organisation (all pages, see iterate_repositories_in_organisation)
 - Fetching data in a repository (details in the ProjectDetails(...) return)
 - Github URL identification and management (cleanup, type classification, ...)
 """
 
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import UTC, date, datetime
 from enum import Enum
 from functools import lru_cache
+from urllib.parse import quote
 
 import requests
 
 from oss4climate.src.config import SETTINGS
-from oss4climate.src.log import log_info
+from oss4climate.src.database import load_entry_from_database, save_to_database
+from oss4climate.src.database.policies import cache_ttl_for
+from oss4climate.src.log import log_info, log_warning
 from oss4climate.src.model import ProjectDetails
 from oss4climate.src.parsers import (
     ParsingTargets,
     cached_web_get_json,
+    cached_web_get_json_with_headers,
     cached_web_get_text,
 )
+from oss4climate.src.parsers.file_tree import FileTree, parse_tree_stream
+from oss4climate.src.parsers.urls import Forge, canonicalise_url
+from oss4climate.src.web import (
+    count_from_single_item_page,
+    counting_requests,
+    page_number,
+    parse_link_header,
+    run_concurrently,
+    scheduled_request,
+)
 
 GITHUB_URL_BASE = "https://github.com/"
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_RAW_URL = "https://raw.githubusercontent.com"
+
+# Maximal page size of the Github API
+_PER_PAGE = 100
+# Size of the chunks in which file trees are read
+_TREE_CHUNK_SIZE = 64 * 1024
 
 
 def _extract_organisation_and_repository_as_url_block(x: str) -> str:
-    # Cleaning up Github prefix
-    if x.startswith(GITHUB_URL_BASE):
-        x = x.replace(GITHUB_URL_BASE, "")
-    # Removing eventual extra information in URL
+    u = canonicalise_url(x)
+    if u.forge is Forge.GITHUB:
+        return u.path
+    # Paths (e.g. "owner/name"), removing eventual extra information
     for i in ["#", "&"]:
         if i in x:
             x = x.split(i)[0]
@@ -50,14 +72,10 @@ class GithubTargetType(Enum):
 
     @staticmethod
     def identify(url: str) -> "GithubTargetType":
-        processed = _extract_organisation_and_repository_as_url_block(url)
-        n_slashes = processed.count("/")
-        if n_slashes < 1:
-            return GithubTargetType.ORGANISATION
-        elif n_slashes == 1:
-            return GithubTargetType.REPOSITORY
-        else:
+        u = canonicalise_url(url)
+        if u.forge is not Forge.GITHUB:
             return GithubTargetType.UNKNOWN
+        return GithubTargetType(u.target_type.value)
 
 
 def split_across_target_sets(
@@ -105,27 +123,102 @@ def _web_get(url: str, with_headers: bool = True, is_json: bool = True) -> dict:
     return res
 
 
-def fetch_repositories_in_organisation(organisation_name: str) -> dict[str, str]:
+def _web_get_page(url: str) -> tuple[list[dict], dict[str, str]]:
+    return cached_web_get_json_with_headers(url=url, headers=_github_headers())
+
+
+def iterate_repositories_in_organisation(
+    organisation_name: str,
+) -> Iterator[list[dict]]:
+    """Yields the repositories of an organisation (or user) page by page
+
+    Once the number of pages is known (from the "Link" header of the first page),
+    the following pages are fetched concurrently (by groups of pages, to keep the
+    memory use bounded).
+
+    :param organisation_name: name or URL of the organisation (or user)
+    :return: iterator over the pages (lists of repository payloads from the API)
+    """
     organisation_name = _extract_organisation_and_repository_as_url_block(
         organisation_name
     )
 
+    first_page_query = f"per_page={_PER_PAGE}&page=1"
     try:
-        res = _web_get(
-            f"https://api.github.com/orgs/{organisation_name}/repos",
-        )
+        base_url = f"{GITHUB_API_URL}/orgs/{organisation_name}/repos"
+        res, headers = _web_get_page(f"{base_url}?{first_page_query}")
     except requests.exceptions.HTTPError:
         # Where orgs do not work, one is potentially looking at a user instead
-        res = _web_get(
-            f"https://api.github.com/users/{organisation_name}/repos",
-        )
+        base_url = f"{GITHUB_API_URL}/users/{organisation_name}/repos"
+        res, headers = _web_get_page(f"{base_url}?{first_page_query}")
+    yield res
+
+    links = parse_link_header(headers.get("link"))
+    last_page = page_number(links["last"]) if "last" in links else None
+    if last_page is None:
+        # Following the links (if the last page is not given)
+        while "next" in links:
+            res, headers = _web_get_page(links["next"])
+            yield res
+            links = parse_link_header(headers.get("link"))
+        return
+
+    pages_urls = [
+        f"{base_url}?per_page={_PER_PAGE}&page={i}" for i in range(2, last_page + 1)
+    ]
+    group_size = max(1, SETTINGS.WEB_MAX_CONCURRENCY)
+    for i in range(0, len(pages_urls), group_size):
+        for x in run_concurrently(_web_get_page, pages_urls[i : i + group_size]):
+            if isinstance(x, Exception):
+                raise x
+            yield x[0]
+
+
+def fetch_repositories_in_organisation(organisation_name: str) -> dict[str, str]:
+    out = dict()
+    for page in iterate_repositories_in_organisation(organisation_name):
+        out.update({r["name"]: r["html_url"] for r in page})
+    return out
+
 
-    return {r["name"]: r["html_url"] for r in res}
+def fetch_repository_payloads_in_organisation(
+    organisation_name: str,
+) -> dict[str, dict]:
+    """Same as fetch_repositories_in_organisation, keeping the payloads of the listing
+
+    :param organisation_name: name or URL of the organisation (or user)
+    :return: payloads of the repositories (as given by the API) by URL
+    """
+    out = dict()
+    for page in iterate_repositories_in_organisation(organisation_name):
+        out.update({r["html_url"]: r for r in page})
+    return out
+
+
+def fetch_repository_payload(repo_path: str) -> dict:
+    repo_path = _extract_organisation_and_repository_as_url_block(repo_path)
+    return _web_get(f"{GITHUB_API_URL}/repos/{repo_path}")
+
+
+def repository_id(repo_path: str) -> str:
+    """Identifier of the repository (as used in ProjectDetails.id)"""
+    return _extract_organisation_and_repository_as_url_block(repo_path)
+
+
+def repository_change_marker(payload: dict) -> str:
+    """Marker changing whenever a repository is pushed to or updated
+
+    :param payload: payload of the repository (from the REST or the GraphQL API)
+    :return: marker to compare across scrapings
+    """
+    pushed_at = payload.get("pushed_at", payload.get("pushedAt"))
+    updated_at = payload.get("updated_at", payload.get("updatedAt"))
+    return f"{pushed_at}|{updated_at}"
 
 
 def _master_branch_name(cleaned_repo_path: str) -> str | None:
     # Gather extra metadata
-    r_branches = _web_get(f"https://api.github.com/repos/{cleaned_repo_path}/branches")
+    r_branches = _web_get(f"{GITHUB_API_URL}/repos/{cleaned_repo_path}/branches")
     branches_names = [i["name"] for i in r_branches]
     if len(branches_names) == 1:
         # If only one branch, then the choice is clear
@@ -148,73 +241,161 @@ def extract_repository_organisation(repo_path: str) -> str:
     return organisation
 
 
-def fetch_repository_details(repo_path: str) -> ProjectDetails:
-    repo_path = _extract_organisation_and_repository_as_url_block(repo_path)
+def _default_branch_name(cleaned_repo_path: str) -> str | None:
+    # Given by the repository payload (which is in cache once the details are fetched)
+    r = _web_get(f"{GITHUB_API_URL}/repos/{cleaned_repo_path}")
+    return r.get("default_branch")
 
-    r = _web_get(f"https://api.github.com/repos/{repo_path}")
-    branch2use = _master_branch_name(repo_path)
 
-    if branch2use is None:
-        last_commit = None
+def _last_commit_date(cleaned_repo_path: str, branch: str, lean: bool) -> date | None:
+    if lean:
+        # Only the latest commit is needed
+        r = _web_get(
+            f"{GITHUB_API_URL}/repos/{cleaned_repo_path}/commits"
+            f"?sha={quote(branch, safe='')}&per_page=1"
+        )
+        if len(r) == 0:
+            return None
+        r = r[0]
     else:
         # If ever getting issues with the size here, "?per_page=10" can be added to the URL
         #  (just need to ensure that all latest commits are included)
-        r_last_commit_to_master = _web_get(
-            f"https://api.github.com/repos/{repo_path}/commits/{branch2use}"
-        )
-        last_commit = datetime.fromisoformat(
-            r_last_commit_to_master["commit"]["author"]["date"]
-        ).date()
-
-    # Stats (for later)
-    stars = r.get("stargazers_count")
-    watchers = r.get("watchers_count")
-    subscribers = r.get("subscribers_count")
-    open_issues = r.get("open_issues_count")
-    n_forks = r.get("forks")
-    is_fork = r.get("fork")
+        r = _web_get(f"{GITHUB_API_URL}/repos/{cleaned_repo_path}/commits/{branch}")
+    return datetime.fromisoformat(r["commit"]["author"]["date"]).date()
+
+
+def count_open_pull_requests(repo_path: str) -> int:
+    """Counts the open pull requests of a repository (downloading a single one)"""
+    repo_path = _extract_organisation_and_repository_as_url_block(repo_path)
+    res, headers = _web_get_page(
+        f"{GITHUB_API_URL}/repos/{repo_path}/pulls?state=open&per_page=1"
+    )
+    return count_from_single_item_page(res, headers)
+
+
+def repository_details_from_payload(
+    payload: dict, repo_path: str | None = None
+) -> ProjectDetails:
+    """Builds the details of a repository which are given by its payload
+
+    Payloads are given by the repository endpoint, but also by organisation listings
+    (for all the repositories of a page at once). The fields needing other calls
+    (last commit, open pull requests and README) are left empty.
+
+    :param payload: payload of the repository (from the REST API)
+    :param repo_path: URL (or "owner/name" path) of the repository, defaults to the URL in the payload
+    :return: (partial) details of the project
+    """
+    if repo_path is None:
+        repo_path = payload["html_url"]
+    repo_path = _extract_organisation_and_repository_as_url_block(repo_path)
+
+    is_fork = payload.get("fork")
     if is_fork:
-        forked_from = r.get("parent").get("html_url")
+        forked_from = (payload.get("parent") or dict()).get("html_url")
     else:
         forked_from = None
 
-    # Note: this does not work well as the limit is set to 30
-    r_pull_requests = _web_get(f"https://api.github.com/repos/{repo_path}/pulls")
-    n_open_pull_requests = len([i for i in r_pull_requests if i["state"] == "open"])
-    # TODO: fix this better
-    if n_open_pull_requests == 30:
-        n_open_pull_requests = None
-
-    license = r["license"]
+    license = payload.get("license")
     if license is not None:
         license = license["name"]
 
-    details = ProjectDetails(
+    return ProjectDetails(
         id=repo_path,
-        name=r["name"],
+        name=payload["name"],
         organisation=extract_repository_organisation(repo_path),
-        url=r["html_url"],
-        website=r["homepage"],
-        description=r["description"],
+        url=payload["html_url"],
+        website=payload.get("homepage"),
+        description=payload.get("description"),
         license=license,
-        language=r["language"],
-        latest_update=datetime.fromisoformat(r["updated_at"]).date(),
-        last_commit=last_commit,
-        open_pull_requests=n_open_pull_requests,
-        raw_details=r,
-        master_branch=branch2use,
-        readme=fetch_repository_readme(repo_path),
+        language=payload.get("language"),
+        latest_update=datetime.fromisoformat(payload["updated_at"]).date(),
+        last_commit=None,
+        open_pull_requests=None,
+        raw_details=payload,
+        master_branch=payload.get("default_branch"),
+        readme=None,
         is_fork=is_fork,
         forked_from=forked_from,
     )
+
+
+def fetch_repository_details(
+    repo_path: str,
+    lean: bool = False,
+    payload: dict | None = None,
+    with_readme: bool = True,
+) -> ProjectDetails:
+    """Fetches the details of a repository
+
+    In lean mode, the branch (and the location of the README) is taken from the
+    repository payload instead of being guessed from the list of branches, and only
+    the latest commit is downloaded.
+
+    :param repo_path: URL (or "owner/name" path) of the repository
+    :param lean: if the minimal number of API calls is to be made, defaults to False
+    :param payload: payload of the repository if already available (e.g. from an organisation listing), defaults to None
+    :param with_readme: if the README is to be fetched too (else see fetch_readme_of_details), defaults to True
+    :return: details of the project
+    """
+    with counting_requests() as counter:
+        details = _fetch_repository_details(
+            repo_path, lean=lean, payload=payload, with_readme=with_readme
+        )
+    if with_readme:
+        # (else, the count is completed and logged once the README is fetched)
+        log_info(f"> {counter.n_requests} web requests for {details.id}")
     return details
 
 
-def fetch_repository_readme(repo_name: str) -> str | None:
+def _fetch_repository_details(
+    repo_path: str, lean: bool, payload: dict | None = None, with_readme: bool = True
+) -> ProjectDetails:
+    repo_path = _extract_organisation_and_repository_as_url_block(repo_path)
+
+    if (payload is None) or (payload.get("fork") and ("parent" not in payload)):
+        # Listings do not give the parent of forks
+        payload = fetch_repository_payload(repo_path)
+    details = repository_details_from_payload(payload, repo_path=repo_path)
+    if not lean:
+        details.master_branch = _master_branch_name(repo_path)
+
+    if details.master_branch is not None:
+        details.last_commit = _last_commit_date(
+            repo_path, details.master_branch, lean=lean
+        )
+
+    details.open_pull_requests = count_open_pull_requests(repo_path)
+
+    if with_readme:
+        fetch_readme_of_details(details, lean=lean)
+    return details
+
+
+def fetch_readme_of_details(details: ProjectDetails, lean: bool = False) -> None:
+    """Fetches the README of a repository into its details
+
+    :param details: details of the repository (as given by fetch_repository_details)
+    :param lean: if the details were fetched in lean mode (the README being then read from the default branch), defaults to False
+    """
+    details.readme = fetch_repository_readme(
+        details.id, branch=(details.master_branch if lean else "main")
+    )
+
+
+def fetch_repository_readme(repo_name: str, branch: str | None = None) -> str | None:
+    """Fetches the README.md of a repository
+
+    :param repo_name: URL (or "owner/name" path) of the repository
+    :param branch: branch to read the README from, defaults to the default branch of the repository
+    :return: content of the README (or an error message)
+    """
     repo_name = _extract_organisation_and_repository_as_url_block(repo_name)
     try:
+        if branch is None:
+            branch = _default_branch_name(repo_name) or "main"
         md_content = _web_get(
-            f"https://raw.githubusercontent.com/{repo_name}/main/README.md",
+            f"{GITHUB_RAW_URL}/{repo_name}/{branch}/README.md",
             with_headers=None,
             is_json=False,
         )
@@ -224,18 +405,98 @@ def fetch_repository_readme(repo_name: str) -> str | None:
     return md_content
 
 
-def fetch_repository_file_tree(repository_url: str) -> list[str] | str:
+def _stream_tree(
+    url: str, tree: FileTree, prefix: str, max_entries: int | None
+) -> tuple[list[tuple[str, str]], bool]:
+    r = scheduled_request("GET", url, headers=_github_headers(), stream=True)
+    with r:
+        r.raise_for_status()
+        return parse_tree_stream(
+            r.iter_content(chunk_size=_TREE_CHUNK_SIZE),
+            tree,
+            prefix=prefix,
+            max_entries=max_entries,
+        )
+
+
+def _walk_tree(
+    repo_name: str, tree_sha: str, tree: FileTree, prefix: str, max_entries: int
+) -> None:
+    # Lists the entries of the tree, then each of its subtrees (recursively, as long
+    #  as their recursive listing is not truncated)
+    trees_url = f"{GITHUB_API_URL}/repos/{repo_name}/git/trees"
+    subtrees, truncated = _stream_tree(
+        f"{trees_url}/{tree_sha}", tree, prefix, max_entries
+    )
+    tree.truncated = tree.truncated or truncated
+    for path, sha in subtrees:
+        if len(tree) >= max_entries:
+            tree.truncated = True
+            return
+        subtree = FileTree()
+        __, truncated = _stream_tree(
+            f"{trees_url}/{sha}?recursive=1",
+            subtree,
+            prefix=f"{path}/",
+            max_entries=max_entries - len(tree),
+        )
+        if truncated:
+            _walk_tree(repo_name, sha, tree, f"{path}/", max_entries)
+        else:
+            for x, is_dir in subtree.iter_entries():
+                tree.add(x, is_dir=is_dir)
+            tree.truncated = tree.truncated or subtree.truncated
+
+
+def fetch_file_tree(
+    repository_url: str, branch: str | None = None, max_entries: int | None = None
+) -> FileTree:
+    """Fetches the file tree of a repository (as a stream, stored front-coded)
+
+    Where Github truncates the recursive listing (above 100k entries or 7 Mb),
+    the tree is walked subtree by subtree instead.
+
+    :param repository_url: URL (or "owner/name" path) of the repository
+    :param branch: branch to list, defaults to the default branch of the repository
+    :param max_entries: maximal number of entries kept, defaults to SETTINGS.FILE_TREE_MAX_ENTRIES
+    :raises ValueError: if the branch to list is unclear
+    :return: file tree (flagged as truncated if some entries are missing)
+    """
     repo_name = _extract_organisation_and_repository_as_url_block(repository_url)
-    branch = _master_branch_name(repo_name)
+    if max_entries is None:
+        max_entries = SETTINGS.FILE_TREE_MAX_ENTRIES
     if branch is None:
-        return "ERROR with file tree (unclear master branch)"
+        branch = _default_branch_name(repo_name)
+    if branch is None:
+        raise ValueError("unclear master branch")
+
+    url = f"{GITHUB_API_URL}/repos/{repo_name}/git/trees/{branch}?recursive=1"
+    cache_key = f"{url}#file_tree"
+    cached = load_entry_from_database(cache_key, is_json=True)
+    if cached is not None:
+        ttl = cache_ttl_for(cache_key)
+        if (ttl is None) or (datetime.now(tz=UTC) - cached.fetched_at < ttl):
+            log_info(f"Cache-loading: {cache_key}")
+            return FileTree.from_dict(cached.value)
+
+    log_info(f"Web GET (stream): {url}")
+    tree = FileTree()
+    __, truncated = _stream_tree(url, tree, prefix="", max_entries=max_entries)
+    if truncated:
+        log_info(f"> Truncated file tree for {repo_name}, walking its subtrees")
+        tree = FileTree()
+        _walk_tree(repo_name, branch, tree, prefix="", max_entries=max_entries)
+    if tree.truncated:
+        log_warning(f"> File tree of {repo_name} capped at {len(tree)} entries")
+    save_to_database(cache_key, tree.to_dict(), is_json=True)
+    return tree
+
+
+def fetch_repository_file_tree(
+    repository_url: str, branch: str | None = None
+) -> list[str] | str:
     try:
-        r = _web_get(
-            url=f"https://api.github.com/repos/{repo_name}/git/trees/{branch}?recursive=1",
-            with_headers=None,
-            is_json=True,
-        )
-        file_tree = [i["path"] for i in r["tree"]]
+        file_tree = list(fetch_file_tree(repository_url, branch=branch).paths())
     except Exception as e:
         file_tree = f"ERROR with file tree ({e})"
     return file_tree
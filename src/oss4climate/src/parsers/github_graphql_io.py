@@ -0,0 +1,270 @@
+"""
+This module fetches repository details from the Github GraphQL API
+
+It is an alternative to github_data_io.fetch_repository_details (which makes 5 REST
+ calls per repository): the details of a batch of repositories are fetched with a
+ single query, made of one aliased "repository(owner:, name:)" block per repository.
+
+Note: the GraphQL API is only available to authenticated users (GITHUB_API_TOKEN).
+"""
+
+from datetime import UTC, datetime
+
+import requests
+
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.database import load_entries_from_database, save_many
+from oss4climate.src.database.policies import cache_ttl_for
+from oss4climate.src.log import log_info, log_warning
+from oss4climate.src.model import ProjectDetails
+from oss4climate.src.parsers.github_data_io import (
+    GITHUB_API_URL,
+    _extract_organisation_and_repository_as_url_block,
+    extract_repository_organisation,
+)
+from oss4climate.src.web import run_concurrently, scheduled_request
+
+GITHUB_GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+
+_REPOSITORY_FIELDS = """
+fragment repositoryFields on Repository {
+  name
+  nameWithOwner
+  url
+  homepageUrl
+  description
+  updatedAt
+  pushedAt
+  isFork
+  parent { url }
+  licenseInfo { name }
+  primaryLanguage { name }
+  stargazerCount
+  forkCount
+  defaultBranchRef {
+    name
+    target { ... on Commit { author { date } } }
+  }
+  pullRequests(states: OPEN) { totalCount }
+  readme: object(expression: "HEAD:README.md") { ... on Blob { text } }
+}
+"""
+
+
+class GraphQLError(ValueError):
+    """Raised when the Github GraphQL API returns errors instead of data"""
+
+
+def _graphql_headers() -> dict[str, str]:
+    if SETTINGS.GITHUB_API_TOKEN is None:
+        raise EnvironmentError(
+            "The Github GraphQL API requires a token (set GITHUB_API_TOKEN)"
+        )
+    return {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {SETTINGS.GITHUB_API_TOKEN}",
+    }
+
+
+def _cache_key(repo_path: str) -> str:
+    return f"{GITHUB_GRAPHQL_URL}#repository/{repo_path}"
+
+
+def build_repositories_query(repo_paths: list[str]) -> tuple[str, dict[str, str]]:
+    """Builds the query fetching the details of repositories (one alias per repository)
+
+    :param repo_paths: repositories, as "owner/name"
+    :return: query and its variables (the repository at index i has the alias "r{i}")
+    """
+    declarations = []
+    blocks = []
+    variables = dict()
+    for i, x in enumerate(repo_paths):
+        owner, name = x.split("/", 1)
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = name
+        declarations.append(f"$o{i}: String!, $n{i}: String!")
+        blocks.append(
+            f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...repositoryFields }}"
+        )
+    query = (
+        f"query({', '.join(declarations)}) {{\n"
+        + "\n".join(blocks)
+        + "\n}\n"
+        + _REPOSITORY_FIELDS
+    )
+    return query, variables
+
+
+def _as_date(x: str | None):
+    if x is None:
+        return None
+    return datetime.fromisoformat(x).date()
+
+
+def project_details_from_graphql(repo_path: str, node: dict) -> ProjectDetails:
+    """Converts the result of a "repository" block into ProjectDetails
+
+    :param repo_path: repository, as "owner/name"
+    :param node: result of the "repository" block (with the fields of _REPOSITORY_FIELDS)
+    :return: details of the project
+    """
+    default_branch = node.get("defaultBranchRef")
+    if default_branch is None:
+        # Empty repository
+        master_branch = None
+        last_commit = None
+    else:
+        master_branch = default_branch["name"]
+        author = (default_branch.get("target") or dict()).get("author") or dict()
+        last_commit = _as_date(author.get("date"))
+
+    readme = node.get("readme")
+    if readme is None:
+        readme = "(None)"  # As for missing READMEs in the REST implementation
+    else:
+        readme = readme.get("text")
+
+    license = node.get("licenseInfo")
+    if license is not None:
+        license = license["name"]
+    language = node.get("primaryLanguage")
+    if language is not None:
+        language = language["name"]
+    is_fork = node.get("isFork")
+    forked_from = None
+    if is_fork and (node.get("parent") is not None):
+        forked_from = node["parent"]["url"]
+
+    return ProjectDetails(
+        id=repo_path,
+        name=node["name"],
+        organisation=extract_repository_organisation(repo_path),
+        url=node["url"],
+        website=node.get("homepageUrl"),
+        description=node.get("description"),
+        license=license,
+        language=language,
+        latest_update=_as_date(node.get("updatedAt")),
+        last_commit=last_commit,
+        open_pull_requests=node["pullRequests"]["totalCount"],
+        raw_details={k: v for k, v in node.items() if k != "readme"},
+        master_branch=master_branch,
+        readme=readme,
+        is_fork=is_fork,
+        forked_from=forked_from,
+    )
+
+
+def _query_repositories(repo_paths: list[str]) -> dict[str, dict | Exception]:
+    # Returns the "repository" results (or the error) by repository
+    query, variables = build_repositories_query(repo_paths)
+    log_info(f"GraphQL query for {len(repo_paths)} repositories")
+    r = scheduled_request(
+        "POST",
+        GITHUB_GRAPHQL_URL,
+        headers=_graphql_headers(),
+        json=dict(query=query, variables=variables),
+    )
+    r.raise_for_status()
+    res = r.json()
+    data = res.get("data")
+    if data is None:
+        raise GraphQLError(f"GraphQL query failed ({res.get('errors')})")
+
+    errors_by_alias = dict()
+    for e in res.get("errors") or []:
+        path = e.get("path") or []
+        if len(path) > 0:
+            errors_by_alias[path[0]] = e.get("message")
+    out = dict()
+    for i, x in enumerate(repo_paths):
+        node = data.get(f"r{i}")
+        if node is None:
+            out[x] = GraphQLError(errors_by_alias.get(f"r{i}", f"No data for {x}"))
+        else:
+            out[x] = node
+    return out
+
+
+def _query_repositories_or_split(repo_paths: list[str]) -> dict[str, dict | Exception]:
+    try:
+        return _query_repositories(repo_paths)
+    except requests.exceptions.HTTPError as e:
+        # Large queries can time out on the server side, so smaller ones are attempted
+        if (
+            (len(repo_paths) < 2)
+            or (e.response is None)
+            or (e.response.status_code < 500)
+        ):
+            raise
+        log_warning(f"GraphQL query failed ({e}), splitting the batch")
+        half = len(repo_paths) // 2
+        out = _query_repositories_or_split(repo_paths[:half])
+        out.update(_query_repositories_or_split(repo_paths[half:]))
+        return out
+
+
+def fetch_repositories_details(
+    repo_urls: list[str],
+    batch_size: int | None = None,
+    max_concurrency: int | None = None,
+) -> dict[str, ProjectDetails | Exception]:
+    """Fetches the details of repositories with batched GraphQL queries
+
+    Results are cached by repository (with the same validity as REST results).
+
+    :param repo_urls: URLs (or "owner/name" paths) of the repositories
+    :param batch_size: number of repositories per query, defaults to SETTINGS.GITHUB_GRAPHQL_BATCH_SIZE
+    :param max_concurrency: maximal number of concurrent queries, defaults to SETTINGS.WEB_MAX_CONCURRENCY
+    :return: details (or the exception raised) by URL, in the order of the input
+    """
+    if batch_size is None:
+        batch_size = SETTINGS.GITHUB_GRAPHQL_BATCH_SIZE
+    repo_paths = {
+        x: _extract_organisation_and_repository_as_url_block(x) for x in repo_urls
+    }
+
+    nodes = dict()
+    now = datetime.now(tz=UTC)
+    cached = load_entries_from_database(
+        [_cache_key(x) for x in repo_paths.values()], is_json=True
+    )
+    for x in repo_paths.values():
+        entry = cached.get(_cache_key(x))
+        if entry is None:
+            continue
+        ttl = cache_ttl_for(_cache_key(x))
+        if (ttl is None) or (now - entry.fetched_at < ttl):
+            nodes[x] = entry.value
+    log_info(f"GraphQL: {len(nodes)} of {len(repo_paths)} repositories in cache")
+
+    to_fetch = list(dict.fromkeys(x for x in repo_paths.values() if x not in nodes))
+    batches = [
+        to_fetch[i : i + batch_size] for i in range(0, len(to_fetch), batch_size)
+    ]
+    for batch, res in zip(
+        batches,
+        run_concurrently(
+            _query_repositories_or_split, batches, max_concurrency=max_concurrency
+        ),
+    ):
+        if isinstance(res, Exception):
+            res = {x: res for x in batch}
+        save_many(
+            {_cache_key(k): v for k, v in res.items() if not isinstance(v, Exception)},
+            is_json=True,
+        )
+        nodes.update(res)
+
+    out = dict()
+    for url, x in repo_paths.items():
+        node = nodes[x]
+        if isinstance(node, Exception):
+            out[url] = node
+            continue
+        try:
+            out[url] = project_details_from_graphql(x, node)
+        except Exception as e:
+            out[url] = e
+    return out
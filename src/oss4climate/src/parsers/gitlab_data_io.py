@@ -6,25 +6,38 @@ Note:
 - Personal access token: https://docs.gitlab.com/ee/user/profile/personal_access_tokens.html
 """
 
+from collections.abc import Iterator
 from datetime import datetime
 from enum import Enum
 from functools import lru_cache
 from urllib.parse import quote_plus, urlparse
 
+import requests
+
 from oss4climate.src.config import SETTINGS
 from oss4climate.src.log import log_info
 from oss4climate.src.model import ProjectDetails
 from oss4climate.src.parsers import (
     ParsingTargets,
     cached_web_get_json,
+    cached_web_get_json_with_headers,
     cached_web_get_text,
 )
+from oss4climate.src.parsers.urls import Forge, TargetType, canonicalise_url
+from oss4climate.src.web import (
+    count_from_single_item_page,
+    parse_link_header,
+    run_concurrently,
+)
 
 GITLAB_ANY_URL_PREFIX = (
     "https://gitlab."  # Since Gitlabs can be self-hosted on another domain
 )
 GITLAB_URL_BASE = "https://gitlab.com/"
 
+# Maximal page size of the Gitlab API
+_PER_PAGE = 100
+
 
 class GitlabTargetType(Enum):
     GROUP = "GROUP"
@@ -33,17 +46,40 @@ class GitlabTargetType(Enum):
 
     @staticmethod
     def identify(url: str) -> "GitlabTargetType":
-        if not url.startswith(GITLAB_ANY_URL_PREFIX):
+        """Identifies the type of target of a URL (without calling the API)
+
+        Paths with several levels ("group/name") can be projects or subgroups, which
+        can only be told apart by the API: they are taken as projects here, and
+        resolved when scraping (see resolve_target_type).
+
+        :param url: URL to identify
+        :return: type of target
+        """
+        u = canonicalise_url(url)
+        if u.forge is not Forge.GITLAB:
             return GitlabTargetType.UNKNOWN
-        processed = _extract_organisation_and_repository_as_url_block(url)
-        n_slashes = processed.count("/")
-        if n_slashes < 1:
+        elif u.target_type is TargetType.ORGANISATION:
             return GitlabTargetType.GROUP
-        elif n_slashes >= 1:
-            # TODO : this is not good enough for sub-projects (but best quick fix for now)
-            return GitlabTargetType.PROJECT
         else:
-            return GitlabTargetType.UNKNOWN
+            return GitlabTargetType.PROJECT
+
+
+def resolve_target_type(url: str) -> GitlabTargetType:
+    """Identifies the type of target of a URL with the API (project or group)
+
+    (used by scrape_all for the projects of the index with nested paths, which can
+    be subgroups to crawl)
+    """
+    try:
+        fetch_project_payload(url)
+        return GitlabTargetType.PROJECT
+    except requests.exceptions.HTTPError:
+        pass
+    try:
+        _web_get(f"{_gitlab_api_url(url)}/groups/{_quoted_id(url)}?with_projects=false")
+        return GitlabTargetType.GROUP
+    except requests.exceptions.HTTPError:
+        return GitlabTargetType.UNKNOWN
 
 
 def split_across_target_sets(
@@ -65,20 +101,20 @@ def split_across_target_sets(
     )
 
 
-def _extract_gitlab_host(url: str) -> str:
+def _gitlab_api_url(url: str) -> str:
     parsed_url = urlparse(url)
-    return parsed_url.hostname
+    return f"{parsed_url.scheme}://{parsed_url.netloc}/api/v4"
 
 
 def _extract_organisation_and_repository_as_url_block(x: str) -> str:
-    # Cleaning up Gitlab prefix
-    if x.startswith(GITLAB_URL_BASE):
-        x = x.replace(GITLAB_URL_BASE, "")
-    else:
-        h = _extract_gitlab_host(url=x)
-        x = x.replace(f"https://{h}/", "")
-    # Removing eventual extra information in URL
-    for i in ["#", "&"]:
+    u = canonicalise_url(x)
+    if u.forge is Forge.GITLAB:
+        return u.path
+    # Other hosts (e.g. instances not on a "gitlab." domain) and paths
+    if "://" in x:
+        x = urlparse(x).path.lstrip("/")
+    # Removing eventual extra information in URL (incl. pages of projects, after "/-/")
+    for i in ["#", "&", "/-/"]:
         if i in x:
             x = x.split(i)[0]
     # Removing trailing "/", if any
@@ -87,6 +123,16 @@ def _extract_organisation_and_repository_as_url_block(x: str) -> str:
     return x
 
 
+def has_nested_path(url: str) -> bool:
+    """Checks if a URL points at a project or subgroup within a subgroup"""
+    return _extract_organisation_and_repository_as_url_block(url).count("/") > 1
+
+
+def _quoted_id(url: str) -> str:
+    # Full path of a group or project, as an ID for the API (e.g. "group%2Fsubgroup")
+    return quote_plus(_extract_organisation_and_repository_as_url_block(url))
+
+
 @lru_cache(maxsize=1)
 def _gitlab_headers() -> dict[str, str]:
     if SETTINGS.GITLAB_ACCESS_TOKEN is None:
@@ -113,71 +159,193 @@ def _web_get(url: str, with_headers: bool = True, is_json: bool = True) -> dict:
     return res
 
 
-def fetch_repositories_in_group(organisation_name: str) -> dict[str, str]:
-    gitlab_host = _extract_gitlab_host(url=organisation_name)
-    group_id = _extract_organisation_and_repository_as_url_block(organisation_name)
-    res = _web_get(
-        f"https://{gitlab_host}/api/v4/groups/{group_id}/projects",
+def _web_get_page(url: str) -> tuple[list[dict], dict[str, str]]:
+    if url.startswith(GITLAB_URL_BASE):
+        headers = _gitlab_headers()
+    else:
+        headers = None
+    return cached_web_get_json_with_headers(url=url, headers=headers)
+
+
+def iterate_projects_in_group(organisation_name: str) -> Iterator[list[dict]]:
+    """Yields the projects of a group (and of its subgroups) page by page
+
+    Where Gitlab gives the number of pages (in "X-Total-Pages"), the pages following
+    the first one are fetched concurrently (by groups of pages). Else (e.g. for
+    groups with over 10k projects, for which Gitlab does not count them), the "next"
+    links are followed.
+
+    :param organisation_name: URL of the group
+    :return: iterator over the pages (lists of project payloads from the API)
+    """
+    base_url = (
+        f"{_gitlab_api_url(organisation_name)}/groups/{_quoted_id(organisation_name)}"
+        f"/projects?include_subgroups=true&order_by=id&sort=asc&per_page={_PER_PAGE}"
     )
-    return {r["name"]: r["web_url"] for r in res}
+    res, headers = _web_get_page(f"{base_url}&page=1")
+    yield res
 
+    total_pages = headers.get("x-total-pages")
+    if not total_pages:
+        links = parse_link_header(headers.get("link"))
+        while "next" in links:
+            res, headers = _web_get_page(links["next"])
+            yield res
+            links = parse_link_header(headers.get("link"))
+        return
 
-def fetch_repository_details(repo_path: str) -> ProjectDetails:
-    gitlab_host = _extract_gitlab_host(url=repo_path)
-    repo_id = _extract_organisation_and_repository_as_url_block(repo_path)
-    r = _web_get(
-        f"https://{gitlab_host}/api/v4/projects/{quote_plus(repo_id)}?license=yes",
+    pages_urls = [f"{base_url}&page={i}" for i in range(2, int(total_pages) + 1)]
+    group_size = max(1, SETTINGS.WEB_MAX_CONCURRENCY)
+    for i in range(0, len(pages_urls), group_size):
+        for x in run_concurrently(_web_get_page, pages_urls[i : i + group_size]):
+            if isinstance(x, Exception):
+                raise x
+            yield x[0]
+
+
+def fetch_project_payloads_in_group(organisation_name: str) -> dict[str, dict]:
+    """Lists the projects of a group (including its subgroups), with their payloads
+
+    :param organisation_name: URL of the group
+    :return: payloads of the projects (as given by the API) by URL
+    """
+    out = dict()
+    for page in iterate_projects_in_group(organisation_name):
+        out.update({r["web_url"]: r for r in page})
+    return out
+
+
+def fetch_repositories_in_group(organisation_name: str) -> dict[str, str]:
+    return {
+        r["name"]: url
+        for url, r in fetch_project_payloads_in_group(organisation_name).items()
+    }
+
+
+def fetch_project_payload(repo_path: str) -> dict:
+    return _web_get(
+        f"{_gitlab_api_url(repo_path)}/projects/{_quoted_id(repo_path)}?license=yes",
         is_json=True,
     )
+
+
+def project_id(repo_path: str) -> str:
+    """Identifier of the project (as used in ProjectDetails.id)"""
+    return _extract_organisation_and_repository_as_url_block(repo_path)
+
+
+def project_change_marker(payload: dict) -> str:
+    """Marker changing whenever a project has activity or is updated
+
+    :param payload: payload of the project (from the API)
+    :return: marker to compare across scrapings
+    """
+    return f"{payload.get('last_activity_at')}|{payload.get('updated_at')}"
+
+
+def count_open_merge_requests(merge_requests_url: str) -> int:
+    """Counts the open merge requests of a project (downloading a single one)
+
+    :param merge_requests_url: URL of the merge requests of the project (from "_links")
+    :return: number of open merge requests
+    """
+    url = f"{merge_requests_url}?state=opened&per_page=1"
+    if url.startswith(GITLAB_URL_BASE):
+        headers = _gitlab_headers()
+    else:
+        headers = None
+    res, response_headers = cached_web_get_json_with_headers(url=url, headers=headers)
+    return count_from_single_item_page(res, response_headers)
+
+
+def project_details_from_payload(
+    payload: dict, repo_path: str | None = None
+) -> ProjectDetails:
+    """Builds the details of a project which are given by its payload
+
+    Payloads are given by the project endpoint, but also by group listings (without
+    the license). The fields needing other calls (open merge requests and README)
+    are left empty.
+
+    :param payload: payload of the project (from the API)
+    :param repo_path: URL of the project, defaults to the URL in the payload
+    :return: (partial) details of the project
+    """
+    if repo_path is None:
+        repo_path = payload["web_url"]
+    repo_id = _extract_organisation_and_repository_as_url_block(repo_path)
     # organisation_url = f"https://{gitlab_host}/{repo_id.split('/')[0]}"
     organisation = repo_id.split("/")[0]
-    license = r.get("license", {}).get("name")
-
-    url_readme_file = r["readme_url"].replace("/blob/", "/raw/") + "?inline=false"
-    readme = _web_get(url_readme_file, with_headers=False, is_json=False)
+    license = (payload.get("license") or {}).get("name")
 
     # Fields treated as optional or unstable across non-"gitlab.com" instances
-    fork_details = r.get("forked_from_project")
+    fork_details = payload.get("forked_from_project")
     if isinstance(fork_details, dict):
         forked_from = fork_details.get("namespace", {}).get("web_url")
     else:
         forked_from = None
-    if "updated_at" in r:
-        latest_update = datetime.fromisoformat(r["updated_at"]).date()
+    if "updated_at" in payload:
+        latest_update = datetime.fromisoformat(payload["updated_at"]).date()
     else:
         latest_update = None
 
-    if "last_activity_at" in r:
-        last_commit = datetime.fromisoformat(r["last_activity_at"]).date()
+    if "last_activity_at" in payload:
+        last_commit = datetime.fromisoformat(payload["last_activity_at"]).date()
     else:
         last_commit = None
 
-    n_open_prs = None
-    url_open_pr_raw = r.get("_links", {})
-    if url_open_pr_raw:
-        url_open_pr = url_open_pr_raw.get("merge_requests")
-        if url_open_pr:
-            r_open_pr = _web_get(url_open_pr, is_json=True)
-            n_open_prs = len([i for i in r_open_pr if i.get("state") == "open"])
-
-    details = ProjectDetails(
+    return ProjectDetails(
         id=repo_id,
-        name=r["name"],
+        name=payload["name"],
         organisation=organisation,
-        url=r["web_url"],
+        url=payload["web_url"],
         website=None,
-        description=r["description"],
+        description=payload["description"],
         license=license,
         language=None,  # Not available
         latest_update=latest_update,
         last_commit=last_commit,
-        open_pull_requests=n_open_prs,
-        raw_details=r,
-        master_branch=r["default_branch"],  # Using default branch as master branch
-        readme=readme,
+        open_pull_requests=None,
+        raw_details=payload,
+        # Using default branch as master branch
+        master_branch=payload.get("default_branch"),
+        readme=None,
         is_fork=(forked_from is not None),
         forked_from=forked_from,
     )
+
+
+def fetch_readme_of_details(details: ProjectDetails) -> None:
+    """Fetches the README of a project into its details (from the location in its payload)"""
+    url_readme_file = (
+        details.raw_details["readme_url"].replace("/blob/", "/raw/") + "?inline=false"
+    )
+    details.readme = _web_get(url_readme_file, with_headers=False, is_json=False)
+
+
+def fetch_repository_details(
+    repo_path: str, payload: dict | None = None, with_readme: bool = True
+) -> ProjectDetails:
+    """Fetches the details of a project
+
+    :param repo_path: URL of the project
+    :param payload: payload of the project if already available (e.g. from a group listing), defaults to None
+    :param with_readme: if the README is to be fetched too (else see fetch_readme_of_details), defaults to True
+    :return: details of the project
+    """
+    if (payload is None) or ("license" not in payload):
+        # Group listings do not give the license
+        payload = fetch_project_payload(repo_path)
+    details = project_details_from_payload(payload, repo_path=repo_path)
+
+    if with_readme:
+        fetch_readme_of_details(details)
+
+    url_open_pr_raw = payload.get("_links", {})
+    if url_open_pr_raw:
+        url_open_pr = url_open_pr_raw.get("merge_requests")
+        if url_open_pr:
+            details.open_pull_requests = count_open_merge_requests(url_open_pr)
     return details
 
 
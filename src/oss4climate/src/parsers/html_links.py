@@ -0,0 +1,91 @@
+"""
+Module extracting links (and headings) from webpages
+
+Listing pages only matter for their "<a href>" (and the headings of the sections
+ they are in), so they are read with an event-based parser (html.parser.HTMLParser)
+ keeping these elements only, instead of building the tree of the whole page.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+
+@dataclass(frozen=True)
+class PageElement:
+    tag: str  # "a" for links, else the tag of the heading (e.g. "h2")
+    value: str  # "href" of links, text of headings
+    in_list_item: bool = False
+
+
+class LinkParser(HTMLParser):
+    """
+    Event-based parser keeping the links and headings of a page (in document order)
+
+    Chunks of the page can be fed as they arrive (see HTMLParser.feed).
+    """
+
+    def __init__(self, heading_tags: Iterable[str] = (), class_name: str | None = None):
+        """
+        :param heading_tags: tags of the headings to keep (e.g. ["h2", "h3"]), defaults to none
+        :param class_name: class that links must have to be kept, defaults to None (all links)
+        """
+        super().__init__(convert_charrefs=True)
+        self.elements: list[PageElement] = []
+        self._heading_tags = frozenset(heading_tags)
+        self._class_name = class_name
+        self._list_depth = 0
+        self._open_heading = None
+        self._heading_text = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "a":
+            attrs = dict(attrs)
+            href = attrs.get("href")
+            if href is None:
+                return
+            if (self._class_name is not None) and (
+                self._class_name not in (attrs.get("class") or "").split()
+            ):
+                return
+            self.elements.append(
+                PageElement(tag="a", value=href, in_list_item=self._list_depth > 0)
+            )
+        elif tag == "li":
+            self._list_depth += 1
+        elif tag in self._heading_tags:
+            self._open_heading = tag
+            self._heading_text = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "li":
+            self._list_depth = max(0, self._list_depth - 1)
+        elif tag == self._open_heading:
+            self.elements.append(
+                PageElement(tag=tag, value="".join(self._heading_text))
+            )
+            self._open_heading = None
+
+    def handle_data(self, data: str) -> None:
+        if self._open_heading is not None:
+            self._heading_text.append(data)
+
+
+def extract_page_elements(
+    html: str, heading_tags: Iterable[str] = (), class_name: str | None = None
+) -> list[PageElement]:
+    """Extracts the links and headings of a page, in document order (see LinkParser)"""
+    parser = LinkParser(heading_tags=heading_tags, class_name=class_name)
+    parser.feed(html)
+    parser.close()
+    return parser.elements
+
+
+def extract_links(html: str, class_name: str | None = None) -> list[str]:
+    """Extracts the "href" of the links of a page
+
+    :param html: page
+    :param class_name: class that links must have to be kept, defaults to None (all links)
+    :return: "href" of the links, in document order
+    """
+    return [i.value for i in extract_page_elements(html, class_name=class_name)]
@@ -3,26 +3,22 @@ Parser for LF Energy projects
 """
 
 import yaml
-from bs4 import BeautifulSoup
 
 from oss4climate.src.parsers import (
     ParsingTargets,
     cached_web_get_text,
     identify_parsing_targets,
 )
-from oss4climate.src.parsers.github_data_io import GITHUB_URL_BASE
-from oss4climate.src.parsers.gitlab_data_io import GITLAB_ANY_URL_PREFIX
+from oss4climate.src.parsers.html_links import extract_links
+from oss4climate.src.parsers.urls import canonicalise_urls
 
 _PROJECT_PAGE_URL_BASE = "https://lfenergy.org/projects/"
 
 
 def fetch_all_project_urls_from_lfe_webpage() -> list[str]:
     r_text = cached_web_get_text("https://lfenergy.org/our-projects/")
-    b = BeautifulSoup(r_text, features="html.parser")
-
-    rs = b.findAll(name="a")
     shortlisted_urls = [
-        i for i in [x.get("href") for x in rs] if i.startswith(_PROJECT_PAGE_URL_BASE)
+        i for i in extract_links(r_text) if i.startswith(_PROJECT_PAGE_URL_BASE)
     ]
     # Ensure unicity of links
     return list(set(shortlisted_urls))
@@ -34,22 +30,15 @@ def fetch_project_github_urls_from_lfe_energy_project_webpage(
     if not project_url.startswith(_PROJECT_PAGE_URL_BASE):
         raise ValueError(f"Unsupported page URL ({project_url})")
     r_text = cached_web_get_text(project_url)
-    b = BeautifulSoup(r_text, features="html.parser")
-
-    rs = b.findAll(name="a", attrs={"class": "projects-icon"})
+    links = extract_links(r_text, class_name="projects-icon")
 
-    # Github URLs
-    github_urls = [
-        i for i in [x.get("href") for x in rs] if i.startswith(GITHUB_URL_BASE)
+    # Github and Gitlab URLs
+    forge_urls = [
+        u.url
+        for u in canonicalise_urls(links)
+        if (u.forge is not None) and (not u.url.endswith(".md"))
     ]
-    github_urls = [i for i in github_urls if not i.endswith(".md")]
-    # Gitlab URLs
-    gitlab_urls = [
-        i for i in [x.get("href") for x in rs] if i.startswith(GITLAB_ANY_URL_PREFIX)
-    ]
-    gitlab_urls = [i for i in gitlab_urls if not i.endswith(".md")]
-
-    return identify_parsing_targets(github_urls + gitlab_urls)
+    return identify_parsing_targets(forge_urls)
 
 
 def get_open_source_energy_projects_from_landscape() -> ParsingTargets:
@@ -0,0 +1,91 @@
+"""
+Module extracting links from Markdown (e.g. READMEs of curated lists)
+
+Links found are:
+- inline links and images ("[text](url)", including links around badges)
+- reference links ("[text][label]", "[label][]" and "[label]") with their
+  definitions ("[label]: url"), which can come after the links
+- autolinks ("<https://...>") and bare URLs ("https://...")
+
+The text is read once, by two precompiled scanners (one for the constructs in
+ brackets, one for URLs between them, each starting with a literal so that the
+ regular expression engine can skip ahead quickly).
+"""
+
+import re
+from collections.abc import Iterator
+
+# (possessive quantifiers everywhere brackets end runs of text, for constructs that
+#  are not links to fail without backtracking)
+_BRACKETED_TEXT = (
+    r"\[[^\[\]\n]*+(?:\[[^\[\]\n]*+\][^\[\]\n]*+)*+\]"  # (one level of nesting)
+)
+_BRACKETS = re.compile(
+    # Inline links
+    #  (with URLs having up to one level of balanced parentheses, as in Wikipedia URLs)
+    rf"{_BRACKETED_TEXT}\([ \t]*<?(?P<inline_url>(?:[^\s()<>]++|\([^\s()<>]*+\))++)>?"
+    r"(?:[ \t]+\"[^\"\n]*\")?[ \t]*\)"
+    # Reference definitions and links (full, collapsed or shortcut)
+    r"|\[(?P<label>[^\[\]\n]++)\]"
+    r"(?::[ \t]*\n?[ \t]*<?(?P<definition_url>[^\s>]+)>?|[ ]?\[(?P<reference_label>[^\[\]\n]*+)\])?"
+)
+# Autolinks (within "<>") and bare URLs
+_URLS = re.compile(r"https?://[^\s<>()\[\]\"'`]+")
+# Characters ending sentences rather than URLs (as for GFM autolinks)
+_URL_TRAILING_CHARACTERS = ".,:;!?*_~'\""
+
+
+def _normalised_label(x: str) -> str:
+    return " ".join(x.split()).lower()
+
+
+def _is_at_line_start(text: str, position: int) -> bool:
+    # Reference definitions can be indented by up to 3 spaces
+    indent = text[text.rfind("\n", 0, position) + 1 : position]
+    return (len(indent) <= 3) and (indent.strip(" ") == "")
+
+
+def iter_markdown_links(markdown_text: str) -> Iterator[str]:
+    """Yields the URLs of the links of a Markdown text
+
+    URLs are yielded as they are found, except for reference links used before
+    their definition, which are yielded at the end of the text.
+
+    :param markdown_text: Markdown text
+    :return: iterator over the URLs (in the order of the text, possibly repeated)
+    """
+    definitions = dict()
+    pending_labels = []
+    position = 0
+    for b in _BRACKETS.finditer(markdown_text):
+        # URLs between constructs in brackets (the ones within constructs being part
+        #  of them, and URLs not spanning over a "[")
+        for u in _URLS.finditer(markdown_text, position, b.start()):
+            yield u.group().rstrip(_URL_TRAILING_CHARACTERS)
+        position = b.end()
+        # (the last group matched telling the kind of construct)
+        kind = b.lastgroup
+        if kind == "inline_url":
+            yield b.group(kind)
+        elif kind == "definition_url":
+            if _is_at_line_start(markdown_text, b.start()):
+                # The first definition of a label prevails
+                definitions.setdefault(
+                    _normalised_label(b.group("label")), b.group(kind)
+                )
+            else:
+                yield b.group(kind)
+        else:
+            label = _normalised_label(b.group("reference_label") or b.group("label"))
+            if label in definitions:
+                yield definitions[label]
+            else:
+                pending_labels.append(label)
+    for u in _URLS.finditer(markdown_text, position):
+        yield u.group().rstrip(_URL_TRAILING_CHARACTERS)
+
+    # Reference links used before their definition (shortcut references with no
+    #  definition being plain text in brackets)
+    for label in pending_labels:
+        if label in definitions:
+            yield definitions[label]
@@ -2,27 +2,25 @@
 Module parsing https://opensustain.tech/
 """
 
-from bs4 import BeautifulSoup
-
 from oss4climate.src.parsers import (
     ParsingTargets,
     ResourceListing,
     cached_web_get_text,
-    github_data_io,
-    gitlab_data_io,
     isolate_relevant_urls,
 )
 from oss4climate.src.parsers import (
     fetch_all_project_urls_from_html_webpage as __fetch_from_html,
 )
+from oss4climate.src.parsers.html_links import extract_page_elements
+from oss4climate.src.parsers.urls import Forge, canonicalise_urls
 
 
 def fetch_all_project_urls_from_opensustain_webpage() -> ParsingTargets:
     return __fetch_from_html("https://opensustain.tech/")
 
 
-def _f_clean_key(x):
-    return x.text.replace("¶", "")
+def _f_clean_key(x: str) -> str:
+    return x.replace("¶", "")
 
 
 def fetch_categorised_projects_from_opensustain_webpage(
@@ -33,32 +31,30 @@ def fetch_categorised_projects_from_opensustain_webpage(
     :return: categorised list of repositories
     """
     r_text = cached_web_get_text("https://opensustain.tech/")
-    b = BeautifulSoup(r_text, features="html.parser")
+    elements = extract_page_elements(r_text, heading_tags=["h2", "h3"])
 
     # This part is built for the specific page structure at the time of writing (18/10/2024)
     #   and assumes that the information is rolled out in a consistent sequential manner
     d = dict()
     orphan_links = []
-    xs = b.findAll(name=["h2", "h3", "li"])
     current_h2 = None
     current_h3 = None
-    for i in xs:
-        if i.name == "h2":
-            current_h2 = _f_clean_key(i)
+    for i in elements:
+        if i.tag == "h2":
+            current_h2 = _f_clean_key(i.value)
             if current_h2 not in d.keys():
                 d[current_h2] = dict()
-        elif i.name == "h3":
-            current_h3 = _f_clean_key(i)
+        elif i.tag == "h3":
+            current_h3 = _f_clean_key(i.value)
             if current_h3 not in d[current_h2].keys():
                 d[current_h2][current_h3] = []
-        elif i.name == "li":
-            links = [j.get("href") for j in i.findAll(name="a")]
+        elif i.in_list_item:
             if current_h2 and current_h3:
                 if current_h3 not in d[current_h2].keys():
                     d[current_h2][current_h3] = []
-                d[current_h2][current_h3] += links
+                d[current_h2][current_h3].append(i.value)
             else:
-                orphan_links += links
+                orphan_links.append(i.value)
 
     # Removing code-irrelevant fields
     for i in ["Contributors", "Artwork and License"]:
@@ -82,13 +78,11 @@ def fetch_listing_of_listings_from_opensustain_webpage() -> ResourceListing:
         "Sustainable Development"
     ).get("Data Catalogs and Interfaces")
     gits = isolate_relevant_urls(listing_urls)
-    others = [i for i in listing_urls if i not in gits]
+    relevant_urls = set(gits)
+    others = [i for i in listing_urls if i not in relevant_urls]
+    forges = [u.forge for u in canonicalise_urls(gits)]
     return ResourceListing(
-        github_readme_listings=[
-            i for i in gits if i.startswith(github_data_io.GITHUB_URL_BASE)
-        ],
-        gitlab_readme_listings=[
-            i for i in gits if i.startswith(gitlab_data_io.GITLAB_URL_BASE)
-        ],
+        github_readme_listings=[i for i, f in zip(gits, forges) if f is Forge.GITHUB],
+        gitlab_readme_listings=[i for i, f in zip(gits, forges) if f is Forge.GITLAB],
         fault_urls=others,
     )
@@ -0,0 +1,178 @@
+"""
+Module for the canonicalisation and classification of URLs of code forges
+
+Each URL is parsed once (with a single regular expression, results being memoised)
+ into a CanonicalUrl giving its forge, owner, repository and type of target.
+ Variants of a URL ("http://", "www.", trailing "/", ".git" suffix, query or
+ fragment) share the same canonical URL, and URLs only differing by case share the
+ same key.
+"""
+
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+
+_URL = re.compile(
+    r"^\s*(https?)://(?:www\.)?(?P<host>[^/?#&\s]+)(?P<path>[^?#&\s]*)",
+    re.IGNORECASE,
+)
+# URLs of forges already in canonical form (up to case), as most URLs of listings
+_CANONICAL_FORGE_URL = re.compile(
+    r"https://(?:github\.com|gitlab\.[^/?#&\s]+)(?:/[^/?#&\s]+)*", re.IGNORECASE
+)
+_GITHUB_HOST = "github.com"
+_GITLAB_HOST_PREFIX = "gitlab."  # Since Gitlabs can be self-hosted on another domain
+_GITLAB_SUBPATH_SEPARATOR = "-"  # As in "https://gitlab.com/group/project/-/tree/main"
+
+
+class Forge(Enum):
+    GITHUB = "GITHUB"
+    GITLAB = "GITLAB"
+
+
+class TargetType(Enum):
+    ORGANISATION = "ORGANISATION"  # Github organisation (or user) or Gitlab group
+    REPOSITORY = "REPOSITORY"  # Github repository or Gitlab project
+    UNKNOWN = "UNKNOWN"
+
+
+# Separators of the paths within repositories in canonical URLs
+_SUBPATH_SEPARATORS = {Forge.GITHUB: "/", Forge.GITLAB: "/-/"}
+
+
+@dataclass(frozen=True)
+class CanonicalUrl:
+    # Canonical URL (or the stripped input, if not the URL of a forge)
+    url: str
+    # Key for deduplication (URLs only differing by case having the same key)
+    key: str
+    host: str | None = None
+    forge: Forge | None = None
+    # Organisation (Github) or namespace (Gitlab, e.g. "group/subgroup")
+    owner: str | None = None
+    repo: str | None = None
+    # Path within the repository (e.g. "tree/main/src")
+    subpath: str = ""
+    target_type: TargetType = TargetType.UNKNOWN
+
+    @property
+    def path(self) -> str:
+        """Path of the target on its forge ("owner" or "owner/repo")"""
+        if self.repo is None:
+            return self.owner or ""
+        return f"{self.owner}/{self.repo}"
+
+
+def _not_a_forge_url(url: str, host: str | None = None) -> CanonicalUrl:
+    url = url.strip().rstrip("/")
+    return CanonicalUrl(url=url, key=url.lower(), host=host)
+
+
+def _split_forge_url(
+    url: str,
+) -> tuple[str | None, Forge | None, list[str], list[str]]:
+    """Splits the URL of a forge into its host, forge, segments and subpath
+
+    (the forge being None if the URL is not the URL of a forge, with ".git"
+    suffixes of repositories being removed)
+    """
+    m = _URL.match(url)
+    if m is None:
+        return None, None, [], []
+    host = m.group("host").lower()
+    segments = [i for i in m.group("path").split("/") if i]
+    subpath = []
+    if host == _GITHUB_HOST:
+        forge = Forge.GITHUB
+        # Github has no nesting (further segments being pages of the repository)
+        i_repo = 1
+    elif host.startswith(_GITLAB_HOST_PREFIX):
+        forge = Forge.GITLAB
+        if _GITLAB_SUBPATH_SEPARATOR in segments:
+            i = segments.index(_GITLAB_SUBPATH_SEPARATOR)
+            segments, subpath = segments[:i], segments[i + 1 :]
+        i_repo = len(segments) - 1
+    else:
+        return host, None, segments, subpath
+    if len(segments) > 1:
+        segments[i_repo] = segments[i_repo].removesuffix(".git")
+    return host, forge, segments, subpath
+
+
+def _forge_url_string(
+    host: str, forge: Forge, segments: list[str], subpath: list[str]
+) -> str:
+    url = f"https://{host}"
+    if segments:
+        url += "/" + "/".join(segments)
+    if subpath:
+        url += _SUBPATH_SEPARATORS[forge] + "/".join(subpath)
+    return url
+
+
+@lru_cache(maxsize=2**17)
+def canonicalise_url(url: str) -> CanonicalUrl:
+    """Parses a URL into its canonical form (memoised)
+
+    :param url: URL (of a forge or not)
+    :return: canonical URL, with the details of its target
+    """
+    host, forge, segments, subpath = _split_forge_url(url)
+    if forge is None:
+        return _not_a_forge_url(url, host=host)
+    elif len(segments) == 0:
+        return _not_a_forge_url(f"https://{host}", host=host)
+
+    canonical_url = _forge_url_string(host, forge, segments, subpath)
+    if len(segments) == 1:
+        owner = segments[0]
+        repo = None
+        target_type = TargetType.ORGANISATION
+    elif (forge is Forge.GITHUB) and (len(segments) > 2):
+        # (page of a repository)
+        subpath = segments[2:]
+        owner, repo = segments[:2]
+        target_type = TargetType.UNKNOWN
+    else:
+        owner = "/".join(segments[:-1])
+        repo = segments[-1]
+        target_type = TargetType.REPOSITORY
+    return CanonicalUrl(
+        url=canonical_url,
+        key=canonical_url.lower(),
+        host=host,
+        forge=forge,
+        owner=owner,
+        repo=repo,
+        subpath="/".join(subpath),
+        target_type=target_type,
+    )
+
+
+@lru_cache(maxsize=2**17)
+def url_key(url: str) -> str:
+    """Key of a URL for deduplication (memoised)
+
+    Same as canonicalise_url(url).key, without the classification of the target
+    (several times faster, e.g. for indexing large sets of URLs).
+    """
+    if (
+        (_CANONICAL_FORGE_URL.fullmatch(url) is not None)
+        and (".git" not in url)
+        and ("/-" not in url)
+    ):
+        # (no ".git" suffix nor Gitlab subpath to normalise)
+        return url.lower()
+    host, forge, segments, subpath = _split_forge_url(url)
+    if forge is None:
+        return url.strip().rstrip("/").lower()
+    elif len(segments) == 0:
+        return f"https://{host}"
+    return _forge_url_string(host, forge, segments, subpath).lower()
+
+
+def canonicalise_urls(urls: Iterable[str | None]) -> list[CanonicalUrl]:
+    """Canonicalises a batch of URLs (missing ones, e.g. links without "href", being skipped)"""
+    return [canonicalise_url(i) for i in urls if i]
@@ -0,0 +1,151 @@
+"""
+Module writing the TOML files of the project (indices, listings and summaries)
+
+Files are written directly in their canonical layout (arrays on one line if they fit,
+ else one element per line with a trailing comma), in a single buffered write, so
+ that they do not need to be formatted afterwards. Elements can also be inserted into
+ the (sorted) arrays of an existing file without rewriting the rest of it.
+"""
+
+import json
+import re
+import tomllib
+from bisect import bisect_left
+from collections.abc import Iterable
+
+_MAX_LINE_LENGTH = 88
+_INDENT = "    "
+_BARE_KEY = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _format_key(x: str) -> str:
+    if _BARE_KEY.match(x):
+        return x
+    return json.dumps(x, ensure_ascii=False)
+
+
+def _format_value(x) -> str:
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    elif isinstance(x, (int, float)):
+        return repr(x)
+    elif isinstance(x, str):
+        # JSON escapes are valid in TOML basic strings
+        return json.dumps(x, ensure_ascii=False)
+    elif isinstance(x, dict):
+        items = ", ".join(
+            f"{_format_key(k)} = {_format_value(v)}" for k, v in x.items()
+        )
+        return f"{{ {items} }}" if items else "{}"
+    elif isinstance(x, (list, tuple)):
+        return "[" + ", ".join(_format_value(i) for i in x) + "]"
+    else:
+        raise TypeError(f"Unsupported type in TOML ({type(x)})")
+
+
+def _format_array_lines(key: str, x: list) -> list[str]:
+    line = f"{_format_key(key)} = {_format_value(x)}"
+    if len(line) <= _MAX_LINE_LENGTH:
+        return [line]
+    out = [f"{_format_key(key)} = ["]
+    out += [f"{_INDENT}{_format_value(i)}," for i in x]
+    out.append("]")
+    return out
+
+
+def _format_table_lines(name: str | None, x: dict) -> list[str]:
+    out = []
+    if name is not None:
+        out.append(f"[{name}]")
+    subtables = []
+    for k, v in x.items():
+        if isinstance(v, dict):
+            subtables.append((k, v))
+        elif isinstance(v, (list, tuple)):
+            out += _format_array_lines(k, v)
+        else:
+            out.append(f"{_format_key(k)} = {_format_value(v)}")
+    for k, v in subtables:
+        if out:
+            out.append("")
+        prefix = _format_key(k) if name is None else f"{name}.{_format_key(k)}"
+        out += _format_table_lines(prefix, v)
+    return out
+
+
+def dumps_toml(x: dict) -> str:
+    """Serialises a dictionary into TOML (in the canonical layout of the project)
+
+    :param x: data (sub-dictionaries being written as tables, in order)
+    :return: TOML document
+    """
+    return "\n".join(_format_table_lines(None, x)) + "\n"
+
+
+def write_toml(x: dict, toml_file_path: str) -> None:
+    """Writes a dictionary into a TOML file (see dumps_toml)"""
+    with open(toml_file_path, "w", encoding="utf-8") as f:
+        f.write(dumps_toml(x))
+
+
+def format_toml_file(toml_file_path: str) -> None:
+    """Rewrites a TOML file in the canonical layout"""
+    with open(toml_file_path, "rb") as f:
+        x = tomllib.load(f)
+    write_toml(x, toml_file_path)
+
+
+def _find_array(lines: list[str], table: str, key: str) -> tuple[int, int]:
+    # Lines of the start and end of the array ("key = [" and "]") in the table
+    in_table = False
+    start = None
+    for i, line in enumerate(lines):
+        if line.startswith("["):
+            if start is not None:
+                break
+            in_table = line.strip() == f"[{table}]"
+        elif in_table and (start is None) and line.startswith(f"{_format_key(key)} ="):
+            start = i
+            if line.rstrip().endswith("]"):
+                return start, start
+        elif (start is not None) and (line.rstrip() == "]"):
+            return start, i
+    raise KeyError(f"No array {table}.{key} in the TOML file")
+
+
+def insert_into_toml_arrays(
+    toml_file_path: str, elements: dict[tuple[str, str], Iterable[str]]
+) -> None:
+    """Inserts strings into sorted arrays of a TOML file, without rewriting the rest
+
+    Elements are inserted at their place in the order of the arrays (which are
+    expected to be sorted, as written by the project), and elements already in
+    the arrays are skipped.
+
+    :param toml_file_path: TOML file (in the canonical layout, see dumps_toml)
+    :param elements: elements to insert, by (table, key) of the arrays
+    :raises KeyError: if an array is missing from the file
+    """
+    with open(toml_file_path, "rb") as f:
+        raw = f.read()
+    data = tomllib.loads(raw.decode("utf-8"))
+    lines = raw.decode("utf-8").split("\n")
+
+    for (table, key), new_elements in elements.items():
+        existing = data[table][key]
+        new_elements = sorted(set(new_elements).difference(existing))
+        if len(new_elements) == 0:
+            continue
+        start, end = _find_array(lines, table, key)
+        merged = existing + new_elements
+        if (start == end) or (len(_format_array_lines(key, merged)) == 1):
+            # Arrays on one line are written again (they may not fit anymore)
+            lines[start : end + 1] = _format_array_lines(key, sorted(merged))
+            continue
+        # Inserting from the end, so that the positions of elements stay valid
+        for x in reversed(new_elements):
+            i = bisect_left(existing, x)
+            lines.insert(start + 1 + i, f"{_INDENT}{_format_value(x)},")
+
+    with open(toml_file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
@@ -0,0 +1,571 @@
+"""
+Module managing the concurrency and the pace of web requests
+
+Requests are made with blocking calls ("requests"), which are run concurrently in
+ worker threads by an asyncio event loop. The number of simultaneous requests to
+ a given host is bounded independently of the number of workers.
+
+The pace of requests is set per host by a scheduler: hosts reporting their rate
+ limits (GitHub, GitLab) are queried at full speed as long as budget remains and
+ paused until the reset of their budget once it runs out. Other hosts are paced by
+ a token bucket (SETTINGS.WEB_REQUESTS_PER_SECOND_PER_HOST).
+
+Transient failures (connection errors, timeouts, 5xx) are retried with a jittered
+ exponential backoff, and a per-host circuit breaker fails fast once a host is down.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, TypeVar
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.log import log_info, log_warning
+
+T = TypeVar("T")
+
+WEB_SESSION = requests.Session()
+# Connection pools large enough for the concurrent requests made to each host
+_WEB_ADAPTER = requests.adapters.HTTPAdapter(
+    pool_maxsize=max(10, SETTINGS.WEB_MAX_CONCURRENCY_PER_HOST)
+)
+WEB_SESSION.mount("http://", _WEB_ADAPTER)
+WEB_SESSION.mount("https://", _WEB_ADAPTER)
+
+# Margin added to the reset times given by servers (to absorb clock differences)
+_RESET_MARGIN_SECONDS = 1.0
+# Maximal number of times a request is retried after hitting a rate limit
+_MAX_RATE_LIMITED_ATTEMPTS = 3
+# Failures considered as transient (GET requests being idempotent, they are retried)
+_RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+_RETRYABLE_STATUS_CODES = [500, 502, 503, 504]
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised when requests to a host are not attempted as the host appears to be down"""
+
+
+_HOST_SEMAPHORES: dict[str, threading.BoundedSemaphore] = dict()
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def rate_limit_key(url: str) -> str:
+    """Key of the rate limit budget applying to the URL
+
+    (the host, except for GraphQL endpoints which have a budget of their own)
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if parsed.path.rstrip("/").endswith("/graphql"):
+        return f"{host}/graphql"
+    return host
+
+
+def parse_link_header(x: str | None) -> dict[str, str]:
+    """Parses a "Link" header (as used for pagination) into a dictionary {rel: url}"""
+    if not x:
+        return dict()
+    return {
+        i["rel"]: i["url"]
+        for i in requests.utils.parse_header_links(x)
+        if ("rel" in i) and ("url" in i)
+    }
+
+
+def page_number(url: str, parameter: str = "page") -> int | None:
+    """Extracts the page number from the query of a pagination URL"""
+    values = parse_qs(urlparse(url).query).get(parameter)
+    if not values:
+        return None
+    try:
+        return int(values[0])
+    except ValueError:
+        return None
+
+
+def count_from_single_item_page(items: list, headers: dict[str, str]) -> int:
+    """Total number of items of a listing, from its first page of size 1 ("per_page=1")
+
+    The total is read from the "X-Total" header (Gitlab), else from the number of the
+    last page given by the "Link" header (Github), so that the payload remains
+    constant whatever the number of items.
+
+    :param items: items of the first page
+    :param headers: response headers (with keys in lower case)
+    :return: total number of items
+    """
+    x_total = headers.get("x-total")
+    if x_total:
+        return int(x_total)
+    last_url = parse_link_header(headers.get("link")).get("last")
+    if last_url is not None:
+        last_page = page_number(last_url)
+        if last_page is not None:
+            return last_page
+    # Single page (all items are on it)
+    return len(items)
+
+
+def _host_semaphore(host: str) -> threading.BoundedSemaphore:
+    with _HOST_SEMAPHORES_LOCK:
+        x = _HOST_SEMAPHORES.get(host)
+        if x is None:
+            x = threading.BoundedSemaphore(SETTINGS.WEB_MAX_CONCURRENCY_PER_HOST)
+            _HOST_SEMAPHORES[host] = x
+        return x
+
+
+@contextmanager
+def host_slot(url: str):
+    """Context in which a request to the host of the URL can be made
+
+    (blocks while the maximal number of concurrent requests to the host is reached)
+    """
+    semaphore = _host_semaphore(host_of(url))
+    with semaphore:
+        yield
+
+
+async def _gather_in_threads(
+    function: Callable[[T], Any],
+    items: list[T],
+    max_concurrency: int,
+) -> list[Any]:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="oss4climate-web"
+    ) as executor:
+        # Each call runs in a copy of the current context (as with asyncio.to_thread)
+        futures = [
+            loop.run_in_executor(executor, contextvars.copy_context().run, function, i)
+            for i in items
+        ]
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+
+def run_concurrently(
+    function: Callable[[T], Any],
+    items: Iterable[T],
+    max_concurrency: int | None = None,
+) -> list[Any]:
+    """Runs a (blocking) function over items concurrently
+
+    The output is in the same order as the items (exceptions raised are returned
+    in place of the results, so that failures can be handled item by item).
+
+    :param function: function to run on each item
+    :param items: items to process
+    :param max_concurrency: maximal number of concurrent calls, defaults to SETTINGS.WEB_MAX_CONCURRENCY
+    :return: list of results (or exceptions) in the order of the items
+    """
+    items = list(items)
+    if max_concurrency is None:
+        max_concurrency = SETTINGS.WEB_MAX_CONCURRENCY
+    if len(items) == 0:
+        return []
+    if max_concurrency <= 1:
+        out = []
+        for i in items:
+            try:
+                out.append(function(i))
+            except Exception as e:
+                out.append(e)
+        return out
+    return asyncio.run(_gather_in_threads(function, items, max_concurrency))
+
+
+# -------------------------------------------------------------------------------------
+# Scheduling of requests
+# -------------------------------------------------------------------------------------
+@dataclass
+class HostBudget:
+    host: str
+    requests_per_second: float
+    tokens: float
+    last_refill: float
+    # Budget reported by the server (None if unknown)
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: float | None = None
+    paused_until: float = 0.0
+    n_requests: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> dict:
+        return dict(
+            requests=self.n_requests,
+            limit=self.limit,
+            remaining=self.remaining,
+            reset_at=(
+                None
+                if self.reset_at is None
+                else datetime.fromtimestamp(self.reset_at, tz=UTC).isoformat()
+            ),
+        )
+
+
+def _header_as_int(headers: dict, names: list[str]) -> int | None:
+    for n in names:
+        v = headers.get(n)
+        if v is not None:
+            try:
+                return int(float(v))
+            except ValueError:
+                pass
+    return None
+
+
+def _retry_after_seconds(headers: dict) -> float | None:
+    v = headers.get("Retry-After")
+    if v is None:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RequestScheduler:
+    """Paces requests per host, following the rate limits reported by the servers"""
+
+    def __init__(self, requests_per_second: float | None = None):
+        if requests_per_second is None:
+            requests_per_second = SETTINGS.WEB_REQUESTS_PER_SECOND_PER_HOST
+        self.requests_per_second = requests_per_second
+        self._budgets: dict[str, HostBudget] = dict()
+        self._lock = threading.Lock()
+
+    def budget(self, url: str) -> HostBudget:
+        host = rate_limit_key(url)
+        with self._lock:
+            x = self._budgets.get(host)
+            if x is None:
+                x = HostBudget(
+                    host=host,
+                    requests_per_second=self.requests_per_second,
+                    tokens=1.0,
+                    last_refill=time.monotonic(),
+                )
+                self._budgets[host] = x
+            return x
+
+    def budgets(self) -> dict[str, dict]:
+        """Current budgets by host (e.g. for logging)"""
+        with self._lock:
+            return {k: v.as_dict() for k, v in sorted(self._budgets.items())}
+
+    def _delay_before_request(self, b: HostBudget) -> float:
+        # Returns 0 (and consumes the budget) if the request can go, else the time to wait
+        now = time.time()
+        if b.paused_until > now:
+            return b.paused_until - now
+        if b.remaining is not None:
+            if b.remaining > 0:
+                b.remaining -= 1
+                b.n_requests += 1
+                return 0.0
+            if (b.reset_at is not None) and (b.reset_at + _RESET_MARGIN_SECONDS > now):
+                b.paused_until = b.reset_at + _RESET_MARGIN_SECONDS
+                log_warning(
+                    f"Rate limit budget exhausted for {b.host}, pausing for"
+                    f" {b.paused_until - now:.0f} s"
+                )
+                return b.paused_until - now
+            # The budget was reset (its new value is unknown until the next response)
+            b.remaining = None
+            b.reset_at = None
+        if b.requests_per_second <= 0:
+            b.n_requests += 1
+            return 0.0
+        # Token bucket (for hosts not reporting their budget)
+        monotonic_now = time.monotonic()
+        b.tokens = min(
+            1.0, b.tokens + (monotonic_now - b.last_refill) * b.requests_per_second
+        )
+        b.last_refill = monotonic_now
+        if b.tokens >= 1.0:
+            b.tokens -= 1.0
+            b.n_requests += 1
+            return 0.0
+        return (1.0 - b.tokens) / b.requests_per_second
+
+    def acquire(self, url: str) -> None:
+        """Blocks until a request can be made to the host of the URL"""
+        b = self.budget(url)
+        while True:
+            with b.lock:
+                delay = self._delay_before_request(b)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def update(self, url: str, status_code: int, headers: dict) -> float | None:
+        """Updates the budget of the host from the headers of a response
+
+        :return: time to wait before retrying (if the request was rate limited), else None
+        """
+        b = self.budget(url)
+        limit = _header_as_int(headers, ["X-RateLimit-Limit", "RateLimit-Limit"])
+        remaining = _header_as_int(
+            headers, ["X-RateLimit-Remaining", "RateLimit-Remaining"]
+        )
+        reset_at = _header_as_int(headers, ["X-RateLimit-Reset", "RateLimit-Reset"])
+        retry_after = _retry_after_seconds(headers)
+        with b.lock:
+            if remaining is not None:
+                b.limit = limit
+                b.remaining = remaining
+                b.reset_at = reset_at
+                if b.n_requests % 100 == 0:
+                    log_info(f"Rate limit budget for {b.host}: {b.as_dict()}")
+            if status_code not in [403, 429]:
+                return None
+            if retry_after is not None:
+                delay = retry_after
+            elif (remaining == 0) and (reset_at is not None):
+                delay = max(0.0, reset_at + _RESET_MARGIN_SECONDS - time.time())
+            else:
+                # Forbidden for other reasons than rate limits
+                return None
+            b.paused_until = max(b.paused_until, time.time() + delay)
+        log_warning(f"Rate limited by {b.host}, pausing for {delay:.0f} s")
+        return delay
+
+
+SCHEDULER = RequestScheduler()
+
+
+# -------------------------------------------------------------------------------------
+# Circuit breakers
+# -------------------------------------------------------------------------------------
+class CircuitBreaker:
+    """
+    Stops requests to a host after a number of consecutive failures
+
+    Once open, the circuit lets a single trial request through after a cooldown,
+    closing again if it succeeds.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int | None = None,
+        cooldown_seconds: float | None = None,
+    ):
+        if failure_threshold is None:
+            failure_threshold = SETTINGS.WEB_CIRCUIT_BREAKER_THRESHOLD
+        if cooldown_seconds is None:
+            cooldown_seconds = SETTINGS.WEB_CIRCUIT_BREAKER_COOLDOWN_SECONDS
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self) -> None:
+        """Raises CircuitOpenError if no request is to be made to the host"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self.opened_at < self.cooldown_seconds:
+                raise CircuitOpenError(
+                    f"{self.host} appears to be down (after"
+                    f" {self.consecutive_failures} consecutive failures)"
+                )
+            # Letting this trial request through (others wait for another cooldown)
+            self.opened_at = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                log_info(f"{self.host} is reachable again")
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    log_warning(
+                        f"{self.host} appears to be down, stopping requests for"
+                        f" {self.cooldown_seconds:.0f} s"
+                    )
+                self.opened_at = time.monotonic()
+
+
+_CIRCUIT_BREAKERS: dict[str, CircuitBreaker] = dict()
+_CIRCUIT_BREAKERS_LOCK = threading.Lock()
+
+
+def circuit_breaker(url: str) -> CircuitBreaker:
+    host = host_of(url)
+    with _CIRCUIT_BREAKERS_LOCK:
+        x = _CIRCUIT_BREAKERS.get(host)
+        if x is None:
+            x = CircuitBreaker(host)
+            _CIRCUIT_BREAKERS[host] = x
+        return x
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Exponential backoff with "full jitter"
+    ceiling = min(
+        SETTINGS.WEB_RETRY_MAX_BACKOFF_SECONDS,
+        SETTINGS.WEB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1),
+    )
+    return random.uniform(0, ceiling)
+
+
+# -------------------------------------------------------------------------------------
+# Counting of requests
+# -------------------------------------------------------------------------------------
+class RequestCounter:
+    """Number of requests sent over the network (retries included)"""
+
+    def __init__(self):
+        self.n_requests = 0
+        self._lock = threading.Lock()
+
+    def increment(self) -> None:
+        with self._lock:
+            self.n_requests += 1
+
+
+# Counters active in the current context (copied to the threads of run_concurrently)
+_REQUEST_COUNTERS: contextvars.ContextVar[tuple[RequestCounter, ...]] = (
+    contextvars.ContextVar("request_counters", default=())
+)
+
+
+@contextmanager
+def counting_requests():
+    """Context counting the requests sent over the network within it
+
+    (e.g. to measure the number of API calls needed for a repository)
+    """
+    counter = RequestCounter()
+    token = _REQUEST_COUNTERS.set(_REQUEST_COUNTERS.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _REQUEST_COUNTERS.reset(token)
+
+
+# -------------------------------------------------------------------------------------
+# Requests
+# -------------------------------------------------------------------------------------
+def scheduled_get(
+    url: str, headers: dict | None = None, throttle: bool = True
+) -> requests.Response:
+    """GET request, made when the concurrency and rate limits of the host allow it
+
+    Requests rejected because of rate limits are retried once the limit is reset,
+    and transient failures are retried with backoff (up to SETTINGS.WEB_RETRY_ATTEMPTS).
+
+    :param url: URL to query
+    :param headers: headers of the request, defaults to None
+    :param throttle: if the pace of the host is to be respected, defaults to True
+    :raises CircuitOpenError: if the host appears to be down
+    :return: response
+    """
+    return scheduled_request("GET", url, headers=headers, throttle=throttle)
+
+
+def scheduled_request(
+    method: str,
+    url: str,
+    headers: dict | None = None,
+    throttle: bool = True,
+    json: Any = None,
+    stream: bool = False,
+) -> requests.Response:
+    """Same as scheduled_get, for any method (only to be used for idempotent requests,
+    as failed requests are retried - e.g. POST requests of GraphQL queries)
+
+    :param method: HTTP method of the request
+    :param url: URL to query
+    :param headers: headers of the request, defaults to None
+    :param throttle: if the pace of the host is to be respected, defaults to True
+    :param json: JSON body of the request, defaults to None
+    :param stream: if the body of the response is to be read as a stream (e.g. with iter_content), defaults to False
+    :raises CircuitOpenError: if the host appears to be down
+    :return: response
+    """
+    breaker = circuit_breaker(url)
+    n_failures = 0
+    n_rate_limited = 0
+    while True:
+        breaker.check()
+        try:
+            with host_slot(url):
+                if throttle:
+                    SCHEDULER.acquire(url)
+                for c in _REQUEST_COUNTERS.get():
+                    c.increment()
+                r = WEB_SESSION.request(
+                    method,
+                    url=url,
+                    headers=headers,
+                    json=json,
+                    stream=stream,
+                    timeout=SETTINGS.WEB_TIMEOUT_SECONDS,
+                )
+        except _RETRYABLE_EXCEPTIONS as e:
+            breaker.record_failure()
+            n_failures += 1
+            if n_failures >= SETTINGS.WEB_RETRY_ATTEMPTS:
+                raise
+            delay = _backoff_delay(n_failures)
+            log_info(f"> Retrying {url} in {delay:.1f} s ({e.__class__.__name__})")
+            time.sleep(delay)
+            continue
+
+        rate_limit_delay = SCHEDULER.update(url, r.status_code, r.headers)
+        if r.status_code in _RETRYABLE_STATUS_CODES:
+            breaker.record_failure()
+            n_failures += 1
+            if n_failures >= SETTINGS.WEB_RETRY_ATTEMPTS:
+                return r
+            delay = _backoff_delay(n_failures)
+            log_info(f"> Retrying {url} in {delay:.1f} s (HTTP {r.status_code})")
+            # (releasing the connection of the response, if its body was not read)
+            r.close()
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        if (rate_limit_delay is None) or (n_rate_limited >= _MAX_RATE_LIMITED_ATTEMPTS):
+            return r
+        # The scheduler holds further requests to the host until the limit is reset
+        n_rate_limited += 1
+        log_info(f"> Retrying {url} once the rate limit is reset")
+        r.close()
@@ -1,3 +1,8 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 
 
@@ -21,3 +26,78 @@ def gitlab_repo_url() -> str:
 @pytest.fixture
 def gitlab_group_url() -> str:
     return "https://gitlab.com/polito-edyce-prelude"
+
+
+# Local fixtures (no web access needed)
+class StubServer:
+    """
+    Local HTTP server answering with the handlers registered in "routes"
+
+    Handlers take the request (with "method", "path", "headers" and "body")
+    and return a tuple (status, headers, body).
+    """
+
+    def __init__(self):
+        self.routes = dict()
+        self.requests = []
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _answer(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = dict(
+                    method=self.command,
+                    path=self.path,
+                    headers=dict(self.headers),
+                    body=self.rfile.read(length) if length else b"",
+                )
+                stub.requests.append(request)
+                handler = stub.routes.get(self.path)
+                if handler is None:
+                    status, headers, body = 404, {}, "Not found"
+                else:
+                    status, headers, body = handler(request)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body)
+                    headers = {"Content-Type": "application/json"} | headers
+                if isinstance(body, str):
+                    body = body.encode()
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _answer
+            do_POST = _answer
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def count_requests(self, path: str) -> int:
+        return len([i for i in self.requests if i["path"] == path])
+
+
+@pytest.fixture
+def stub_server():
+    x = StubServer()
+    x.thread.start()
+    yield x
+    x.server.shutdown()
+    x.server.server_close()
+
+
+@pytest.fixture
+def cache_database(tmp_path, monkeypatch):
+    from oss4climate.src import database
+
+    db = database.CacheDatabase(str(tmp_path / "cache.sqlite"), flush_interval=0.05)
+    monkeypatch.setattr(database, "_DATABASE", db)
+    monkeypatch.setattr(database, "_DATABASE_PID", os.getpid())
+    yield db
+    db.close()
@@ -0,0 +1,218 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from oss4climate.scripts import cache_maintenance
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.database import CacheDatabase
+
+
+def test_bulk_save_and_load(tmp_path):
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), flush_interval=0.05)
+
+    db.save_many({"a": {"x": 1}, "b": {"y": [1, 2]}}, is_json=True)
+    # Pending writes are readable before being committed
+    assert db.load_many(["a", "b", "c"], is_json=True) == {
+        "a": {"x": 1},
+        "b": {"y": [1, 2]},
+    }
+
+    db.flush()
+    assert not db._pending and not db._in_flight
+    assert db.load("b", is_json=True) == {"y": [1, 2]}
+
+    # Overwriting an existing entry
+    db.save("a", {"x": 2}, is_json=True)
+    db.flush()
+    assert db.load("a", is_json=True) == {"x": 2}
+    db.close()
+
+    # Data is persisted across instances
+    db2 = CacheDatabase(str(tmp_path / "db.sqlite"))
+    assert db2.load("a", is_json=True) == {"x": 2}
+    assert db2.load("missing", is_json=False) is None
+    with db2.engine.connect() as connection:
+        mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+    assert mode.lower() == "wal"
+    db2.close()
+
+
+def test_concurrent_writers(tmp_path):
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), batch_size=50)
+
+    def _write(thread_id: int):
+        for i in range(200):
+            db.save(f"{thread_id}-{i}", f"value {i}", is_json=False)
+
+    threads = [threading.Thread(target=_write, args=(t,)) for t in range(8)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    db.flush()
+
+    keys = [f"{t}-{i}" for t in range(8) for i in range(200)]
+    res = db.load_many(keys, is_json=False)
+    assert len(res) == len(keys)
+    assert res["7-199"] == "value 199"
+    db.close()
+
+
+def test_compression_and_migration(tmp_path):
+    readme = "# Some project\n\nA long description of the project. " * 50
+
+    # Legacy (uncompressed) database
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), codec=None)
+    db.save("readme", readme, is_json=False)
+    db.save("short", "x", is_json=False)
+    db.close()
+
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), codec="zlib")
+    assert db.load("readme", is_json=False) == readme
+    assert db.recompress() == 1  # Short values are left uncompressed
+    assert db.recompress() == 0
+    db.vacuum()
+    assert db.load_many(["readme", "short"], is_json=False) == {
+        "readme": readme,
+        "short": "x",
+    }
+
+    # New entries are written compressed
+    db.save("data", {"readme": readme}, is_json=True)
+    db.flush()
+    with db.engine.connect() as connection:
+        codecs = dict(connection.execute(text("SELECT id, codec FROM cache")).all())
+    assert codecs == {"readme": "zlib", "short": None, "data": "zlib"}
+    assert db.load("data", is_json=True) == {"readme": readme}
+    db.close()
+
+
+def test_memory_tier(tmp_path):
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), codec=None)
+    db.save_many({f"k{i}": "x" * 100 for i in range(10)}, is_json=False)
+    db.close()
+
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), memory_budget_mb=0.0005)
+    assert db.load("k0", is_json=False) == "x" * 100
+    assert db.load("k0", is_json=False) == "x" * 100
+    assert db.load("missing", is_json=False) is None
+    stats = db.statistics()
+    assert stats["memory"]["hits"] == 1
+    assert stats["sqlite"] == {"hits": 1, "misses": 1}
+
+    # Least recently used entries are evicted beyond the budget (500 bytes)
+    db.load_many([f"k{i}" for i in range(1, 10)], is_json=False)
+    stats = db.statistics()
+    assert stats["memory"]["bytes"] <= 500
+    assert stats["memory"]["entries"] == 5
+    assert db.memory.get(("k9", False)) is not None
+    assert db.memory.get(("k0", False)) is None
+    db.close()
+
+
+def test_access_times(tmp_path):
+    db = CacheDatabase(str(tmp_path / "db.sqlite"))
+    db.save("a", "x", is_json=False)
+    db.close()
+
+    def _last_accessed_at():
+        with db.engine.connect() as connection:
+            return connection.execute(
+                text("SELECT IFNULL(last_accessed_at, fetched_at) FROM cache")
+            ).scalar()
+
+    before = _last_accessed_at()
+    # (saved even if the session only reads)
+    db = CacheDatabase(str(tmp_path / "db.sqlite"))
+    assert db.load("a", is_json=False) == "x"
+    db.close()
+    assert _last_accessed_at() > before
+
+
+def test_eviction(tmp_path):
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), codec=None, max_size_mb=None)
+    repo = "https://api.github.com/repos/org/repo"
+    db.save_many(
+        {
+            repo: "r" * 1000,
+            f"{repo}/pulls": "p" * 1000,
+            f"{repo}/commits/main": "c" * 1000,
+            "https://example.com/page": "w" * 1000,
+        },
+        is_json=False,
+    )
+    stats = db.statistics_by_url_class()
+    assert stats["github_pulls"] == {"entries": 1, "bytes": 1000}
+    assert sum(i["entries"] for i in stats.values()) == 4
+
+    assert db.evict(pattern="*/pulls*") == 1
+    assert db.load(f"{repo}/pulls", is_json=False) is None
+    assert db.evict(url_class="github_commits") == 1
+
+    # Size cap: lowest priority classes are evicted first
+    assert db.enforce_size_cap(max_size_mb=0.0015) == 1
+    assert db.load(repo, is_json=False) == "r" * 1000
+    assert db.load("https://example.com/page", is_json=False) is None
+    db.vacuum()
+    db.close()
+
+
+def test_failed_writes_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SQLITE_WRITE_RETRY_BACKOFF_SECONDS", 0.01)
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), flush_interval=0.05)
+    write_batch = db._write_batch
+    n_failures = [2]
+
+    def _write_batch(rows):
+        if n_failures[0] > 0:
+            n_failures[0] -= 1
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        write_batch(rows)
+
+    monkeypatch.setattr(db, "_write_batch", _write_batch)
+    db.save("a", "x", is_json=False)
+    db.flush()
+    assert db.dropped_rows == 0
+    db.memory.clear()
+    assert db.load("a", is_json=False) == "x"
+
+    # Rows are dropped (and counted) after the maximal number of attempts
+    n_failures[0] = SETTINGS.SQLITE_WRITE_RETRY_ATTEMPTS
+    db.save("b", "y", is_json=False)
+    db.flush()
+    assert db.dropped_rows == 1
+    db.close()
+
+
+def test_write_retry_backoff_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SQLITE_WRITE_RETRY_ATTEMPTS", 30)
+    monkeypatch.setattr(SETTINGS, "SQLITE_WRITE_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(SETTINGS, "SQLITE_WRITE_RETRY_MAX_BACKOFF_SECONDS", 0.02)
+    db = CacheDatabase(str(tmp_path / "db.sqlite"), flush_interval=0.01)
+    write_batch = db._write_batch
+    n_failures = [29]
+
+    def _write_batch(rows):
+        if n_failures[0] > 0:
+            n_failures[0] -= 1
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        write_batch(rows)
+
+    monkeypatch.setattr(db, "_write_batch", _write_batch)
+    # (without the cap, the last retries would wait for hours)
+    start = time.monotonic()
+    db.save("a", "x", is_json=False)
+    db.flush()
+    assert time.monotonic() - start < 5
+    assert db.dropped_rows == 0
+    db.close()
+
+
+def test_eviction_options_are_checked():
+    # (an invocation without options would otherwise do nothing, silently)
+    with pytest.raises(ValueError):
+        cache_maintenance.evict_cache_entries()
+    # (a misspelled class would otherwise match nothing, silently)
+    with pytest.raises(ValueError, match="Unknown URL class"):
+        cache_maintenance.evict_cache_entries(url_class="github_pull")
@@ -0,0 +1,35 @@
+import pytest
+
+from oss4climate.src.database import CacheDatabase
+from oss4climate.src.database.pack import export_pack, import_pack
+
+
+def test_pack_export_and_import(tmp_path):
+    readme = "# Project\n\nSame README in several repositories. " * 20
+    source = CacheDatabase(str(tmp_path / "source.sqlite"), codec="zlib")
+    source.save_many({"a": readme, "b": readme, "c": "short"}, is_json=False)
+    source.save("d", {"x": 1}, is_json=True, response_headers={"etag": '"e"'})
+    assert export_pack(source, str(tmp_path / "cache.pack")) == 4
+
+    # Merging into a cache holding a more recent version of "c"
+    target = CacheDatabase(str(tmp_path / "target.sqlite"), codec=None)
+    target.save("c", "more recent", is_json=False)
+    target.flush()
+    assert import_pack(target, str(tmp_path / "cache.pack")) == 4
+    assert target.load_many(["a", "b", "c"], is_json=False) == {
+        "a": readme,
+        "b": readme,
+        "c": "more recent",
+    }
+    entry = target.load_entry("d", is_json=True)
+    assert entry.value == {"x": 1}
+    assert entry.response_headers == {"etag": '"e"'}
+    source.close()
+    target.close()
+
+    with open(tmp_path / "invalid.pack", "wb") as f:
+        f.write(b"not a pack")
+    with pytest.raises(ValueError):
+        import_pack(
+            CacheDatabase(str(tmp_path / "x.sqlite")), str(tmp_path / "invalid.pack")
+        )
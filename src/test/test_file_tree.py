@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from oss4climate.src.parsers.file_tree import (
+    FileTree,
+    TreeStreamParser,
+    parse_tree_stream,
+)
+
+
+def _tree_response(paths: list[str], truncated: bool) -> bytes:
+    return json.dumps(
+        {
+            "sha": "abc",
+            "url": "https://api.github.com/repos/o/r/git/trees/abc",
+            "tree": [
+                {"path": i, "type": "tree" if "." not in i else "blob", "sha": i}
+                for i in paths
+            ],
+            "truncated": truncated,
+        },
+        indent=1,
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def test_stream_parsing():
+    paths = ["données", "données/réseau.py", "docs", "docs/index.md", "pyproject.toml"]
+    response = _tree_response(paths, truncated=True)
+    parser = TreeStreamParser()
+    entries = []
+    # Small chunks (splitting entries and multi-byte characters)
+    for i in range(0, len(response), 7):
+        entries += parser.feed(response[i : i + 7])
+    parser.close()
+    assert [i["path"] for i in entries] == paths
+    assert parser.truncated
+
+    parser = TreeStreamParser()
+    parser.feed(response[:100])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_file_tree_queries():
+    paths = [f"notebooks/study_{i}.ipynb" for i in range(1000)] + ["pyproject.toml"]
+    tree = FileTree()
+    subtrees, truncated = parse_tree_stream(
+        [_tree_response(["notebooks"] + paths, truncated=False)], tree
+    )
+    assert (subtrees, truncated) == ([("notebooks", "notebooks")], False)
+    assert list(tree.paths(include_dirs=False)) == paths
+    assert tree.count("*.ipynb") == 1000
+    assert tree.contains("pyproject.toml")
+    assert not tree.any("setup.py")
+    # Front coding keeps the storage well below the size of the paths
+    assert len(tree._suffixes) < sum(len(i) for i in paths) / 3
+
+    copy = FileTree.from_dict(json.loads(json.dumps(tree.to_dict())))
+    assert list(copy.iter_entries()) == list(tree.iter_entries())
+    copy.add("setup.py")
+    assert copy.contains("setup.py")
+
+    capped = FileTree()
+    parse_tree_stream([_tree_response(paths, truncated=False)], capped, max_entries=10)
+    assert len(capped) == 10
+    assert capped.truncated
@@ -1,9 +1,10 @@
-from oss4climate.src.parsers import ParsingTargets
+from oss4climate.src.parsers import ParsingTargets, github_data_io
 from oss4climate.src.parsers.github_data_io import (
     ProjectDetails,
     fetch_repositories_in_organisation,
     fetch_repository_details,
 )
+from oss4climate.src.web import counting_requests
 
 
 def test_parsing_target_set():
@@ -50,3 +51,209 @@ def test_fetch_functions(github_repo_url, github_organisation_url):
     assert isinstance(res_org, dict)
 
     print("ok")
+
+
+def test_repositories_in_organisation_pagination(
+    stub_server, cache_database, monkeypatch
+):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+    base = "/users/someone/repos?per_page=100&page="
+
+    def _page(i: int):
+        links = f'<{stub_server.url}{base}3>; rel="last"'
+        repos = [
+            {"name": f"repo{i}-{j}", "html_url": f"https://github.com/someone/r{i}-{j}"}
+            for j in range(100 if i < 3 else 5)
+        ]
+        return lambda request: (200, {"Link": links}, repos)
+
+    for i in range(1, 4):
+        stub_server.routes[f"{base}{i}"] = _page(i)
+
+    # "someone" is not an organisation (404), so the user's repositories are listed
+    pages = list(github_data_io.iterate_repositories_in_organisation("someone"))
+    assert [len(i) for i in pages] == [100, 100, 5]
+    assert pages[2][0]["name"] == "repo3-0"
+    assert stub_server.count_requests("/orgs/someone/repos?per_page=100&page=1") == 1
+
+    res = fetch_repositories_in_organisation("https://github.com/someone")
+    assert len(res) == 205
+    assert res["repo2-7"] == "https://github.com/someone/r2-7"
+
+
+def test_lean_repository_details(stub_server, cache_database, monkeypatch):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+    monkeypatch.setattr(github_data_io, "GITHUB_RAW_URL", f"{stub_server.url}/raw")
+    repo = {
+        "name": "r",
+        "html_url": "https://github.com/o/r",
+        "homepage": None,
+        "description": "A repository",
+        "license": None,
+        "language": "Python",
+        "updated_at": "2024-10-01T12:00:00Z",
+        "default_branch": "master",
+        "fork": False,
+    }
+    commit = {"commit": {"author": {"date": "2024-09-30T08:00:00Z"}}}
+    stub_server.routes["/repos/o/r"] = lambda request: (200, {}, repo)
+    stub_server.routes["/repos/o/r/commits?sha=master&per_page=1"] = lambda request: (
+        200,
+        {},
+        [commit],
+    )
+    stub_server.routes["/repos/o/r/pulls?state=open&per_page=1"] = lambda request: (
+        200,
+        {},
+        [],
+    )
+    stub_server.routes["/raw/o/r/master/README.md"] = lambda request: (
+        200,
+        {},
+        "# r",
+    )
+
+    with counting_requests() as counter:
+        res = fetch_repository_details("https://github.com/o/r", lean=True)
+    assert res.master_branch == "master"
+    assert res.last_commit.isoformat() == "2024-09-30"
+    assert res.readme == "# r"
+    assert counter.n_requests == 4
+    assert stub_server.count_requests("/repos/o/r/branches") == 0
+
+    # The file tree uses the default branch too (the repository payload being cached)
+    stub_server.routes["/repos/o/r/git/trees/master?recursive=1"] = lambda request: (
+        200,
+        {},
+        {"tree": [{"path": "README.md"}]},
+    )
+    with counting_requests() as counter:
+        assert github_data_io.fetch_repository_file_tree("o/r") == ["README.md"]
+    assert counter.n_requests == 1
+
+
+def test_repository_details_from_listing_payload(
+    stub_server, cache_database, monkeypatch
+):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+    monkeypatch.setattr(github_data_io, "GITHUB_RAW_URL", f"{stub_server.url}/raw")
+    listing = [
+        {
+            "name": name,
+            "html_url": f"https://github.com/o/{name}",
+            "homepage": "https://example.com",
+            "description": None,
+            "license": {"name": "MIT License"},
+            "language": "Rust",
+            "updated_at": "2024-10-01T12:00:00Z",
+            "default_branch": "main",
+            "fork": name == "fork",
+        }
+        for name in ["r", "fork"]
+    ]
+    stub_server.routes["/orgs/o/repos?per_page=100&page=1"] = lambda request: (
+        200,
+        {},
+        listing,
+    )
+    stub_server.routes["/repos/o/fork"] = lambda request: (
+        200,
+        {},
+        listing[1] | {"parent": {"html_url": "https://github.com/upstream/fork"}},
+    )
+    for name in ["r", "fork"]:
+        stub_server.routes[f"/repos/o/{name}/commits?sha=main&per_page=1"] = (
+            lambda request: (
+                200,
+                {},
+                [{"commit": {"author": {"date": "2024-09-30T08:00:00Z"}}}],
+            )
+        )
+        stub_server.routes[f"/repos/o/{name}/pulls?state=open&per_page=1"] = (
+            lambda request: (200, {}, [])
+        )
+
+    payloads = github_data_io.fetch_repository_payloads_in_organisation("o")
+    partial = github_data_io.repository_details_from_payload(
+        payloads["https://github.com/o/r"]
+    )
+    assert (partial.id, partial.license, partial.language) == (
+        "o/r",
+        "MIT License",
+        "Rust",
+    )
+    assert partial.last_commit is None
+
+    res = fetch_repository_details(
+        "https://github.com/o/r", lean=True, payload=payloads["https://github.com/o/r"]
+    )
+    assert res.last_commit.isoformat() == "2024-09-30"
+    assert res.open_pull_requests == 0
+    assert stub_server.count_requests("/repos/o/r") == 0
+
+    # Listings do not give the parent of forks (which is then fetched)
+    res = fetch_repository_details(
+        "https://github.com/o/fork",
+        lean=True,
+        payload=payloads["https://github.com/o/fork"],
+    )
+    assert res.forked_from == "https://github.com/upstream/fork"
+    assert stub_server.count_requests("/repos/o/fork") == 1
+
+
+def test_count_open_pull_requests(stub_server, cache_database, monkeypatch):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+    path = "/repos/o/busy/pulls?state=open&per_page=1"
+    link = (
+        f"<{stub_server.url}/repositories/1/pulls?state=open&per_page=1&page=2>;"
+        ' rel="next", '
+        f"<{stub_server.url}/repositories/1/pulls?state=open&per_page=1&page=417>;"
+        ' rel="last"'
+    )
+    stub_server.routes[path] = lambda request: (200, {"Link": link}, [{"number": 1}])
+    assert github_data_io.count_open_pull_requests("https://github.com/o/busy") == 417
+
+    stub_server.routes["/repos/o/calm/pulls?state=open&per_page=1"] = lambda r: (
+        200,
+        {},
+        [],
+    )
+    assert github_data_io.count_open_pull_requests("o/calm") == 0
+
+
+def test_truncated_file_tree(stub_server, cache_database, monkeypatch):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+
+    def _tree(entries: list[tuple[str, str]], truncated: bool = False):
+        tree = [
+            {"path": p, "type": "blob" if sha is None else "tree", "sha": sha}
+            for p, sha in entries
+        ]
+        return lambda request: (200, {}, {"tree": tree, "truncated": truncated})
+
+    base = "/repos/o/big/git/trees"
+    stub_server.routes[f"{base}/main?recursive=1"] = _tree([("a", "A")], True)
+    stub_server.routes[f"{base}/main"] = _tree(
+        [("README.md", None), ("a", "A"), ("b", "B")]
+    )
+    stub_server.routes[f"{base}/A?recursive=1"] = _tree([("x.py", None)])
+    stub_server.routes[f"{base}/B?recursive=1"] = _tree([("c", "C")], True)
+    stub_server.routes[f"{base}/B"] = _tree([("nb.ipynb", None), ("c", "C")])
+    stub_server.routes[f"{base}/C?recursive=1"] = _tree([("y.ipynb", None)])
+
+    tree = github_data_io.fetch_file_tree("o/big", branch="main")
+    assert sorted(tree.paths(include_dirs=False)) == [
+        "README.md",
+        "a/x.py",
+        "b/c/y.ipynb",
+        "b/nb.ipynb",
+    ]
+    assert not tree.truncated
+    assert tree.count("*.ipynb") == 2
+
+    # The (compact) tree is cached
+    n_requests = len(stub_server.requests)
+    assert github_data_io.fetch_repository_file_tree("o/big", branch="main") == list(
+        tree.paths()
+    )
+    assert len(stub_server.requests) == n_requests
@@ -0,0 +1,101 @@
+import json
+from datetime import date
+
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.parsers import github_graphql_io
+from oss4climate.src.parsers.github_data_io import ProjectDetails
+
+
+def _repository_node(owner: str, name: str) -> dict:
+    return {
+        "name": name,
+        "nameWithOwner": f"{owner}/{name}",
+        "url": f"https://github.com/{owner}/{name}",
+        "homepageUrl": "",
+        "description": f"Description of {name}",
+        "updatedAt": "2024-10-01T12:00:00Z",
+        "isFork": name == "fork",
+        "parent": {"url": "https://github.com/upstream/fork"}
+        if name == "fork"
+        else None,
+        "licenseInfo": {"name": "MIT License"},
+        "primaryLanguage": {"name": "Python"},
+        "stargazerCount": 3,
+        "forkCount": 1,
+        "defaultBranchRef": {
+            "name": "develop",
+            "target": {"author": {"date": "2024-09-30T08:00:00+02:00"}},
+        },
+        "pullRequests": {"totalCount": 42},
+        "readme": {"text": f"# {name}"} if name != "no-readme" else None,
+    }
+
+
+def _graphql_handler(request):
+    body = json.loads(request["body"])
+    variables = body["variables"]
+    data = dict()
+    errors = []
+    for k in variables:
+        if not k.startswith("o"):
+            continue
+        alias = f"r{k[1:]}"
+        owner, name = variables[k], variables[f"n{k[1:]}"]
+        if name == "missing":
+            data[alias] = None
+            errors.append(
+                {
+                    "type": "NOT_FOUND",
+                    "path": [alias],
+                    "message": f"Could not resolve to a Repository ({name})",
+                }
+            )
+        else:
+            assert f"{alias}: repository(owner: ${k}, name: $n{k[1:]})" in body["query"]
+            data[alias] = _repository_node(owner, name)
+    out = dict(data=data)
+    if errors:
+        out["errors"] = errors
+    return 200, {}, out
+
+
+def test_fetch_repositories_details(stub_server, cache_database, monkeypatch):
+    monkeypatch.setattr(
+        github_graphql_io, "GITHUB_GRAPHQL_URL", f"{stub_server.url}/graphql"
+    )
+    monkeypatch.setattr(SETTINGS, "GITHUB_API_TOKEN", "dummy-token")
+    stub_server.routes["/graphql"] = _graphql_handler
+
+    urls = [
+        "https://github.com/org/repo1",
+        "https://github.com/org/fork",
+        "https://github.com/org/missing",
+        "https://github.com/other/no-readme/",
+        "https://github.com/org/repo2",
+    ]
+    res = github_graphql_io.fetch_repositories_details(urls, batch_size=2)
+    assert list(res.keys()) == urls
+    assert stub_server.count_requests("/graphql") == 3
+    assert stub_server.requests[0]["headers"]["Authorization"] == "Bearer dummy-token"
+
+    r1 = res[urls[0]]
+    assert isinstance(r1, ProjectDetails)
+    assert r1.id == "org/repo1"
+    assert r1.organisation == "org"
+    assert r1.master_branch == "develop"
+    assert r1.last_commit == date(2024, 9, 30)
+    assert r1.latest_update == date(2024, 10, 1)
+    assert r1.open_pull_requests == 42
+    assert r1.license == "MIT License"
+    assert r1.language == "Python"
+    assert r1.readme == "# repo1"
+    assert r1.is_fork is False
+    assert res[urls[1]].forked_from == "https://github.com/upstream/fork"
+    assert isinstance(res[urls[2]], github_graphql_io.GraphQLError)
+    assert res[urls[3]].id == "other/no-readme"
+    assert res[urls[3]].readme == "(None)"
+
+    # Repositories found are cached (only the missing one is queried again)
+    res = github_graphql_io.fetch_repositories_details(urls, batch_size=2)
+    assert stub_server.count_requests("/graphql") == 4
+    assert res[urls[4]].name == "repo2"
@@ -1,8 +1,17 @@
 from oss4climate.src.parsers import ParsingTargets
 from oss4climate.src.parsers.gitlab_data_io import (
+    GitlabTargetType,
     ProjectDetails,
+    count_open_merge_requests,
+    fetch_project_payloads_in_group,
     fetch_repositories_in_group,
     fetch_repository_details,
+    resolve_target_type,
+)
+
+_GROUP_PROJECTS = (
+    "/api/v4/groups/grp%2Fsub/projects"
+    "?include_subgroups=true&order_by=id&sort=asc&per_page=100"
 )
 
 
@@ -50,3 +59,70 @@ def test_fetch_functions(gitlab_repo_url, gitlab_group_url):
     assert isinstance(res_org, dict)
 
     print("ok")
+
+
+def test_count_open_merge_requests(stub_server, cache_database):
+    stub_server.routes["/api/v4/projects/1/merge_requests?state=opened&per_page=1"] = (
+        lambda request: (200, {"X-Total": "1234"}, [{"iid": 1}])
+    )
+    n = count_open_merge_requests(f"{stub_server.url}/api/v4/projects/1/merge_requests")
+    assert n == 1234
+
+
+def _projects_page(stub_server, i: int) -> list[dict]:
+    return [
+        {"name": f"p{i}", "web_url": f"{stub_server.url}/grp/sub/p{i}"},
+        {"name": f"q{i}", "web_url": f"{stub_server.url}/grp/sub/deeper/q{i}"},
+    ]
+
+
+def test_fetch_project_payloads_in_group(stub_server, cache_database):
+    for i in [1, 2, 3]:
+        stub_server.routes[f"{_GROUP_PROJECTS}&page={i}"] = lambda request, i=i: (
+            200,
+            {"X-Total-Pages": "3"},
+            _projects_page(stub_server, i),
+        )
+    res = fetch_project_payloads_in_group(f"{stub_server.url}/grp/sub/")
+    assert len(res) == 6
+    assert res[f"{stub_server.url}/grp/sub/deeper/q3"]["name"] == "q3"
+    for i in [1, 2, 3]:
+        assert stub_server.count_requests(f"{_GROUP_PROJECTS}&page={i}") == 1
+
+
+def test_fetch_project_payloads_in_group_without_total(stub_server, cache_database):
+    # Gitlab does not count the projects of very large groups (only "next" links)
+    for i in [1, 2]:
+        link = f'<{stub_server.url}{_GROUP_PROJECTS}&page=2>; rel="next"'
+        stub_server.routes[f"{_GROUP_PROJECTS}&page={i}"] = lambda request, i=i: (
+            200,
+            {"Link": link} if i == 1 else {},
+            _projects_page(stub_server, i),
+        )
+    res = fetch_project_payloads_in_group(f"{stub_server.url}/grp/sub")
+    assert sorted(i["name"] for i in res.values()) == ["p1", "p2", "q1", "q2"]
+
+
+def test_identify_subgroups(stub_server, cache_database):
+    stub_server.routes["/api/v4/projects/grp%2Fsub%2Fproject?license=yes"] = (
+        lambda request: (200, {}, {"name": "project"})
+    )
+    stub_server.routes["/api/v4/projects/grp%2Fsub?license=yes"] = lambda request: (
+        404,
+        {},
+        {"message": "404 Project Not Found"},
+    )
+    stub_server.routes["/api/v4/groups/grp%2Fsub?with_projects=false"] = (
+        lambda request: (200, {}, {"full_path": "grp/sub"})
+    )
+    # Without the API, nested paths are taken as projects
+    assert GitlabTargetType.identify("https://gitlab.com/grp") == GitlabTargetType.GROUP
+    assert (
+        GitlabTargetType.identify("https://gitlab.com/grp/sub")
+        == GitlabTargetType.PROJECT
+    )
+    assert resolve_target_type(f"{stub_server.url}/grp/sub") == GitlabTargetType.GROUP
+    assert (
+        resolve_target_type(f"{stub_server.url}/grp/sub/project/")
+        == GitlabTargetType.PROJECT
+    )
@@ -0,0 +1,46 @@
+from bs4 import BeautifulSoup
+
+from oss4climate.src.parsers.html_links import (
+    PageElement,
+    extract_links,
+    extract_page_elements,
+)
+
+_PAGE = """
+<html><body>
+<a href="https://github.com/top">Top</a>
+<h2>Energy <a class="headerlink" href="#energy">&para;</a></h2>
+<h3>Grids</h3>
+<ul>
+  <li><a href="https://github.com/a/b">b</a> and <a href="https://gitlab.com/c/d">d</a>
+    <ul><li><a href="https://github.com/a/nested">nested</a></li></ul>
+  </li>
+  <li><a class="projects-icon other" href="https://github.com/e/f">f</a></li>
+  <li><a name="anchor">No href</a></li>
+</ul>
+<p><a href="https://github.com/not/in-list">x</a></p>
+</body></html>
+"""
+
+
+def test_extract_links():
+    soup = BeautifulSoup(_PAGE, features="html.parser")
+    assert extract_links(_PAGE) == [
+        x.get("href") for x in soup.find_all(name="a") if x.get("href") is not None
+    ]
+    assert extract_links(_PAGE, class_name="projects-icon") == [
+        x.get("href") for x in soup.find_all(name="a", attrs={"class": "projects-icon"})
+    ]
+
+
+def test_extract_page_elements():
+    elements = extract_page_elements(_PAGE, heading_tags=["h2", "h3"])
+    assert elements[2] == PageElement(tag="h2", value="Energy ¶")
+    assert elements[3] == PageElement(tag="h3", value="Grids")
+    assert [i.value for i in elements if i.in_list_item] == [
+        "https://github.com/a/b",
+        "https://gitlab.com/c/d",
+        "https://github.com/a/nested",
+        "https://github.com/e/f",
+    ]
+    assert elements[-1] == PageElement(tag="a", value="https://github.com/not/in-list")
@@ -0,0 +1,50 @@
+from oss4climate.src.parsers import fetch_all_project_urls_from_markdown_str
+from oss4climate.src.parsers.markdown_links import iter_markdown_links
+
+_README = """
+# Awesome list
+
+- [Inline](https://github.com/a/inline) - with a [title](https://github.com/a/title "Title").
+- [Full reference][ref] and [Collapsed][] and [shortcut], [not a link].
+- [![Badge](https://img.shields.io/badge.svg)](https://github.com/a/badged)
+- <https://gitlab.com/group/autolink> and https://github.com/a/bare.
+- [ ] A task, and [Forward][later]
+
+[ref]: https://github.com/a/reference
+[collapsed]: <https://github.com/a/collapsed> "Title"
+[Shortcut]: https://github.com/a/shortcut
+[LATER]:
+  https://github.com/a/later
+"""
+
+
+def test_iter_markdown_links():
+    assert list(iter_markdown_links(_README)) == [
+        "https://github.com/a/inline",
+        "https://github.com/a/title",
+        "https://github.com/a/badged",
+        "https://gitlab.com/group/autolink",
+        "https://github.com/a/bare",
+        # Reference links, once their definitions are read
+        "https://github.com/a/reference",
+        "https://github.com/a/collapsed",
+        "https://github.com/a/shortcut",
+        "https://github.com/a/later",
+    ]
+
+
+def test_fetch_all_project_urls_from_markdown_str():
+    x = fetch_all_project_urls_from_markdown_str(_README)
+    assert "https://github.com/a/later" in x.github_repositories
+    assert x.gitlab_projects == ["https://gitlab.com/group/autolink"]
+
+
+def test_inline_links_with_parentheses():
+    markdown_text = (
+        "See [Foo](https://en.wikipedia.org/wiki/Foo_(bar)) and"
+        ' [Bar](https://en.wikipedia.org/wiki/Bar_(baz) "Title").'
+    )
+    assert list(iter_markdown_links(markdown_text)) == [
+        "https://en.wikipedia.org/wiki/Foo_(bar)",
+        "https://en.wikipedia.org/wiki/Bar_(baz)",
+    ]
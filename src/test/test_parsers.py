@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from oss4climate.src import parsers
+from oss4climate.src.config import SETTINGS
+
+
+def test_cached_web_get_revalidation(stub_server, cache_database, monkeypatch):
+    def _resource(request):
+        if request["headers"].get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, ""
+        return 200, {"ETag": '"v1"'}, {"name": "resource"}
+
+    stub_server.routes["/resource"] = _resource
+    url = f"{stub_server.url}/resource"
+
+    # First call goes to the server, the next ones are served from the cache
+    assert parsers.cached_web_get_json(url, wait_after_web_query=False) == {
+        "name": "resource"
+    }
+    assert parsers.cached_web_get_json(url, wait_after_web_query=False) == {
+        "name": "resource"
+    }
+    assert stub_server.count_requests("/resource") == 1
+    first_fetch = cache_database.load_entry(url, is_json=True).fetched_at
+
+    # Once stale, the entry is revalidated with its ETag
+    monkeypatch.setattr(parsers, "cache_ttl_for", lambda url: timedelta(0))
+    assert parsers.cached_web_get_json(url, wait_after_web_query=False) == {
+        "name": "resource"
+    }
+    assert stub_server.count_requests("/resource") == 2
+    assert stub_server.requests[-1]["headers"]["If-None-Match"] == '"v1"'
+    # (only the fetch time and the headers being written, from the memory tier too)
+    cache_database.flush()
+    cache_database.memory.clear()
+    entry = cache_database.load_entry(url, is_json=True)
+    assert entry.fetched_at > first_fetch
+    assert entry.response_headers["etag"] == '"v1"'
+
+    # Failures of the server do not prevent using the stale entry
+    monkeypatch.setattr(SETTINGS, "WEB_RETRY_ATTEMPTS", 1)
+    stub_server.routes["/resource"] = lambda request: (503, {}, "")
+    assert parsers.cached_web_get_json(url, wait_after_web_query=False) == {
+        "name": "resource"
+    }
+
+
+def test_parsing_targets_cleanup():
+    x = parsers.ParsingTargets(
+        github_organisations=["https://github.com/org"],
+        github_repositories=[
+            "https://github.com/org/repo/",
+            "https://github.com/Org/Repo",
+            "https://github.com/ORG",
+        ],
+        gitlab_projects=["https://gitlab.com/group/project"],
+        unknown=["https://gitlab.com/group/project/", "https://example.org"],
+        invalid=["https://github.com/org/repo"],
+    )
+    x.cleanup()
+    assert x.github_repositories == ["https://github.com/Org/Repo"]
+    assert x.unknown == ["https://example.org"]
+    assert x.invalid == []
+    assert x.index()["https://gitlab.com/group/project"] == "gitlab_projects"
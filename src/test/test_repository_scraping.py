@@ -0,0 +1,201 @@
+import os
+
+import pandas as pd
+import pytest
+
+from oss4climate.scripts import repository_scraping
+from oss4climate.scripts.scraping_checkpoint import ScrapingCheckpoint
+from oss4climate.scripts.scraping_shards import all_shards
+from oss4climate.src.config import SETTINGS
+from oss4climate.src.parsers import github_data_io, gitlab_data_io
+from oss4climate.src.parsers.urls import Forge
+
+
+def _setup_stub_repositories(stub_server, pushed_at: dict[str, str]) -> None:
+    for name in pushed_at.keys():
+
+        def _repository(request, name=name):
+            return (
+                200,
+                {},
+                {
+                    "name": name,
+                    "html_url": f"https://github.com/o/{name}",
+                    "homepage": None,
+                    "description": f"Description of {name}",
+                    "license": None,
+                    "language": "Python",
+                    "pushed_at": pushed_at[name],
+                    "updated_at": "2024-10-01T12:00:00Z",
+                    "default_branch": "main",
+                    "fork": False,
+                },
+            )
+
+        commit = {"commit": {"author": {"date": "2024-09-30T08:00:00Z"}}}
+        stub_server.routes[f"/repos/o/{name}"] = _repository
+        stub_server.routes[f"/repos/o/{name}/commits?sha=main&per_page=1"] = (
+            lambda request: (200, {}, [commit])
+        )
+        stub_server.routes[f"/repos/o/{name}/pulls?state=open&per_page=1"] = (
+            lambda request: (200, {}, [])
+        )
+        stub_server.routes[f"/raw/o/{name}/main/README.md"] = lambda request, n=name: (
+            200,
+            {},
+            f"# {n}",
+        )
+
+
+def _setup_index(monkeypatch, tmp_path, stub_server):
+    monkeypatch.setattr(github_data_io, "GITHUB_API_URL", stub_server.url)
+    monkeypatch.setattr(github_data_io, "GITHUB_RAW_URL", f"{stub_server.url}/raw")
+    index_file = tmp_path / "repo_index.toml"
+    index_file.write_text(
+        """
+[github_hosted]
+repositories = ["https://github.com/o/r1", "https://github.com/o/r2"]
+[gitlab_hosted]
+[dropped_targets]
+"""
+    )
+    monkeypatch.setattr(repository_scraping, "FILE_INPUT_INDEX", str(index_file))
+    monkeypatch.setattr(repository_scraping, "FILE_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        repository_scraping, "FILE_OUTPUT_SUMMARY_TOML", str(tmp_path / "summary.toml")
+    )
+    return index_file
+
+
+def test_incremental_scraping(
+    stub_server, cache_database, monkeypatch, tmp_path, capsys
+):
+    index_file = _setup_index(monkeypatch, tmp_path, stub_server)
+    output_file = str(tmp_path / "listing.csv")
+
+    _setup_stub_repositories(
+        stub_server, {"r1": "2024-10-01T00:00:00Z", "r2": "2024-10-01T00:00:00Z"}
+    )
+    repository_scraping.scrape_all(output_file, github_backend="lean")
+    assert stub_server.count_requests("/repos/o/r2/commits?sha=main&per_page=1") == 1
+    # (repository, last commit, open pull requests and README)
+    assert "> 4 web requests for o/r1" in capsys.readouterr().out
+
+    # A day later, only "r2" was pushed to (and "r3" was added to the index)
+    index_file.write_text(
+        index_file.read_text().replace('r2"]', 'r2", "https://github.com/o/r3"]')
+    )
+    _setup_stub_repositories(
+        stub_server,
+        {
+            "r1": "2024-10-01T00:00:00Z",
+            "r2": "2024-10-02T00:00:00Z",
+            "r3": "2024-10-02T00:00:00Z",
+        },
+    )
+    cache_database.flush()
+    cache_database.evict(pattern="*")
+
+    repository_scraping.scrape_all(output_file, github_backend="lean", incremental=True)
+    assert stub_server.count_requests("/repos/o/r1/commits?sha=main&per_page=1") == 1
+    assert stub_server.count_requests("/repos/o/r2/commits?sha=main&per_page=1") == 2
+    assert stub_server.count_requests("/repos/o/r3/commits?sha=main&per_page=1") == 1
+
+    df = pd.read_feather(str(tmp_path / "listing.feather")).set_index("id")
+    assert sorted(df.index) == ["o/r1", "o/r2", "o/r3"]
+    assert df.loc["o/r1", "readme"] == "# r1"
+    assert df.loc["o/r1", "last_commit"].isoformat() == "2024-09-30"
+
+
+def test_resumed_scraping(stub_server, cache_database, monkeypatch, tmp_path):
+    _setup_index(monkeypatch, tmp_path, stub_server)
+    output_file = str(tmp_path / "listing.csv")
+    _setup_stub_repositories(
+        stub_server, {"r1": "2024-10-01T00:00:00Z", "r2": "2024-10-01T00:00:00Z"}
+    )
+    monkeypatch.setattr(SETTINGS, "SCRAPING_CHUNK_SIZE", 1)
+
+    # The first run stops after its first chunk
+    save_chunk = ScrapingCheckpoint.save_chunk
+
+    def _save_chunk_then_stop(self, *args, **kwargs):
+        save_chunk(self, *args, **kwargs)
+        raise RuntimeError("Stopped")
+
+    monkeypatch.setattr(ScrapingCheckpoint, "save_chunk", _save_chunk_then_stop)
+    with pytest.raises(RuntimeError):
+        repository_scraping.scrape_all(output_file, github_backend="lean")
+    checkpoint_directory = str(tmp_path / "listing_checkpoint")
+    (done,) = ScrapingCheckpoint(checkpoint_directory, resume=True).done_targets
+    monkeypatch.setattr(ScrapingCheckpoint, "save_chunk", save_chunk)
+
+    cache_database.flush()
+    cache_database.evict(pattern="*")
+    repository_scraping.scrape_all(output_file, github_backend="lean", resume=True)
+    # The repository in the checkpoint was not scraped again
+    name = done.split("/")[-1]
+    assert (
+        stub_server.count_requests(f"/repos/o/{name}/commits?sha=main&per_page=1") == 1
+    )
+    df = pd.read_feather(str(tmp_path / "listing.feather")).set_index("id")
+    assert list(df.index) == ["o/r1", "o/r2"]
+    assert df.loc["o/r2", "readme"] == "# r2"
+    assert not os.path.exists(tmp_path / "listing_checkpoint")
+
+
+def test_sharded_scraping(stub_server, cache_database, monkeypatch, tmp_path):
+    index_file = _setup_index(monkeypatch, tmp_path, stub_server)
+    index_file.write_text(
+        index_file.read_text().replace('r2"]', 'r2", "https://github.com/o/r3"]')
+    )
+    _setup_stub_repositories(
+        stub_server,
+        {i: "2024-10-01T00:00:00Z" for i in ["r1", "r2", "r3"]},
+    )
+    output_file = str(tmp_path / "listing.csv")
+    repository_scraping.scrape_all(output_file, github_backend="lean")
+    expected = {
+        i: (tmp_path / i).read_bytes()
+        for i in [
+            "listing.csv",
+            "listing.feather",
+            "listing_state.json",
+            "summary.toml",
+        ]
+    }
+
+    for shard in all_shards(2):
+        repository_scraping.scrape_all(output_file, github_backend="lean", shard=shard)
+    df = pd.read_feather(str(tmp_path / "listing_shard_2_of_2.feather"))
+    assert sorted(df["id"]) == ["o/r1", "o/r3"]
+
+    repository_scraping.merge_shards(2, output_file)
+    # The outputs are the same as with a single run
+    for k, v in expected.items():
+        assert (tmp_path / k).read_bytes() == v
+
+
+def test_readme_failures_are_isolated(monkeypatch):
+    def _fetch_readme(details):
+        if details.id == "g/bad":
+            raise ValueError("No README")
+        details.readme = "# README"
+
+    monkeypatch.setattr(gitlab_data_io, "fetch_readme_of_details", _fetch_readme)
+    unit = repository_scraping._ScrapingUnit(
+        Forge.GITLAB, ("https://gitlab.com/g/ok", "https://gitlab.com/g/bad")
+    )
+    details = {
+        url: gitlab_data_io.project_details_from_payload(
+            dict(name=url.split("/")[-1], web_url=url, description=None)
+        )
+        for url in unit.urls
+    }
+    x = repository_scraping._fetch_readmes(
+        repository_scraping._UnitDetails(
+            unit, details, n_requests={url: 1 for url in unit.urls}
+        )
+    )
+    # The failure only affects its own target
+    assert x.details["https://gitlab.com/g/ok"].readme == "# README"
+    assert isinstance(x.details["https://gitlab.com/g/bad"], ValueError)
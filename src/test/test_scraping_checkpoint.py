@@ -0,0 +1,29 @@
+import os
+
+from oss4climate.scripts.scraping_checkpoint import ScrapingCheckpoint
+
+
+def _row(name: str) -> dict:
+    return dict(id=f"o/{name}", url=f"https://github.com/o/{name}", raw_details={})
+
+
+def test_resumption_after_incomplete_entry(tmp_path):
+    directory = str(tmp_path / "checkpoint")
+    checkpoint = ScrapingCheckpoint(directory)
+    for name in ["r1", "r2"]:
+        checkpoint.save_chunk([name], [_row(name)], {name: "marker"})
+    # The run stops while writing an entry (whose chunk is lost)
+    with open(os.path.join(directory, "journal.jsonl"), "a") as f:
+        f.write('{"chunk": "chunk_00002.parq')
+    os.remove(os.path.join(directory, "chunk_00000.parquet"))
+
+    checkpoint = ScrapingCheckpoint(directory, resume=True)
+    assert checkpoint.done_targets == {"r2"}
+    checkpoint.save_chunk(["r3"], [_row("r3")], {"r3": "marker"})
+    # (chunk numbered after the existing ones)
+    assert checkpoint.chunks == ["chunk_00001.parquet", "chunk_00002.parquet"]
+
+    # Entries written after the incomplete one are kept by later resumptions
+    checkpoint = ScrapingCheckpoint(directory, resume=True)
+    assert checkpoint.done_targets == {"r2", "r3"}
+    assert sorted(checkpoint.load()["id"]) == ["o/r2", "o/r3"]
@@ -0,0 +1,65 @@
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+from oss4climate.scripts.scraping_pipeline import Stage, run_pipeline
+
+
+def _fail_on_three(x: int) -> int:
+    if x == 3:
+        raise ValueError("Three")
+    return x
+
+
+def test_run_pipeline():
+    stages = [
+        Stage("double", lambda x: 2 * x, workers=4),
+        Stage("check", _fail_on_three, workers=2),
+        Stage("shift", lambda x: x + 1),
+    ]
+    results = dict(run_pipeline(range(10), stages, queue_size=2))
+    assert sorted(results.keys()) == list(range(10))
+    assert all(results[i] == 2 * i + 1 for i in range(10))
+
+    # Failures are passed on in place of the outputs
+    results = dict(run_pipeline(range(5), [stages[1], stages[2]]))
+    assert isinstance(results[3], ValueError)
+    assert results[4] == 5
+
+
+def test_run_pipeline_in_processes():
+    results = dict(run_pipeline(["a", "bb"], [Stage("len", len, processes=True)]))
+    assert results == {"a": 1, "bb": 2}
+
+
+def test_run_pipeline_backpressure():
+    started = []
+    lock = threading.Lock()
+
+    def _start(x: int) -> int:
+        with lock:
+            started.append(x)
+        return x
+
+    stages = [Stage("start", _start, workers=2), Stage("end", lambda x: x)]
+    with closing(run_pipeline(range(1000), stages, queue_size=2)) as results:
+        next(results)
+        time.sleep(0.3)
+        # Items wait in the queues while the output is not consumed (in the 2
+        #  queues of the stages, the output queue and the workers)
+        assert len(started) <= 10
+    # The workers stopped once the pipeline was closed
+    n_started = len(started)
+    time.sleep(0.3)
+    assert len(started) == n_started
+
+
+def test_run_pipeline_with_failing_items():
+    def _items():
+        yield 1
+        raise RuntimeError("Failed")
+
+    with pytest.raises(RuntimeError):
+        list(run_pipeline(_items(), [Stage("same", lambda x: x)]))
@@ -0,0 +1,27 @@
+import pytest
+
+from oss4climate.scripts.scraping_shards import Shard, all_shards, shard_index_of
+
+
+def test_shard_parsing():
+    assert Shard.parse("2/4") == Shard(index=2, count=4)
+    assert str(Shard.parse("2/4")) == "2/4"
+    for x in ["0/4", "5/4", "4", "a/b"]:
+        with pytest.raises(ValueError):
+            Shard.parse(x)
+    assert (
+        Shard(index=1, count=4).file(".data/listing_data.csv")
+        == ".data/listing_data_shard_1_of_4.csv"
+    )
+
+
+def test_shard_partition():
+    urls = [f"https://github.com/o/r{i}" for i in range(200)]
+    shards = all_shards(4)
+    # Each target is in exactly one shard
+    for url in urls:
+        assert sum(i.includes(url) for i in shards) == 1
+    assert all(any(i.includes(url) for url in urls) for i in shards)
+    # Shards are stable (across processes) and shared by the variants of a URL
+    assert shard_index_of("https://github.com/o/r0", 4) == 1
+    assert shard_index_of("http://www.github.com/O/r0/", 4) == 1
@@ -0,0 +1,77 @@
+import tomllib
+
+from oss4climate.src.parsers import ParsingTargets
+from oss4climate.src.toml_io import dumps_toml, insert_into_toml_arrays, write_toml
+
+
+def test_dumps_toml():
+    long_list = [f"https://github.com/org/repository-{i}" for i in range(3)]
+    x = dict(
+        n=3,
+        table=dict(short=["a", "b"], empty=[], long=long_list),
+        other={'key "quoted"': 'value with "quotes"\n'},
+    )
+    assert dumps_toml(x) == (
+        "n = 3\n"
+        "\n"
+        "[table]\n"
+        'short = ["a", "b"]\n'
+        "empty = []\n"
+        "long = [\n"
+        '    "https://github.com/org/repository-0",\n'
+        '    "https://github.com/org/repository-1",\n'
+        '    "https://github.com/org/repository-2",\n'
+        "]\n"
+        "\n"
+        "[other]\n"
+        '"key \\"quoted\\"" = "value with \\"quotes\\"\\n"\n'
+    )
+    assert tomllib.loads(dumps_toml(x)) == x
+
+
+def test_insert_into_toml_arrays(tmp_path):
+    file_path = str(tmp_path / "index.toml")
+    long_list = [f"https://github.com/org/repository-{i}" for i in [0, 2, 4]]
+    write_toml(dict(t=dict(long=long_list, short=["b"])), file_path)
+    insert_into_toml_arrays(
+        file_path,
+        {
+            ("t", "long"): [
+                "https://github.com/org/repository-5",
+                "https://github.com/org/repository-1",
+                "https://github.com/org/repository-2",
+            ],
+            ("t", "short"): ["a"],
+        },
+    )
+    with open(file_path, "rb") as f:
+        x = tomllib.load(f)
+    assert x["t"]["long"] == [
+        f"https://github.com/org/repository-{i}" for i in [0, 1, 2, 4, 5]
+    ]
+    assert x["t"]["short"] == ["a", "b"]
+    # The file is left in the canonical layout
+    with open(file_path) as f:
+        assert f.read() == dumps_toml(x)
+
+
+def test_parsing_targets_add_to_toml(tmp_path):
+    file_path = str(tmp_path / "repo_index.toml")
+    ParsingTargets(
+        github_organisations=["https://github.com/org"],
+        github_repositories=["https://github.com/other/repo"],
+    ).to_toml(file_path)
+    ParsingTargets(
+        github_repositories=[
+            "https://github.com/Other/Repo/",
+            "https://github.com/a/b",
+        ],
+        gitlab_projects=["https://gitlab.com/group/project"],
+    ).add_to_toml(file_path)
+    x = ParsingTargets.from_toml(file_path)
+    assert x.github_organisations == ["https://github.com/org"]
+    assert x.github_repositories == [
+        "https://github.com/a/b",
+        "https://github.com/other/repo",
+    ]
+    assert x.gitlab_projects == ["https://gitlab.com/group/project"]
@@ -0,0 +1,74 @@
+from oss4climate.src.parsers import identify_parsing_targets, isolate_relevant_urls
+from oss4climate.src.parsers.urls import Forge, TargetType, canonicalise_url, url_key
+
+
+def test_canonicalise_url():
+    u = canonicalise_url("http://www.GitHub.com/Org/Repo.git/?tab=readme#top")
+    assert u.url == "https://github.com/Org/Repo"
+    assert u.key == "https://github.com/org/repo"
+    assert u.forge is Forge.GITHUB
+    assert (u.owner, u.repo, u.path) == ("Org", "Repo", "Org/Repo")
+    assert u.target_type is TargetType.REPOSITORY
+
+    u = canonicalise_url("https://github.com/org/repo/tree/main/src")
+    assert u.subpath == "tree/main/src"
+    assert u.target_type is TargetType.UNKNOWN
+
+    u = canonicalise_url("https://gitlab.example.org/group/sub/project/-/tree/main")
+    assert u.url == "https://gitlab.example.org/group/sub/project/-/tree/main"
+    assert (u.owner, u.repo) == ("group/sub", "project")
+    assert u.target_type is TargetType.REPOSITORY
+    assert canonicalise_url("https://gitlab.com/group/").target_type is (
+        TargetType.ORGANISATION
+    )
+
+    u = canonicalise_url("https://example.org/page/")
+    assert (u.url, u.forge) == ("https://example.org/page", None)
+    assert canonicalise_url("not a URL").target_type is TargetType.UNKNOWN
+
+
+def test_url_key():
+    # (same keys as the canonical URLs)
+    for url in [
+        "http://www.GitHub.com/Org/Repo.git/?tab=readme#top",
+        "https://github.com/org/repo/tree/main/src",
+        "https://gitlab.example.org/group/sub/project.git/-/tree/main",
+        "https://gitlab.com/-/explore",
+        # (URLs already in canonical form, up to case)
+        "https://GitHub.com/Org/Repo",
+        "https://gitlab.com/group/sub/project/-/tree/main",
+        "https://github.com/org/.github",
+        "https://example.org/page/",
+        "not a URL",
+    ]:
+        assert url_key(url) == canonicalise_url(url).key
+
+
+def test_identify_parsing_targets():
+    urls = [
+        "https://github.com/org",
+        "https://github.com/org/repo.git",
+        "https://GITHUB.com/org/repo/",
+        "https://github.com/org/repo/blob/main/README.md",
+        "https://gitlab.com/group",
+        "https://gitlab.com/group/project",
+        "https://example.org",
+        None,
+    ]
+    assert isolate_relevant_urls(urls) == [
+        "https://github.com/org",
+        "https://github.com/org/repo.git",
+        "https://GITHUB.com/org/repo/",
+        "https://gitlab.com/group",
+        "https://gitlab.com/group/project",
+    ]
+    x = identify_parsing_targets(urls)
+    x.ensure_sorted_and_unique_elements()
+    assert x.github_organisations == ["https://github.com/org"]
+    assert x.github_repositories == ["https://github.com/org/repo"]
+    assert x.gitlab_groups == ["https://gitlab.com/group"]
+    assert x.gitlab_projects == ["https://gitlab.com/group/project"]
+    assert x.unknown == [
+        "https://example.org",
+        "https://github.com/org/repo/blob/main/README.md",
+    ]
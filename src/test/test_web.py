@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from oss4climate.src import web
+
+
+def test_run_concurrently_keeps_order_and_failures():
+    def _f(x: int) -> int:
+        time.sleep(0.01 * (5 - x))
+        if x == 3:
+            raise ValueError("failure")
+        return x * 10
+
+    res = web.run_concurrently(_f, range(5), max_concurrency=5)
+    assert res[:3] == [0, 10, 20]
+    assert isinstance(res[3], ValueError)
+    assert res[4] == 40
+    assert web.run_concurrently(_f, [1], max_concurrency=1) == [10]
+
+
+def test_host_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setattr(web.SETTINGS, "WEB_MAX_CONCURRENCY_PER_HOST", 2)
+    monkeypatch.setattr(web, "_HOST_SEMAPHORES", dict())
+    lock = threading.Lock()
+    active = {"a.org": 0, "b.org": 0}
+    peak = {"a.org": 0, "b.org": 0}
+
+    def _f(url: str) -> None:
+        host = web.host_of(url)
+        with web.host_slot(url):
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+
+    urls = [f"https://{h}/{i}" for i in range(6) for h in ["a.org", "b.org"]]
+    web.run_concurrently(_f, urls, max_concurrency=12)
+    assert peak == {"a.org": 2, "b.org": 2}
+
+
+def test_scheduler_token_bucket():
+    scheduler = web.RequestScheduler(requests_per_second=50)
+    t0 = time.monotonic()
+    for __ in range(6):
+        scheduler.acquire("https://example.org/page")
+    assert time.monotonic() - t0 >= 0.09
+    assert scheduler.budgets()["example.org"]["requests"] == 6
+
+
+def test_scheduler_follows_rate_limit_headers():
+    scheduler = web.RequestScheduler(requests_per_second=1)
+    url = "https://api.github.com/repos/org/repo"
+    reset_at = int(time.time()) + 1
+    headers = {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "2",
+        "X-RateLimit-Reset": str(reset_at),
+    }
+    assert scheduler.update(url, 200, headers) is None
+
+    # Full speed while budget remains (regardless of the token bucket)
+    t0 = time.monotonic()
+    scheduler.acquire(url)
+    scheduler.acquire(url)
+    assert time.monotonic() - t0 < 0.1
+    assert scheduler.budgets()["api.github.com"]["remaining"] == 0
+
+    # Rate limited responses give the time to wait until the reset
+    delay = scheduler.update(url, 403, headers | {"X-RateLimit-Remaining": "0"})
+    assert 0 < delay <= 2 + web._RESET_MARGIN_SECONDS
+    assert scheduler.update(url, 429, {"Retry-After": "3"}) == 3.0
+    assert scheduler.update(url, 403, {}) is None
+
+
+def test_scheduled_get_retries_after_rate_limit(stub_server, monkeypatch):
+    monkeypatch.setattr(web, "SCHEDULER", web.RequestScheduler())
+    answers = [(429, {"Retry-After": "0"}, "slow down"), (200, {}, {"ok": True})]
+    stub_server.routes["/api"] = lambda request: answers.pop(0)
+
+    r = web.scheduled_get(f"{stub_server.url}/api")
+    assert r.status_code == 200
+    assert stub_server.count_requests("/api") == 2
+
+
+def test_scheduled_get_retries_transient_failures(stub_server, monkeypatch):
+    monkeypatch.setattr(web.SETTINGS, "WEB_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(web, "_CIRCUIT_BREAKERS", dict())
+    answers = [(502, {}, "bad gateway"), (503, {}, "unavailable")]
+    stub_server.routes["/flaky"] = lambda request: (
+        answers.pop(0) if answers else (200, {}, "ok")
+    )
+
+    r = web.scheduled_get(f"{stub_server.url}/flaky", throttle=False)
+    assert r.status_code == 200
+    assert stub_server.count_requests("/flaky") == 3
+    assert web.circuit_breaker(stub_server.url).consecutive_failures == 0
+
+
+def test_streamed_responses_are_closed_before_retrying(stub_server, monkeypatch):
+    monkeypatch.setattr(web.SETTINGS, "WEB_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(web, "_CIRCUIT_BREAKERS", dict())
+    answers = [(503, {}, "unavailable")]
+    stub_server.routes["/stream"] = lambda request: (
+        answers.pop(0) if answers else (200, {}, "ok")
+    )
+    closed = []
+    close = requests.Response.close
+
+    def _close(self):
+        closed.append(self.status_code)
+        close(self)
+
+    monkeypatch.setattr(requests.Response, "close", _close)
+    with web.scheduled_request(
+        "GET", f"{stub_server.url}/stream", throttle=False, stream=True
+    ) as r:
+        assert r.status_code == 200
+    # (the connection of the failed response was released before the retry)
+    assert closed == [503, 200]
+
+
+def test_circuit_breaker_fails_fast(monkeypatch):
+    monkeypatch.setattr(web.SETTINGS, "WEB_RETRY_ATTEMPTS", 2)
+    monkeypatch.setattr(web.SETTINGS, "WEB_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(web.SETTINGS, "WEB_CIRCUIT_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(web, "_CIRCUIT_BREAKERS", dict())
+    # Nothing listens on this port
+    url = "http://127.0.0.1:9/dead"
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        web.scheduled_get(url, throttle=False)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        web.scheduled_get(url, throttle=False)
+    assert web.circuit_breaker(url).is_open
+    with pytest.raises(web.CircuitOpenError):
+        web.scheduled_get(url, throttle=False)
+
+    # After the cooldown, a successful trial closes the circuit again
+    breaker = web.circuit_breaker(url)
+    breaker.cooldown_seconds = 0
+    breaker.check()
+    breaker.record_success()
+    assert not breaker.is_open